@@ -0,0 +1,161 @@
+import igraph as ig
+import json
+import multiprocessing
+import numpy as np
+import platform
+import scipy
+import sys
+import tracemalloc
+import warnings
+from datetime import datetime, timezone
+from time import perf_counter, process_time
+
+DEFAULT_REGRESSION_TOLERANCE = 0.25  # relative slowdown beyond which a benchmark is flagged as a regression
+MIN_REGRESSION_SECONDS = 0.05  # absolute slowdown below which differences are attributed to noise
+
+
+def measure(function, repeats=1, trace_memory=False):
+    """Runs function() :repeats: times and measures it.
+
+    :param function: function of no arguments to measure
+    :param repeats: number of timed runs
+    :param trace_memory: if True, additionally run :function: once under tracemalloc to measure the peak memory
+                         allocated by Python and NumPy in this process (allocations of worker processes and of C
+                         extensions that bypass Python's allocator, e.g. igraph, are not included)
+    :return: (result of the last run, dict of the best and mean wall time, the best CPU time, and, if :trace_memory:,
+             the peak traced memory in bytes)"""
+    wall_times, cpu_times = [], []
+    result = None
+    for _ in range(repeats):
+        start_cpu = process_time()
+        start = perf_counter()
+        result = function()
+        wall_times.append(perf_counter() - start)
+        cpu_times.append(process_time() - start_cpu)
+
+    measurement = {'wall_time': min(wall_times), 'mean_wall_time': float(np.mean(wall_times)),
+                   'cpu_time': min(cpu_times), 'repeats': repeats}
+
+    if trace_memory:
+        tracemalloc.start()
+        try:
+            function()
+            measurement['peak_memory'] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    return result, measurement
+
+
+def machine_metadata():
+    """Returns a dict describing the machine and library versions that benchmarks were run with"""
+    return {'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'processor': platform.processor(),
+            'cpu_count': multiprocessing.cpu_count(),
+            'numpy': np.__version__,
+            'scipy': scipy.__version__,
+            'igraph': ig.__version__}
+
+
+def write_results(path, results, metadata=None):
+    """Writes benchmark :results: (a dict of {name: measurement}) and :metadata: to :path: as JSON"""
+    with open(path, 'w') as file:
+        json.dump({'metadata': metadata if metadata is not None else machine_metadata(), 'benchmarks': results},
+                  file, indent=2, sort_keys=True)
+
+
+def load_results(path):
+    """Returns the (metadata, results) of a JSON file written by write_results"""
+    with open(path) as file:
+        contents = json.load(file)
+    return contents['metadata'], contents['benchmarks']
+
+
+def compare_to_baseline(results, baseline, tolerance=DEFAULT_REGRESSION_TOLERANCE, min_seconds=MIN_REGRESSION_SECONDS,
+                        metadata=None, baseline_metadata=None, ignore_cpu_count=False):
+    """Compares the wall times of :results: to those of :baseline: (both dicts of {name: measurement}).
+
+    The parallel benchmarks' wall times depend on the number of CPUs, so results are only compared to a baseline
+    recorded with as many CPUs (if both :metadata: and :baseline_metadata: are given).
+
+    :param results: current benchmark results
+    :param baseline: baseline benchmark results
+    :param tolerance: relative slowdown beyond which a benchmark is flagged as a regression
+    :param min_seconds: absolute slowdown (in seconds) below which a benchmark is never flagged
+    :param metadata: metadata of the current results (see machine_metadata)
+    :param baseline_metadata: metadata of the baseline results
+    :param ignore_cpu_count: if True, only warn (rather than raise) if the CPU counts differ
+    :return: list of (name, baseline wall time, current wall time, ratio, is_regression) for every benchmark in both
+    :raises ValueError: if the results and the baseline were recorded with different numbers of CPUs"""
+    if metadata is not None and baseline_metadata is not None:
+        cpu_count, baseline_cpu_count = metadata.get('cpu_count'), baseline_metadata.get('cpu_count')
+        if cpu_count != baseline_cpu_count:
+            message = f"The baseline was recorded with {baseline_cpu_count} CPUs, but these results with {cpu_count}"
+            if not ignore_cpu_count:
+                raise ValueError(f"{message}. Record a baseline on this machine, or ignore the CPU count "
+                                 f"(--ignore-cpu-count) to compare anyway")
+            warnings.warn(f"{message}, so the parallel benchmarks are not comparable")
+
+    comparisons = []
+    for name in sorted(results.keys() & baseline.keys()):
+        if 'wall_time' not in results[name] or 'wall_time' not in baseline[name]:
+            continue  # skipped benchmarks
+        baseline_time, current_time = baseline[name]['wall_time'], results[name]['wall_time']
+        ratio = current_time / baseline_time if baseline_time > 0 else float('inf')
+        is_regression = current_time > baseline_time * (1 + tolerance) and current_time - baseline_time > min_seconds
+        comparisons.append((name, baseline_time, current_time, ratio, is_regression))
+    return comparisons
+
+
+def format_table(header, rows):
+    """Formats :rows: (lists of strings or numbers) under :header: as a plain text table"""
+    rows = [[f"{value:.4g}" if isinstance(value, float) else str(value) for value in row] for row in rows]
+    widths = [max(len(str(cell)) for cell in column) for column in zip(header, *rows)]
+    lines = ["  ".join(f"{cell:<{width}}" for cell, width in zip(header, widths)),
+             "  ".join("-" * width for width in widths)]
+    lines.extend("  ".join(f"{cell:<{width}}" for cell, width in zip(row, widths)) for row in rows)
+    return "\n".join(lines)
+
+
+def interlayer_graph(num_nodes_per_layer, num_layers, model):
+    """Returns the directed interlayer graph connecting each node to its copies in other layers: in the next layer for
+    the 'temporal' and 'multilevel' models and in every other layer for the 'multiplex' model"""
+    if model in ('temporal', 'multilevel'):
+        layer_pairs = [(layer, layer + 1) for layer in range(num_layers - 1)]
+    elif model == 'multiplex':
+        layer_pairs = [(layer_start, layer_end) for layer_start in range(num_layers) for layer_end in range(num_layers)
+                       if layer_start != layer_end]
+    else:
+        raise ValueError(f"Model {model} is not temporal, multilevel, or multiplex")
+
+    interlayer_edges = [(num_nodes_per_layer * layer_start + v, num_nodes_per_layer * layer_end + v)
+                        for layer_start, layer_end in layer_pairs for v in range(num_nodes_per_layer)]
+    return ig.Graph(n=num_nodes_per_layer * num_layers, edges=interlayer_edges, directed=True)
+
+
+def fit_scaling_exponents(sizes, times):
+    """Fits times ~ c * size_1^b_1 * size_2^b_2 * ... by least squares on a log-log scale.
+
+    :param sizes: (num_runs x num_size_variables) array of the sizes of each run (e.g. columns of N and T)
+    :param times: array of the time of each run
+    :return: (array of the exponents b_i, coefficient of determination R^2 of the fit), or None if there are too few
+             runs with a positive time to fit every exponent"""
+    sizes, times = np.asarray(sizes, dtype=np.float64), np.asarray(times, dtype=np.float64)
+    valid = times > 0
+    if valid.sum() <= sizes.shape[1]:
+        return None
+
+    # dropping size variables that never vary keeps the fit well-posed, e.g. when only N is varied
+    varying = np.ptp(np.log(sizes[valid]), axis=0) > 0
+    design = np.column_stack((np.ones(valid.sum()), np.log(sizes[valid][:, varying])))
+    log_times = np.log(times[valid])
+    coefficients = np.linalg.lstsq(design, log_times, rcond=None)[0]
+
+    exponents = np.full(sizes.shape[1], np.nan)
+    exponents[varying] = coefficients[1:]
+    residual = log_times - design @ coefficients
+    total = log_times - log_times.mean()
+    r_squared = 1 - residual @ residual / (total @ total) if total @ total > 0 else 1.0
+    return exponents, float(r_squared)
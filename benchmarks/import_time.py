@@ -0,0 +1,83 @@
+"""Benchmark of the time taken to import this package's modules in a fresh interpreter.
+
+Heavy dependencies are imported lazily, on first use. To show what that saves, each module is also timed with those
+dependencies imported eagerly alongside it, which is what importing the package cost before they were deferred. Run
+from the repository root, e.g.
+
+    python -m benchmarks.import_time --repeats 5 --output import_time.json
+"""
+from .benchmark_utilities import machine_metadata, format_table
+import argparse
+import json
+import subprocess
+import sys
+
+MODULES = ['modularitypruning', 'modularitypruning.louvain_utilities', 'modularitypruning.champ_utilities',
+           'modularitypruning.parameter_estimation', 'modularitypruning.plotting']
+
+# dependencies that the package defers to first use
+DEFERRED_DEPENDENCIES = ['louvain', 'champ', 'psutil', 'scipy.linalg', 'scipy.optimize', 'scipy.spatial',
+                         'sklearn.metrics', 'matplotlib.pyplot', 'seaborn']
+
+TIMING_SCRIPT = """
+import importlib, json, sys
+from time import perf_counter
+start = perf_counter()
+importlib.import_module({module!r})
+for dependency in {dependencies!r}:
+    try:
+        importlib.import_module(dependency)
+    except ImportError:
+        pass
+elapsed = perf_counter() - start
+print(json.dumps({{'time': elapsed, 'loaded': [name for name in {deferred!r} if name in sys.modules]}}))
+"""
+
+
+def time_import(module, eager=False, repeats=3):
+    """Times importing :module: in fresh interpreters.
+
+    :param module: name of the module to import
+    :param eager: if True, also import every deferred dependency, as the package did before they were deferred
+    :param repeats: number of fresh interpreters to time the import in (the best time is reported)
+    :return: (best import time in seconds, list of the deferred dependencies loaded by the import)"""
+    dependencies = DEFERRED_DEPENDENCIES if eager else []
+    script = TIMING_SCRIPT.format(module=module, dependencies=dependencies, deferred=DEFERRED_DEPENDENCIES)
+    times, loaded = [], []
+    for _ in range(repeats):
+        output = subprocess.run([sys.executable, "-c", script], check=True, capture_output=True, text=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        times.append(result['time'])
+        loaded = result['loaded']
+    return min(times), loaded
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measures the import time of this package's modules, with heavy "
+                                                 "dependencies deferred and imported eagerly")
+    parser.add_argument('--modules', nargs='+', default=MODULES, help="modules to import")
+    parser.add_argument('--repeats', type=int, default=3, help="number of fresh interpreters to time each import in")
+    parser.add_argument('--output', default=None, help="path of a JSON file to write the results to")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for module in args.modules:
+        print(f"Timing import of {module}...", file=sys.stderr, flush=True)
+        lazy_time, loaded = time_import(module, repeats=args.repeats)
+        eager_time, _ = time_import(module, eager=True, repeats=args.repeats)
+        results[module] = {'lazy_time': lazy_time, 'eager_time': eager_time, 'loaded_dependencies': loaded}
+
+    print(format_table(["module", "lazy (s)", "eager (s)", "speedup", "deferred dependencies loaded"],
+                       [[module, result['lazy_time'], result['eager_time'],
+                         result['eager_time'] / result['lazy_time'] if result['lazy_time'] > 0 else float('inf'),
+                         ", ".join(result['loaded_dependencies']) or "none"] for module, result in results.items()]))
+
+    if args.output is not None:
+        with open(args.output, 'w') as file:
+            json.dump({'metadata': dict(machine_metadata(), repeats=args.repeats), 'imports': results}, file, indent=2,
+                      sort_keys=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
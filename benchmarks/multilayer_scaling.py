@@ -0,0 +1,168 @@
+"""Scaling benchmark of the multilayer pipeline over the number of nodes per layer N and the number of layers T.
+
+For each model and (N, T), this generates a multilayer SBM, runs the full Louvain sweep -> CHAMP_3D -> (gamma, omega)
+estimates -> stable partitions pipeline, and records the time and memory of each stage. Empirical scaling exponents
+of each stage's time in N and T are then fit across the grid. Run from the repository root, e.g.
+
+    python -m benchmarks.multilayer_scaling --N 25 50 100 --T 4 8 16 --output multilayer_scaling.json
+
+This requires a version of louvain that supports multilayer optimization.
+"""
+from .benchmark_utilities import machine_metadata, format_table, interlayer_graph, fit_scaling_exponents
+from modularitypruning.champ_utilities import CHAMP_3D
+from modularitypruning.instrumentation import record_stages, stage
+from modularitypruning.louvain_utilities import repeated_parallel_louvain_from_gammas_omegas, \
+    check_multilayer_louvain_capabilities
+from modularitypruning.parameter_estimation_utilities import domains_to_gamma_omega_estimates, \
+    gamma_omega_estimates_to_stable_partitions
+import argparse
+import igraph as ig
+import json
+import numpy as np
+import sys
+
+GAMMA_RANGE = (0.0, 2.0)
+OMEGA_RANGE = (0.0, 2.0)
+MODELS = ['temporal', 'multilevel', 'multiplex']
+
+# stages reported for each run, as recorded by modularitypruning.instrumentation
+STAGES = ['multilayer_louvain_sweep', 'coefficients_3D', 'halfspace_intersection_3D', 'CHAMP_3D',
+          'gamma_omega_estimates', 'stable_partitions', 'pipeline']
+
+
+def multilayer_SBM(N, T, model, rng, num_communities=3, copying_probability=0.9, p_in=0.25, p_out=0.05):
+    """Generates a multilayer SBM as in tests.shared_testing_functions.generate_multilayer_intralayer_SBM, but with
+    vectorized edge sampling so that large N and T remain practical.
+
+    Each node keeps its community from the previous layer with probability :copying_probability: and is otherwise
+    assigned a random community. Within each layer, nodes are connected with probability :p_in: if they are in the same
+    community and :p_out: otherwise.
+
+    :return: G_intralayer, G_interlayer, layer_vec"""
+    labels = np.empty((T, N), dtype=np.int64)
+    labels[0] = np.arange(N) % num_communities
+    for layer in range(1, T):
+        copied = rng.random(N) < copying_probability
+        labels[layer] = np.where(copied, labels[layer - 1], rng.integers(0, num_communities, size=N))
+
+    upper_i, upper_j = np.triu_indices(N, 1)
+    intralayer_edges = []
+    for layer in range(T):
+        same_community = labels[layer, upper_i] == labels[layer, upper_j]
+        present = rng.random(len(upper_i)) < np.where(same_community, p_in, p_out)
+        intralayer_edges.append(np.column_stack((upper_i[present], upper_j[present])) + N * layer)
+
+    G_intralayer = ig.Graph(n=N * T, edges=np.concatenate(intralayer_edges).tolist(), directed=False)
+    layer_vec = [layer for layer in range(T) for _ in range(N)]
+    return G_intralayer, interlayer_graph(N, T, model), layer_vec
+
+
+def run_pipeline(G_intralayer, G_interlayer, layer_vec, model, gammas, omegas):
+    """Runs the multilayer pipeline, recording its stages.
+
+    :return: (dict of {stage: {wall_time, cpu_time, peak_rss, peak_rss_increase}}, dict of run statistics)"""
+    with record_stages() as recorder:
+        with stage("pipeline"):
+            partitions, worker_peak_rss = repeated_parallel_louvain_from_gammas_omegas(
+                G_intralayer, G_interlayer, layer_vec, gammas, omegas, show_progress=False, return_worker_peak_rss=True)
+            partitions = list(partitions)
+
+            with stage("CHAMP_3D", items=len(partitions)):
+                domains = CHAMP_3D(G_intralayer, G_interlayer, layer_vec, partitions, *GAMMA_RANGE, *OMEGA_RANGE)
+
+            domains_with_estimates = domains_to_gamma_omega_estimates(G_intralayer, G_interlayer, layer_vec, domains,
+                                                                      model=model)
+
+            with stage("stable_partitions", items=len(domains_with_estimates)):
+                stable_partitions = gamma_omega_estimates_to_stable_partitions(domains_with_estimates)
+
+    stages = {}
+    for span in recorder.spans:
+        totals = stages.setdefault(span['name'], {'wall_time': 0.0, 'cpu_time': 0.0, 'peak_rss': 0,
+                                                  'peak_rss_increase': 0})
+        totals['wall_time'] += span['wall_time']
+        totals['cpu_time'] += span['cpu_time']
+        totals['peak_rss'] = max(totals['peak_rss'], span['peak_rss'])
+        totals['peak_rss_increase'] = max(totals['peak_rss_increase'], span['peak_rss_increase'])
+
+    statistics = {'num_partitions': len(partitions), 'num_domains': len(domains),
+                  'num_stable_partitions': len(stable_partitions),
+                  'worker_peak_rss': max(worker_peak_rss.values(), default=0)}
+    return stages, statistics
+
+
+def fit_exponents(runs):
+    """Fits the scaling exponents in N and T of each stage's wall time, separately for each model.
+
+    :return: dict of {model: {stage: {'N': exponent, 'T': exponent, 'r_squared': R^2}}}, where exponents are None if
+             the corresponding size was not varied"""
+    exponents = {}
+    for model in sorted({run['model'] for run in runs}):
+        model_runs = [run for run in runs if run['model'] == model]
+        sizes = [(run['N'], run['T']) for run in model_runs]
+        for stage_name in STAGES:
+            times = [run['stages'].get(stage_name, {}).get('wall_time', 0.0) for run in model_runs]
+            fit = fit_scaling_exponents(sizes, times)
+            if fit is None:
+                continue
+            (N_exponent, T_exponent), r_squared = fit
+            exponents.setdefault(model, {})[stage_name] = {
+                'N': None if np.isnan(N_exponent) else float(N_exponent),
+                'T': None if np.isnan(T_exponent) else float(T_exponent),
+                'r_squared': r_squared}
+    return exponents
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measures how the multilayer pipeline scales with the number of "
+                                                 "nodes per layer N and number of layers T")
+    parser.add_argument('--models', nargs='+', choices=MODELS, default=MODELS, help="multilayer models to run")
+    parser.add_argument('--N', type=int, nargs='+', default=[25, 50, 100], help="numbers of nodes per layer")
+    parser.add_argument('--T', type=int, nargs='+', default=[4, 8, 16], help="numbers of layers")
+    parser.add_argument('--num-gammas', type=int, default=10, help="number of gammas in the Louvain sweep")
+    parser.add_argument('--num-omegas', type=int, default=10, help="number of omegas in the Louvain sweep")
+    parser.add_argument('--seed', type=int, default=0, help="random seed of the generated networks")
+    parser.add_argument('--output', default=None, help="path of a JSON file to write the results to")
+    args = parser.parse_args(argv)
+
+    if not check_multilayer_louvain_capabilities(fatal=False):
+        print("This version of louvain does not support multilayer optimization, so the multilayer pipeline cannot be "
+              "benchmarked", file=sys.stderr)
+        return 1
+
+    rng = np.random.default_rng(args.seed)
+    gammas = np.linspace(*GAMMA_RANGE, args.num_gammas)
+    omegas = np.linspace(*OMEGA_RANGE, args.num_omegas)
+
+    runs = []
+    for model in args.models:
+        for N in args.N:
+            for T in args.T:
+                print(f"Running {model} N={N} T={T}...", file=sys.stderr, flush=True)
+                G_intralayer, G_interlayer, layer_vec = multilayer_SBM(N, T, model, rng)
+                stages, statistics = run_pipeline(G_intralayer, G_interlayer, layer_vec, model, gammas, omegas)
+                runs.append(dict(statistics, model=model, N=N, T=T, intralayer_edges=G_intralayer.ecount(),
+                                 interlayer_edges=G_interlayer.ecount(), stages=stages))
+
+    exponents = fit_exponents(runs)
+
+    print(format_table(["model", "N", "T"] + [f"{name} (s)" for name in STAGES] + ["peak RSS (MB)", "stable"],
+                       [[run['model'], run['N'], run['T']] +
+                        [run['stages'].get(name, {}).get('wall_time', 0.0) for name in STAGES] +
+                        [max(run['stages']['pipeline']['peak_rss'], run['worker_peak_rss']) / 2 ** 20,
+                         run['num_stable_partitions']] for run in runs]))
+    print()
+    print(format_table(["model", "stage", "N exponent", "T exponent", "R^2"],
+                       [[model, name, "" if fit['N'] is None else fit['N'], "" if fit['T'] is None else fit['T'],
+                         fit['r_squared']]
+                        for model, stage_fits in exponents.items() for name, fit in stage_fits.items()]))
+
+    if args.output is not None:
+        metadata = dict(machine_metadata(), num_gammas=args.num_gammas, num_omegas=args.num_omegas, seed=args.seed)
+        with open(args.output, 'w') as file:
+            json.dump({'metadata': metadata, 'runs': runs, 'exponents': exponents}, file, indent=2, sort_keys=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,206 @@
+"""Benchmarks of the main stages of the pruning pipeline on synthetic networks.
+
+Run from the repository root, e.g.
+
+    python -m benchmarks.pipeline_benchmarks --size small --output results.json
+    python -m benchmarks.pipeline_benchmarks --size small --baseline benchmarks/baseline.json
+
+When given a baseline, the benchmarks are compared against it and the exit status is nonzero if any of them regressed.
+Baselines are only comparable on machines with the same number of CPUs (see --ignore-cpu-count); the checked-in
+benchmarks/baseline.json was recorded on a single CPU.
+"""
+from .benchmark_utilities import measure, machine_metadata, write_results, load_results, compare_to_baseline, \
+    format_table, interlayer_graph, DEFAULT_REGRESSION_TOLERANCE
+from tests.shared_testing_functions import generate_connected_ER, generate_multilayer_intralayer_SBM
+from modularitypruning.champ_utilities import partition_coefficients_2D, partition_coefficients_3D, CHAMP_2D, \
+    CHAMP_3D
+from modularitypruning.louvain_utilities import repeated_parallel_louvain_from_gammas, \
+    repeated_parallel_louvain_from_gammas_omegas, check_multilayer_louvain_capabilities
+from modularitypruning.parameter_estimation_utilities import ranges_to_gamma_estimates, \
+    domains_to_gamma_omega_estimates
+import argparse
+import igraph as ig
+import numpy as np
+import random
+import sys
+
+GAMMA_RANGE = (0.0, 2.0)
+OMEGA_RANGE = (0.0, 2.0)
+MAX_RANDOM_COMMUNITIES = 8
+
+# n and num_partitions describe the singlelayer networks and their random partitions, and num_gammas the resolution
+# parameters of their Louvain sweeps. N and T are the nodes per layer and layers of the multilayer networks, whose
+# sweeps run on a grid of num_multilayer_gammas x num_omegas resolution parameters
+SIZES = {
+    'small': {'n': 200, 'num_partitions': 200, 'num_gammas': 100, 'N': 30, 'T': 4, 'num_multilayer_gammas': 5,
+              'num_omegas': 5},
+    'medium': {'n': 1000, 'num_partitions': 1000, 'num_gammas': 500, 'N': 60, 'T': 8, 'num_multilayer_gammas': 10,
+               'num_omegas': 10},
+    'large': {'n': 5000, 'num_partitions': 2000, 'num_gammas': 1000, 'N': 100, 'T': 16, 'num_multilayer_gammas': 15,
+              'num_omegas': 15},
+}
+
+
+def singlelayer_networks(n):
+    """Returns a dict of {name: graph} of the singlelayer benchmark networks with :n: nodes"""
+    q = 4  # as in Newman's synthetic networks, with ~16 edges per node within and ~8 edges per node between groups
+    p_in = 16 / (n / q - 1)
+    p_out = 8 / (n - n / q)
+    pref_matrix = [[p_in if i == j else p_out for j in range(q)] for i in range(q)]
+    return {'ER': generate_connected_ER(n=n, m=5 * n, directed=False),
+            'SBM': ig.Graph.SBM(n, pref_matrix, [n // q] * (q - 1) + [n - (q - 1) * (n // q)])}
+
+
+def multilayer_networks(N, T):
+    """Returns a dict of {name: (G_intralayer, G_interlayer, layer_vec, model)} of the multilayer benchmark networks
+    with :N: nodes per layer and :T: layers"""
+    networks = {}
+    for model in ['temporal', 'multiplex']:
+        first_layer_membership = [v % 3 for v in range(N)]
+        G_intralayer, layer_vec = generate_multilayer_intralayer_SBM(copying_probability=0.9, p_in=0.25, p_out=0.05,
+                                                                     first_layer_membership=first_layer_membership,
+                                                                     num_layers=T)
+        # the last nodes may be isolated, in which case igraph leaves them out
+        G_intralayer.add_vertices(N * T - G_intralayer.vcount())
+        networks[model] = (G_intralayer, interlayer_graph(N, T, model), layer_vec, model)
+    return networks
+
+
+def random_partitions(num_nodes, num_partitions, rng):
+    """Returns a (:num_partitions: x :num_nodes:) membership matrix of random partitions into at most
+    MAX_RANDOM_COMMUNITIES communities"""
+    num_communities = rng.integers(1, MAX_RANDOM_COMMUNITIES + 1, size=(num_partitions, 1))
+    return (rng.random((num_partitions, num_nodes)) * num_communities).astype(np.int64)
+
+
+def run_benchmarks(size, repeats=1, name_filter=None, seed=0):
+    """Runs the benchmarks at :size: (a key of SIZES).
+
+    :param size: benchmark size
+    :param repeats: number of timed runs of each benchmark (the best is reported)
+    :param name_filter: if not None, only run benchmarks whose names contain this string
+    :param seed: random seed used to generate the networks and partitions
+    :return: dict of {benchmark name: measurement}, where skipped benchmarks only hold the reason they were skipped"""
+    parameters = SIZES[size]
+    random.seed(seed)
+    rng = np.random.default_rng(seed)
+    results = {}
+
+    def benchmark(name, function, items=None):
+        if name_filter is not None and name_filter not in name:
+            return None
+        print(f"Running {name}...", file=sys.stderr, flush=True)
+        result, measurement = measure(function, repeats=repeats)
+        if items is not None:
+            measurement['items'] = items
+        results[name] = measurement
+        return result
+
+    def skip(name, reason):
+        if name_filter is None or name_filter in name:
+            results[name] = {'skipped': reason}
+
+    gammas = np.linspace(*GAMMA_RANGE, parameters['num_gammas'])
+    for network_name, G in singlelayer_networks(parameters['n']).items():
+        suffix = f"[{network_name} n={G.vcount()} m={G.ecount()}]"
+        partitions = random_partitions(G.vcount(), parameters['num_partitions'], rng)
+        benchmark(f"partition_coefficients_2D{suffix}",
+                  lambda: partition_coefficients_2D(G, partitions, single_threaded=True), items=len(partitions))
+
+        sweep_partitions = benchmark(f"repeated_parallel_louvain_from_gammas{suffix}",
+                                     lambda: repeated_parallel_louvain_from_gammas(G, gammas, show_progress=False),
+                                     items=len(gammas))
+        if sweep_partitions is None:
+            sweep_partitions = repeated_parallel_louvain_from_gammas(G, gammas, show_progress=False)
+
+        ranges = benchmark(f"CHAMP_2D{suffix}", lambda: CHAMP_2D(G, sweep_partitions, *GAMMA_RANGE),
+                           items=len(sweep_partitions))
+        if ranges is None:
+            ranges = CHAMP_2D(G, sweep_partitions, *GAMMA_RANGE)
+        benchmark(f"ranges_to_gamma_estimates{suffix}", lambda: ranges_to_gamma_estimates(G, ranges),
+                  items=len(ranges))
+
+    gammas = np.linspace(*GAMMA_RANGE, parameters['num_multilayer_gammas'])
+    omegas = np.linspace(*OMEGA_RANGE, parameters['num_omegas'])
+    for network_name, (G_intralayer, G_interlayer, layer_vec, model) in \
+            multilayer_networks(parameters['N'], parameters['T']).items():
+        suffix = f"[{network_name} N={parameters['N']} T={parameters['T']}]"
+        partitions = random_partitions(G_intralayer.vcount(), parameters['num_partitions'], rng)
+        benchmark(f"partition_coefficients_3D{suffix}",
+                  lambda: partition_coefficients_3D(G_intralayer, G_interlayer, layer_vec, partitions,
+                                                    single_threaded=True),
+                  items=len(partitions))
+
+        sweep_name = f"repeated_parallel_louvain_from_gammas_omegas{suffix}"
+        if check_multilayer_louvain_capabilities(fatal=False):
+            sweep_partitions = benchmark(sweep_name, lambda: repeated_parallel_louvain_from_gammas_omegas(
+                G_intralayer, G_interlayer, layer_vec, gammas, omegas, show_progress=False),
+                items=len(gammas) * len(omegas))
+            if sweep_partitions is None:
+                sweep_partitions = repeated_parallel_louvain_from_gammas_omegas(G_intralayer, G_interlayer, layer_vec,
+                                                                                gammas, omegas, show_progress=False)
+            sweep_partitions = list(sweep_partitions)
+        else:
+            # CHAMP is then run on random partitions, so its timings are not comparable to those of real sweeps
+            skip(sweep_name, "this version of louvain does not support multilayer optimization")
+            sweep_partitions = [tuple(partition) for partition in partitions.tolist()]
+            suffix = suffix[:-1] + " random partitions]"
+
+        domains = benchmark(f"CHAMP_3D{suffix}", lambda: CHAMP_3D(G_intralayer, G_interlayer, layer_vec,
+                                                                  sweep_partitions, *GAMMA_RANGE, *OMEGA_RANGE),
+                            items=len(sweep_partitions))
+        if domains is None:
+            domains = CHAMP_3D(G_intralayer, G_interlayer, layer_vec, sweep_partitions, *GAMMA_RANGE, *OMEGA_RANGE)
+        benchmark(f"domains_to_gamma_omega_estimates{suffix}",
+                  lambda: domains_to_gamma_omega_estimates(G_intralayer, G_interlayer, layer_vec, domains, model=model),
+                  items=len(domains))
+
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks the stages of the pruning pipeline on synthetic networks")
+    parser.add_argument('--size', choices=sorted(SIZES), default='small', help="size of the benchmark inputs")
+    parser.add_argument('--repeats', type=int, default=3, help="number of timed runs of each benchmark")
+    parser.add_argument('--filter', default=None, help="only run benchmarks whose names contain this string")
+    parser.add_argument('--output', default=None, help="path of a JSON file to write the results to")
+    parser.add_argument('--baseline', default=None, help="path of a JSON file of baseline results to compare to")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_REGRESSION_TOLERANCE,
+                        help="relative slowdown beyond which a benchmark is flagged as a regression")
+    parser.add_argument('--ignore-cpu-count', action='store_true',
+                        help="compare to a baseline recorded with a different number of CPUs (with a warning)")
+    args = parser.parse_args(argv)
+
+    metadata = dict(machine_metadata(), size=args.size, repeats=args.repeats)
+    results = run_benchmarks(args.size, repeats=args.repeats, name_filter=args.filter)
+
+    rows = [[name, measurement.get('wall_time', "skipped"), measurement.get('cpu_time', ""),
+             measurement.get('items', "")] for name, measurement in sorted(results.items())]
+    print(format_table(["benchmark", "wall time (s)", "CPU time (s)", "items"], rows))
+
+    if args.output is not None:
+        write_results(args.output, results, metadata)
+
+    if args.baseline is not None:
+        baseline_metadata, baseline = load_results(args.baseline)
+        try:
+            comparisons = compare_to_baseline(results, baseline, tolerance=args.tolerance, metadata=metadata,
+                                              baseline_metadata=baseline_metadata,
+                                              ignore_cpu_count=args.ignore_cpu_count)
+        except ValueError as error:
+            print(f"\n{error}")
+            return 2
+        print(f"\nComparison to baseline from {baseline_metadata.get('timestamp')} "
+              f"({baseline_metadata.get('cpu_count')} CPUs, size {baseline_metadata.get('size')}):")
+        print(format_table(["benchmark", "baseline (s)", "current (s)", "ratio", ""],
+                           [[name, baseline_time, current_time, ratio, "REGRESSION" if is_regression else ""]
+                            for name, baseline_time, current_time, ratio, is_regression in comparisons]))
+        regressions = [name for name, *_, is_regression in comparisons if is_regression]
+        if regressions:
+            print(f"\n{len(regressions)} benchmark(s) regressed by more than {100 * args.tolerance:.0f}%")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,7 +8,8 @@ from networkx.exception import ExceededMaxIterations
 import numpy as np
 from modularitypruning.louvain_utilities import repeated_louvain_from_gammas
 from modularitypruning.parameter_estimation_utilities import gamma_estimate, prune_to_stable_partitions
-from modularitypruning.partition_utilities import nmi, num_communities
+from modularitypruning.partition_similarity import similarities_to
+from modularitypruning.partition_utilities import num_communities
 from modularitypruning.progress import Progress
 import igraph as ig
 import pickle
@@ -125,15 +126,15 @@ def run_method(G, ground_truth_communities, num_louvain_runs, method, gamma_swee
     if method == "modularity pruning":
         stable_parts = prune_to_stable_partitions(G, parts, gamma_start=gammas[0], gamma_end=gammas[-1],
                                                   single_threaded=True)
-        nmis = [nmi(ground_truth_communities, p) for p in stable_parts]
+        nmis = similarities_to(ground_truth_communities, stable_parts, single_threaded=True).tolist()
     elif method == "modularity pruning ground truth K":
         ground_truth_K = num_communities(ground_truth_communities)
         stable_parts = prune_to_stable_partitions(G, parts, gamma_start=gammas[0], gamma_end=gammas[-1],
                                                   restrict_num_communities=ground_truth_K,
                                                   single_threaded=True)
-        nmis = [nmi(ground_truth_communities, p) for p in stable_parts]
+        nmis = similarities_to(ground_truth_communities, stable_parts, single_threaded=True).tolist()
     else:  # method == "gamma sweep" or method == "ground truth gamma":
-        nmis = [nmi(ground_truth_communities, p) for p in parts]
+        nmis = similarities_to(ground_truth_communities, parts, single_threaded=True).tolist()
 
     return nmis
 
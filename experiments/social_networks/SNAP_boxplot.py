@@ -1,10 +1,10 @@
 # Generates figure 6.4
 
 import glob
-import igraph as ig
 import os
 import louvain
 from multiprocessing import Pool, cpu_count
+from modularitypruning.graph_utilities import load_edge_list_graph
 from modularitypruning.louvain_utilities import sorted_tuple
 from modularitypruning.parameter_estimation_utilities import gamma_estimate
 from modularitypruning.parameter_estimation_utilities import gamma_estimate_from_parameters as gamma
@@ -18,16 +18,11 @@ K_MAX = 71
 
 
 def read_file(filename, format):
-    with open(filename) as file:
-        lines = file.readlines()
+    # the giant component is cached next to each file, so only the first run parses the edge list
     if format == "tsv":
-        edges = [tuple(int(x) for x in line.split()) for line in lines if len(line) and line[0] != '#']
-        G = ig.Graph(edges, directed=False)
-        return G.clusters().giant()
+        return load_edge_list_graph(filename, directed=False)
     elif format == "csv":
-        edges = [tuple(int(x) for x in line.split(",")) for line in lines if len(line) and "node" not in line]
-        G = ig.Graph(edges, directed=False)
-        return G.clusters().giant()
+        return load_edge_list_graph(filename, delimiter=",", directed=False, skip_header=True)
     else:
         return None
 
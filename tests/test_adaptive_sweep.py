@@ -0,0 +1,122 @@
+from .shared_testing_functions import generate_connected_multilayer_ER
+from modularitypruning.adaptive_sweep import adaptive_louvain_from_gammas_omegas, _refine_resolution_grid
+from modularitypruning.louvain_utilities import check_multilayer_louvain_capabilities, \
+    repeated_louvain_from_gammas_omegas
+from random import seed
+from unittest import mock
+import numpy as np
+import unittest
+
+
+def banded_louvain(G_intralayer, G_interlayer, layer_vec, gamma, omega):
+    # deterministic stand-in for multilayer_louvain whose partitions change with both gamma and omega
+    num_communities = 1 + int(3 * gamma) + 2 * int(2 * omega)
+    return tuple(v % num_communities for v in range(G_intralayer.vcount()))
+
+
+class TestAdaptiveSweep(unittest.TestCase):
+    def synthetic_domains(self, random_state, num_partitions=30):
+        # partitions with random CHAMP coefficients, so that the "louvain" result at (gamma, omega) is exactly the
+        # optimal partition there
+        A_hats, P_hats, C_hats = (random_state.uniform(0, 10, num_partitions) for _ in range(3))
+
+        def optimal(gammas, omegas, ids=None):
+            ids = np.arange(num_partitions) if ids is None else np.array(sorted(ids))
+            qualities = A_hats[ids] - np.outer(gammas, P_hats[ids]) + np.outer(omegas, C_hats[ids])
+            return ids[np.argmax(qualities, axis=1)]
+
+        return optimal
+
+    def test_refinement_finds_dense_grid_domains(self):
+        for random_seed in range(5):
+            optimal = self.synthetic_domains(np.random.RandomState(random_seed))
+            gammas, omegas = np.meshgrid(np.linspace(0, 2, 200), np.linspace(0, 2, 200))
+            dense_partitions = set(optimal(gammas.ravel(), omegas.ravel()).tolist())
+
+            found = set()
+
+            def evaluate(points):
+                points = np.array(points)
+                ids = optimal(points[:, 0], points[:, 1]).tolist()
+                found.update(ids)
+                return ids
+
+            samples = _refine_resolution_grid(evaluate, (0, 2), (0, 2), initial_grid_size=(9, 9), refinement_levels=5,
+                                              max_runs=None,
+                                              optimal_partitions=lambda g, o: optimal(g, o, ids=found))
+            self.assertEqual(set(samples.values()), dense_partitions)
+            self.assertLess(len(samples), 0.1 * gammas.size)
+
+            # samples are exactly the partitions at their points
+            points = np.array(list(samples))
+            self.assertEqual(optimal(points[:, 0], points[:, 1]).tolist(), list(samples.values()))
+
+    def test_refinement_without_differences_or_budget(self):
+        optimal = self.synthetic_domains(np.random.RandomState(0))
+
+        def evaluate(points):
+            points = np.array(points)
+            return optimal(points[:, 0], points[:, 1]).tolist()
+
+        # a constant partition is never refined
+        samples = _refine_resolution_grid(lambda points: [0] * len(points), (0, 1), (0, 1), (5, 4), 5, None)
+        self.assertEqual(len(samples), 5 * 4)
+        self.assertEqual(sorted({gamma for gamma, _ in samples}), np.linspace(0, 1, 5).tolist())
+
+        samples = _refine_resolution_grid(evaluate, (0, 2), (0, 2), (9, 9), 5, max_runs=200)
+        self.assertEqual(len(samples), 200)
+
+        # each axis is refined only down to its own level
+        samples = _refine_resolution_grid(evaluate, (0, 2), (0, 2), (9, 9), (3, 0), None)
+        self.assertTrue({omega for _, omega in samples} <= set(np.linspace(0, 2, 9).tolist()))
+        self.assertTrue({gamma for gamma, _ in samples} <= set(np.linspace(0, 2, 8 * 2 ** 3 + 1).tolist()))
+        self.assertGreater(len({gamma for gamma, _ in samples}), 9)
+
+        with self.assertRaises(ValueError):
+            _refine_resolution_grid(evaluate, (0, 2), (0, 2), (1, 9), 5, None)
+
+    def test_adaptive_louvain_matches_dense_grid(self):
+        if not check_multilayer_louvain_capabilities(fatal=False):
+            # just return since this version of louvain is unable to perform multilayer optimization anyway
+            return
+
+        G_intralayer, G_interlayer, layer_vec = generate_connected_multilayer_ER(num_nodes_per_layer=30, m=300,
+                                                                                 num_layers=3, directed=False)
+        store, samples = adaptive_louvain_from_gammas_omegas(G_intralayer, G_interlayer, layer_vec, (0.0, 2.0),
+                                                             (0.0, 2.0), initial_grid_size=(5, 5),
+                                                             min_cell_size=(0.05, 0.05), single_threaded=True,
+                                                             return_samples=True)
+        self.assertEqual(len(set(samples.values())), len(store))
+        dense = repeated_louvain_from_gammas_omegas(G_intralayer, G_interlayer, layer_vec, np.linspace(0, 2, 20),
+                                                    np.linspace(0, 2, 20))
+        self.assertGreater(len(store), 0.5 * len(dense))
+
+    def test_adaptive_louvain_pool_matches_single_threaded(self):
+        G_intralayer, G_interlayer, layer_vec = generate_connected_multilayer_ER(num_nodes_per_layer=20, m=100,
+                                                                                 num_layers=2, directed=False)
+        results = []
+        # the pool's workers are forked after patching, so they run the deterministic stand-in as well
+        with mock.patch('modularitypruning.louvain_utilities.multilayer_louvain', banded_louvain), \
+                mock.patch('modularitypruning.adaptive_sweep.multilayer_louvain', banded_louvain):
+            for single_threaded in [True, False]:
+                store, samples = adaptive_louvain_from_gammas_omegas(G_intralayer, G_interlayer, layer_vec,
+                                                                     (0.0, 2.0), (0.0, 2.0), initial_grid_size=(3, 3),
+                                                                     min_cell_size=(0.1, 0.25),
+                                                                     single_threaded=single_threaded,
+                                                                     return_samples=True)
+                results.append({point: tuple(store.memberships[i].tolist()) for point, i in samples.items()})
+
+        single_threaded_samples, pool_samples = results
+        self.assertEqual(pool_samples, single_threaded_samples)
+        dense = {banded_louvain(G_intralayer, G_interlayer, layer_vec, gamma, omega)
+                 for gamma in np.linspace(0, 2, 101) for omega in np.linspace(0, 2, 101)}
+        self.assertEqual(set(pool_samples.values()), dense)
+
+        # min_cell_size caps the refinement of each axis separately
+        self.assertTrue({omega for _, omega in pool_samples} <= set(np.linspace(0, 2, 2 * 2 ** 2 + 1).tolist()))
+        self.assertGreater(len({gamma for gamma, _ in pool_samples}), 2 * 2 ** 2 + 1)
+
+
+if __name__ == "__main__":
+    seed(0)
+    unittest.main()
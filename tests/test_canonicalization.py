@@ -0,0 +1,50 @@
+from .shared_testing_functions import generate_random_partitions
+from modularitypruning.louvain_utilities import sorted_tuple
+from modularitypruning.partition_utilities import canonical_membership, canonicalize_memberships
+from random import randint, seed
+import numpy as np
+import unittest
+
+
+def reference_canonical_form(membership):
+    relabeling = {}
+    for label in membership:
+        if label not in relabeling:
+            relabeling[label] = len(relabeling)
+    return tuple(relabeling[label] for label in membership)
+
+
+class TestCanonicalization(unittest.TestCase):
+    def test_canonical_membership_matches_reference(self):
+        for K_max in [1, 2, 10, 20]:
+            for membership in generate_random_partitions(num_nodes=200, num_partitions=50, K_max=K_max):
+                # also check arbitrary (non-contiguous and negative) labels
+                shuffled_labels = {label: randint(-10 ** 6, 10 ** 6) for label in set(membership)}
+                relabeled_membership = [shuffled_labels[label] for label in membership]
+                expected = reference_canonical_form(membership)
+
+                self.assertEqual(tuple(canonical_membership(membership).tolist()), expected)
+                self.assertEqual(tuple(canonical_membership(relabeled_membership).tolist()),
+                                 reference_canonical_form(relabeled_membership))
+                self.assertEqual(sorted_tuple(membership), expected)
+
+    def test_canonicalize_memberships_matches_rowwise(self):
+        for K_max in [1, 3, 10, 20]:
+            partitions = generate_random_partitions(num_nodes=150, num_partitions=100, K_max=K_max)
+            memberships = np.array(partitions) * 7 - 3  # non-canonical labels
+
+            canonical = canonicalize_memberships(memberships)
+            self.assertEqual(canonical.shape, memberships.shape)
+            self.assertEqual(canonical.dtype, np.int32)
+            for row, membership in zip(canonical.tolist(), partitions):
+                self.assertEqual(tuple(row), reference_canonical_form(membership))
+
+    def test_empty_inputs(self):
+        self.assertEqual(len(canonical_membership([])), 0)
+        self.assertEqual(canonicalize_memberships(np.zeros((0, 5), dtype=int)).shape, (0, 5))
+        self.assertEqual(canonicalize_memberships(np.zeros((3, 0), dtype=int)).shape, (3, 0))
+
+
+if __name__ == "__main__":
+    seed(0)
+    unittest.main()
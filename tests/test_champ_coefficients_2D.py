@@ -2,12 +2,13 @@ from .shared_testing_functions import generate_connected_ER, generate_random_val
     generate_igraph_famous
 from modularitypruning.champ_utilities import partition_coefficients_2D
 from modularitypruning.louvain_utilities import louvain_part_with_membership, repeated_louvain_from_gammas
+from modularitypruning.progress import SweepTelemetry
 from random import seed
 import unittest
 
 
 class TestCHAMPCoefficients2D(unittest.TestCase):
-    def assert_partition_coefficient_correctness(self, G, partitions, coefficients):
+    def assert_partition_coefficient_correctness(self, G, partitions, coefficients, places=10):
         A_hats, P_hats = coefficients
 
         for membership, A_hat, P_hat in zip(partitions, A_hats, P_hats):
@@ -22,8 +23,8 @@ class TestCHAMPCoefficients2D(unittest.TestCase):
             #   = P_hat
             louvain_P_hat = louvain_A_hat - louvain_part.quality(resolution_parameter=1)
 
-            self.assertAlmostEqual(A_hat, louvain_A_hat, places=10)
-            self.assertAlmostEqual(P_hat, louvain_P_hat, places=10)
+            self.assertAlmostEqual(A_hat, louvain_A_hat, places=places)
+            self.assertAlmostEqual(P_hat, louvain_P_hat, places=places)
 
     def assert_partition_coefficient_correctness_unweighted_ER(self, n=100, m=500, directed=False,
                                                                num_partitions=10, K_max=5):
@@ -32,6 +33,17 @@ class TestCHAMPCoefficients2D(unittest.TestCase):
         coefficients = partition_coefficients_2D(G, partitions)
         self.assert_partition_coefficient_correctness(G, partitions, coefficients)
 
+    def assert_partition_coefficient_correctness_weighted_ER(self, n=100, m=500, directed=False, num_partitions=10,
+                                                             K_max=5):
+        G = generate_connected_ER(n=n, m=m, directed=directed)
+        G.es['weight'] = generate_random_values(num_values=m, start_value=0.1, end_value=5.0)
+        partitions = generate_random_partitions(num_nodes=n, num_partitions=num_partitions, K_max=K_max)
+        coefficients = partition_coefficients_2D(G, partitions)
+        # weighted sums are accumulated in a different order than louvain's. With real-valued weights, the rounding
+        # error of coefficients in the thousands can exceed 1e-10 in absolute terms (unlike the exactly representable
+        # integer sums of unweighted graphs), so compare to places=8 (still ~1e-11 relative)
+        self.assert_partition_coefficient_correctness(G, partitions, coefficients, places=8)
+
     def test_partition_coefficient_correctness_undirected_unweighted_varying_n(self):
         for n in [50, 100, 250, 500]:
             self.assert_partition_coefficient_correctness_unweighted_ER(n=n, m=5 * n)
@@ -81,6 +93,29 @@ class TestCHAMPCoefficients2D(unittest.TestCase):
             coefficients = partition_coefficients_2D(G, partitions)
             self.assert_partition_coefficient_correctness(G, partitions, coefficients)
 
+    def test_partition_coefficient_correctness_undirected_weighted(self):
+        for n in [50, 100, 500]:
+            self.assert_partition_coefficient_correctness_weighted_ER(n=n, m=5 * n)
+
+    def test_partition_coefficient_correctness_directed_weighted(self):
+        for n in [50, 100, 500]:
+            self.assert_partition_coefficient_correctness_weighted_ER(n=n, m=10 * n, directed=True)
+
+    def test_partition_coefficient_telemetry(self):
+        G = generate_connected_ER(n=100, m=500, directed=False)
+        partitions = generate_random_partitions(num_nodes=100, num_partitions=200, K_max=5)
+
+        for single_threaded in [True, False]:
+            reports = []
+            telemetry = SweepTelemetry(callback=reports.append, interval=3600)
+            coefficients = partition_coefficients_2D(G, partitions, single_threaded=single_threaded,
+                                                     show_progress=telemetry)
+            self.assertEqual(len(coefficients[0]), len(partitions))
+            self.assertEqual(len(reports), 1)
+            self.assertEqual(reports[0]['completed'], len(partitions))
+            self.assertEqual(reports[0]['total'], len(partitions))
+            self.assertLessEqual(reports[0]['worker_utilization'], 1)
+
 
 if __name__ == "__main__":
     seed(0)
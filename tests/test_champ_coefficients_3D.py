@@ -1,4 +1,5 @@
-from .shared_testing_functions import generate_connected_multilayer_ER, generate_random_partitions
+from .shared_testing_functions import generate_connected_multilayer_ER, generate_random_partitions, \
+    generate_random_values
 from modularitypruning.champ_utilities import partition_coefficients_3D
 from modularitypruning.louvain_utilities import multilayer_louvain_part_with_membership, \
     check_multilayer_louvain_capabilities, louvain_part_with_membership
@@ -127,6 +128,37 @@ class TestCHAMPCoefficients3D(unittest.TestCase):
         self.assert_partition_coefficient_correctness(G_intralayer, G_interlayer, layer_membership, partitions,
                                                       coefficients)
 
+    def test_partition_coefficient_correctness_weighted(self):
+        """Test weighted partition coefficients against per-layer louvain qualities, which does not require multilayer
+        louvain."""
+        for directed in [False, True]:
+            G_intralayer, G_interlayer, layer_membership = generate_connected_multilayer_ER(
+                num_nodes_per_layer=50, m=2000, num_layers=5, directed=directed)
+            G_intralayer.es['weight'] = generate_random_values(G_intralayer.ecount(), start_value=0.1, end_value=5.0)
+            G_interlayer.es['weight'] = generate_random_values(G_interlayer.ecount(), start_value=0.1, end_value=5.0)
+            partitions = generate_random_partitions(num_nodes=G_intralayer.vcount(), num_partitions=10, K_max=10)
+            A_hats, P_hats, C_hats = partition_coefficients_3D(G_intralayer, G_interlayer, layer_membership,
+                                                               partitions)
+
+            for membership, A_hat, P_hat, C_hat in zip(partitions, A_hats, P_hats, C_hats):
+                expected_A_hat, expected_P_hat = 0, 0
+                for layer in set(layer_membership):
+                    this_layer_indices = [i for i, l in enumerate(layer_membership) if layer == l]
+                    layer_part = louvain_part_with_membership(G_intralayer.subgraph(this_layer_indices),
+                                                              [membership[i] for i in this_layer_indices])
+                    expected_A_hat += layer_part.quality(resolution_parameter=0.0)
+                    expected_P_hat += (layer_part.quality(resolution_parameter=0.0) -
+                                       layer_part.quality(resolution_parameter=1.0))
+
+                expected_C_hat = sum(e['weight'] for e in G_interlayer.es
+                                     if membership[e.source] == membership[e.target])
+                if not directed:
+                    expected_C_hat *= 2
+
+                self.assertAlmostEqual(A_hat, expected_A_hat, places=8)
+                self.assertAlmostEqual(P_hat, expected_P_hat, places=8)
+                self.assertAlmostEqual(C_hat, expected_C_hat, places=8)
+
 
 if __name__ == "__main__":
     seed(0)
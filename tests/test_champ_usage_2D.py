@@ -1,9 +1,12 @@
 from .shared_testing_functions import generate_connected_ER, generate_random_values, generate_random_partitions, \
     generate_igraph_famous
-from modularitypruning.champ_utilities import CHAMP_2D
+from modularitypruning.champ_utilities import CHAMP_2D, get_interior_point, halfspaces_from_coefficients_2D
 from modularitypruning.louvain_utilities import louvain_part_with_membership, repeated_louvain_from_gammas
 from random import seed
+from scipy.optimize import linprog
+import numpy as np
 import unittest
+import warnings
 
 
 class TestCHAMP2D(unittest.TestCase):
@@ -92,6 +95,32 @@ class TestCHAMP2D(unittest.TestCase):
             champ_ranges = CHAMP_2D(G, partitions, gamma_0=0, gamma_f=5)
             self.assert_best_partitions_match_champ_set(G, partitions, champ_ranges, gammas)
 
+    def test_interior_point_with_linprog_numerical_difficulties(self):
+        """Test that get_interior_point accepts a truly interior point that linprog flags with status 4.
+
+        Badly scaled coefficients (as arise on large graphs) make linprog report "numerical difficulties" while
+        still returning a usable Chebyshev center. Since the whole halfspace set is sampled here, rejecting such a
+        point would make get_interior_point fail outright.
+        """
+
+        rng = np.random.default_rng(4)
+        A_hats, P_hats = rng.random(20) * 1e4, rng.random(20) * 1e4
+        halfspaces = np.vstack((halfspaces_from_coefficients_2D(A_hats, P_hats),
+                                [[0, 1, -max(A_hats)], [1, 0, -2]]))
+        normals, offsets = halfspaces[:, :-1], halfspaces[:, -1]
+
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            res = linprog([0, 0, -1], A_ub=np.hstack((normals, np.linalg.norm(normals, axis=1, keepdims=True))),
+                          b_ub=-offsets, bounds=(-np.inf, np.inf), method='interior-point')
+        if res.status != 4:
+            self.skipTest(f"this scipy's linprog reports status {res.status} rather than 4 on this problem")
+
+        for s in range(10):
+            np.random.seed(s)  # get_interior_point shuffles the halfspaces it samples
+            point = get_interior_point(halfspaces)
+            self.assertTrue((normals @ point + offsets < 0).all())
+
 
 if __name__ == "__main__":
     seed(0)
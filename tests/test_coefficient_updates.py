@@ -0,0 +1,194 @@
+from .shared_testing_functions import generate_connected_ER, generate_connected_multilayer_ER, \
+    generate_random_partitions
+from modularitypruning.champ_utilities import CHAMP_2D, partition_coefficients_2D, partition_coefficients_3D
+from modularitypruning.coefficient_updates import IncrementalCoefficients2D, IncrementalCoefficients3D, move_nodes, \
+    partition_coefficient_state, state_coefficients
+from modularitypruning.partition_archive import PartitionArchive, write_partition_archive
+from random import randint, sample, seed
+from unittest import mock
+import numpy as np
+import os
+import tempfile
+import unittest
+
+
+def random_edge_delta(G, num_added, num_removed, vertices=None):
+    vertices = list(range(G.vcount())) if vertices is None else vertices
+    added = [tuple(sample(vertices, 2)) for _ in range(num_added)]
+    removed_ids = sample(range(G.ecount()), num_removed)
+    removed = [G.es[i].tuple for i in removed_ids]
+    return added, removed, removed_ids
+
+
+class TestCoefficientUpdates(unittest.TestCase):
+    def assert_coefficients_equal(self, coefficients, expected_coefficients):
+        for values, expected_values in zip(coefficients, expected_coefficients):
+            self.assertTrue(np.allclose(values, expected_values))
+
+    def test_singlelayer_updates(self):
+        for directed in [False, True]:
+            G = generate_connected_ER(n=100, m=400, directed=directed)
+            memberships = np.array(generate_random_partitions(num_nodes=100, num_partitions=50, K_max=6))
+            incremental = IncrementalCoefficients2D(G, memberships)
+            self.assert_coefficients_equal(incremental.coefficients, partition_coefficients_2D(G, memberships))
+
+            for _ in range(3):
+                added, removed, removed_ids = random_edge_delta(G, num_added=20, num_removed=15)
+                incremental.add_edges(added)
+                incremental.remove_edges(removed)
+                G.add_edges(added)
+                G.delete_edges(removed_ids)
+                self.assert_coefficients_equal(incremental.coefficients, partition_coefficients_2D(G, memberships))
+
+            # self-loops and duplicate edges within a single delta
+            incremental.add_edges([(3, 3), (4, 5), (4, 5)])
+            G.add_edges([(3, 3), (4, 5), (4, 5)])
+            self.assert_coefficients_equal(incremental.coefficients, partition_coefficients_2D(G, memberships))
+
+    def test_weighted_singlelayer_updates(self):
+        G = generate_connected_ER(n=60, m=200, directed=False)
+        memberships = np.array(generate_random_partitions(num_nodes=60, num_partitions=20, K_max=4))
+        incremental = IncrementalCoefficients2D(G, memberships)
+
+        # doubling an edge's weight is equivalent to adding a parallel edge
+        edges = [G.es[i].tuple for i in range(10)]
+        incremental.add_edges(edges[:5], weights=[2.0] * 5)
+        incremental.remove_edges(edges[5:], weights=[0.5] * 5)
+        incremental.add_edges(edges[5:], weights=[0.5] * 5)
+        G.add_edges(edges[:5] * 2)
+        self.assert_coefficients_equal(incremental.coefficients, partition_coefficients_2D(G, memberships))
+
+        with self.assertRaises(ValueError):
+            incremental.add_edges(edges, weights=[1.0])
+
+    def test_updated_coefficients_in_CHAMP(self):
+        G = generate_connected_ER(n=100, m=500, directed=False)
+        partitions = generate_random_partitions(num_nodes=100, num_partitions=100, K_max=5)
+        incremental = IncrementalCoefficients2D(G, np.array(partitions))
+
+        added, removed, removed_ids = random_edge_delta(G, num_added=50, num_removed=50)
+        incremental.add_edges(added)
+        incremental.remove_edges(removed)
+        G.add_edges(added)
+        G.delete_edges(removed_ids)
+
+        ranges = CHAMP_2D(None, partitions, 0, 2, partition_coefficients=incremental.coefficients)
+        expected_ranges = CHAMP_2D(G, partitions, 0, 2)
+        self.assertEqual([membership for _, _, membership in ranges],
+                         [membership for _, _, membership in expected_ranges])
+
+    def test_save_and_load(self):
+        G = generate_connected_ER(n=50, m=200, directed=False)
+        memberships = np.array(generate_random_partitions(num_nodes=50, num_partitions=30, K_max=4))
+        incremental = IncrementalCoefficients2D(G, memberships)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "coefficients.npz")
+            incremental.save(path)
+            restored = IncrementalCoefficients2D.load(path, memberships)
+
+        added, removed, removed_ids = random_edge_delta(G, num_added=10, num_removed=10)
+        for coefficients in [incremental, restored]:
+            coefficients.add_edges(added)
+            coefficients.remove_edges(removed)
+        self.assert_coefficients_equal(restored.coefficients, incremental.coefficients)
+
+    def test_compressed_archive_is_streamed(self):
+        G = generate_connected_ER(n=60, m=240, directed=False)
+        partitions = generate_random_partitions(num_nodes=60, num_partitions=50, K_max=5)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "partitions.npy")
+            write_partition_archive(path, partitions, chunk_size=8)
+            archive = PartitionArchive(path)
+            self.assertFalse(archive.is_raw)
+            memberships = np.array(list(archive))
+
+            # the archive must be decoded one chunk at a time, never as a whole
+            with mock.patch.object(PartitionArchive, 'memberships', property(lambda _: self.fail("decoded archive"))):
+                incremental = IncrementalCoefficients2D(G, archive)
+                self.assert_coefficients_equal(incremental.coefficients, partition_coefficients_2D(G, memberships))
+
+                added, removed, removed_ids = random_edge_delta(G, num_added=10, num_removed=10)
+                incremental.add_edges(added)
+                incremental.remove_edges(removed)
+            G.add_edges(added)
+            G.delete_edges(removed_ids)
+            self.assert_coefficients_equal(incremental.coefficients, partition_coefficients_2D(G, memberships))
+            del archive
+
+    def test_multilayer_updates(self):
+        for directed in [False, True]:
+            G_intralayer, G_interlayer, layer_vec = generate_connected_multilayer_ER(
+                num_nodes_per_layer=30, m=600, num_layers=4, directed=directed)
+            memberships = np.array(generate_random_partitions(num_nodes=G_intralayer.vcount(), num_partitions=40,
+                                                              K_max=5))
+            incremental = IncrementalCoefficients3D(G_intralayer, G_interlayer, layer_vec, memberships)
+            self.assert_coefficients_equal(incremental.coefficients,
+                                           partition_coefficients_3D(G_intralayer, G_interlayer, layer_vec,
+                                                                     memberships, single_threaded=True))
+
+            for _ in range(2):
+                layer = randint(0, 3)
+                layer_vertices = [v for v in range(G_intralayer.vcount()) if layer_vec[v] == layer]
+                added, removed, removed_ids = random_edge_delta(G_intralayer, num_added=10, num_removed=10,
+                                                                vertices=layer_vertices)
+                incremental.add_edges(added)
+                incremental.remove_edges(removed)
+                G_intralayer.add_edges(added)
+                G_intralayer.delete_edges(removed_ids)
+
+                added, removed, removed_ids = random_edge_delta(G_interlayer, num_added=5, num_removed=5)
+                incremental.add_edges(added, interlayer=True)
+                incremental.remove_edges(removed, interlayer=True)
+                G_interlayer.add_edges(added)
+                G_interlayer.delete_edges(removed_ids)
+
+                self.assert_coefficients_equal(incremental.coefficients,
+                                               partition_coefficients_3D(G_intralayer, G_interlayer, layer_vec,
+                                                                         memberships, single_threaded=True))
+
+            with self.assertRaises(ValueError):
+                incremental.add_edges([(0, G_intralayer.vcount() - 1)])
+
+    def test_weighted_coefficients(self):
+        for directed in [False, True]:
+            G = generate_connected_ER(n=100, m=400, directed=directed)
+            G.es['weight'] = [randint(1, 10) / 2 for _ in range(G.ecount())]
+            memberships = np.array(generate_random_partitions(num_nodes=100, num_partitions=20, K_max=6))
+            incremental = IncrementalCoefficients2D(G, memberships)
+            self.assert_coefficients_equal(incremental.coefficients, partition_coefficients_2D(G, memberships))
+
+            added = [tuple(sample(range(100), 2)) for _ in range(10)]
+            weights = [randint(1, 10) / 2 for _ in range(10)]
+            incremental.add_edges(added, weights)
+            G.add_edges(added, attributes={'weight': weights})
+            self.assert_coefficients_equal(incremental.coefficients, partition_coefficients_2D(G, memberships))
+
+    def test_node_moves(self):
+        for directed in [False, True]:
+            G = generate_connected_ER(n=100, m=400, directed=directed)
+            G.add_edges([(0, 0), (1, 2)])  # a self-loop and a multi-edge
+            membership = generate_random_partitions(num_nodes=100, num_partitions=1, K_max=6)[0]
+            state = partition_coefficient_state(G, membership)
+            self.assert_coefficients_equal(state_coefficients(state), partition_coefficients_2D(G, [membership]))
+
+            for num_moved in [1, 2, 5, 20]:
+                child = list(state.membership)
+                moved_nodes = sample(range(100), num_moved) + [0]
+                for v in moved_nodes:
+                    child[v] = randint(0, 7)  # may create new communities
+                state = move_nodes(G, state, child, moved_nodes=moved_nodes)
+                self.assert_coefficients_equal(state_coefficients(state), partition_coefficients_2D(G, [child]))
+
+            # moved nodes are found automatically, and moving no nodes leaves the coefficients unchanged
+            child = list(state.membership)
+            child[3] = 9
+            self.assert_coefficients_equal(state_coefficients(move_nodes(G, state, child)),
+                                           partition_coefficients_2D(G, [child]))
+            self.assertEqual(state_coefficients(move_nodes(G, state, state.membership)), state_coefficients(state))
+
+
+if __name__ == "__main__":
+    seed(0)
+    unittest.main()
@@ -0,0 +1,135 @@
+from modularitypruning.graph_utilities import edges_to_csr, graph_from_csr, giant_component_edges, \
+    load_edge_list_graph, read_edge_list
+from random import randint, seed
+import igraph as ig
+import numpy as np
+import os
+import tempfile
+import unittest
+
+
+class TestGraphUtilities(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write_edge_list(self, name, edges, delimiter="\t", header=None):
+        path = os.path.join(self.directory.name, name)
+        with open(path, "w") as file:
+            if header is not None:
+                file.write(header + "\n")
+            for u, v in edges:
+                file.write(f"{u}{delimiter}{v}\n")
+        return path
+
+    def random_edges(self, num_vertices=300, num_edges=350):
+        # sparse enough to have several components and isolated vertex ids
+        return [(randint(0, num_vertices - 1), randint(0, num_vertices - 1)) for _ in range(num_edges)]
+
+    def assert_same_graph(self, G, expected):
+        self.assertEqual(G.vcount(), expected.vcount())
+        self.assertEqual(G.is_directed(), expected.is_directed())
+        self.assertEqual(sorted(G.get_edgelist()), sorted(expected.get_edgelist()))
+
+    def test_read_edge_list(self):
+        edges = self.random_edges()
+        path = self.write_edge_list("edges.txt", edges, header="# Directed graph\n# FromNodeId\tToNodeId")
+        self.assertEqual(read_edge_list(path).tolist(), [list(e) for e in edges])
+
+        path = self.write_edge_list("edges.csv", edges, delimiter=",", header="node_1,node_2")
+        self.assertEqual(read_edge_list(path, delimiter=",", skip_header=True).tolist(), [list(e) for e in edges])
+        with self.assertRaisesRegex(ValueError, "edges.csv"):
+            read_edge_list(path, delimiter=",")  # headers are only skipped when asked to
+
+        path = self.write_edge_list("signed.txt", [(1, 2), ("+3", 4)], header="% Matrix Market style comment")
+        self.assertEqual(read_edge_list(path).tolist(), [[1, 2], [3, 4]])
+
+        path = self.write_edge_list("empty.txt", [], header="# no edges")
+        self.assertEqual(read_edge_list(path).shape, (0, 2))
+
+    def test_read_malformed_edge_list(self):
+        edges = self.random_edges()
+        for name, bad_line in [("token.txt", "3\tx"), ("float.txt", "3\t4.5"), ("columns.txt", "3\t4\t5"),
+                               ("missing.txt", "3"), ("negative.txt", "-1\t5"), ("word.txt", "x\t4")]:
+            path = self.write_edge_list(name, edges)
+            with open(path, "a") as file:
+                file.write(bad_line + "\n" + "1\t2\n")
+            with self.assertRaisesRegex(ValueError, name):
+                read_edge_list(path)
+
+        # a wrong delimiter is reported rather than silently misparsed
+        path = self.write_edge_list("edges.csv", edges, delimiter=",")
+        with self.assertRaisesRegex(ValueError, "edges.csv"):
+            read_edge_list(path)
+
+    def test_csr_round_trip(self):
+        edges = np.array(self.random_edges())
+        indptr, indices = edges_to_csr(edges)
+        G = graph_from_csr(indptr, indices)
+        self.assert_same_graph(G, ig.Graph(edges.tolist(), directed=False))
+
+    @staticmethod
+    def expected_giant_component(edges, directed):
+        """igraph's largest component, breaking ties towards the component containing the lowest vertex id"""
+        G = ig.Graph(edges, directed=directed)
+        components = list(G.clusters())
+        largest = max(len(component) for component in components)
+        return G.subgraph(min((component for component in components if len(component) == largest), key=min))
+
+    def test_giant_component_matches_igraph(self):
+        for directed in [False, True]:
+            edges = self.random_edges()
+            giant_edges, num_vertices = giant_component_edges(edges, directed=directed)
+            expected = self.expected_giant_component(edges, directed)
+            self.assert_same_graph(ig.Graph(n=num_vertices, edges=giant_edges.tolist(), directed=directed), expected)
+
+        # undirected ties are broken exactly as igraph does
+        edges = self.random_edges(num_edges=100)
+        giant_edges, num_vertices = giant_component_edges(edges)
+        self.assert_same_graph(ig.Graph(n=num_vertices, edges=giant_edges.tolist()),
+                               ig.Graph(edges).clusters().giant())
+
+    def test_giant_component_ties(self):
+        # two strongly connected pairs joined by 1 -> 2, where scipy's traversal labels {2, 3} first (the self-loop
+        # tells the two apart after relabeling)
+        edges = [(0, 0), (0, 1), (1, 0), (1, 2), (2, 3), (3, 2)]
+        giant_edges, num_vertices = giant_component_edges(edges, directed=True)
+        self.assertEqual(num_vertices, 2)
+        self.assertEqual(sorted(giant_edges.tolist()), [[0, 0], [0, 1], [1, 0]])
+        self.assert_same_graph(ig.Graph(n=num_vertices, edges=giant_edges.tolist(), directed=True),
+                               self.expected_giant_component(edges, directed=True))
+
+        giant_edges, num_vertices = giant_component_edges(edges, directed=False)
+        self.assertEqual((num_vertices, len(giant_edges)), (4, 6))
+
+    def test_load_edge_list_graph_cache(self):
+        edges = self.random_edges()
+        path = self.write_edge_list("edges.txt", edges, header="# comment")
+        expected = ig.Graph(edges, directed=False).clusters().giant()
+
+        G = load_edge_list_graph(path)
+        self.assert_same_graph(G, expected)
+        self.assertTrue(os.path.exists(path + ".indptr.npy"))
+
+        cached = load_edge_list_graph(path)
+        self.assert_same_graph(cached, expected)
+
+        # the cache is ignored when requesting a different graph...
+        self.assert_same_graph(load_edge_list_graph(path, giant_component=False), ig.Graph(edges, directed=False))
+
+        # ...or parsing with a different delimiter...
+        with self.assertRaises(ValueError):
+            load_edge_list_graph(path, delimiter=",", giant_component=False)
+
+        # ...and when the edge list changes
+        edges = self.random_edges()
+        os.utime(path, ns=(0, 0))
+        self.write_edge_list("edges.txt", edges)
+        self.assert_same_graph(load_edge_list_graph(path), ig.Graph(edges, directed=False).clusters().giant())
+
+
+if __name__ == "__main__":
+    seed(0)
+    unittest.main()
@@ -0,0 +1,96 @@
+from .shared_testing_functions import generate_connected_ER, generate_random_partitions
+from modularitypruning.instrumentation import record_stages, stage
+from modularitypruning.parameter_estimation_utilities import prune_to_stable_partitions
+import json
+import os
+from random import seed
+import tempfile
+import unittest
+
+
+class TestInstrumentation(unittest.TestCase):
+    def test_disabled_stages_are_shared_no_ops(self):
+        self.assertIs(stage("first"), stage("second", items=10))
+        with stage("first") as span:
+            span.add_items(5)
+
+    def test_nested_stages(self):
+        with record_stages() as recorder:
+            with stage("outer", items=2) as outer:
+                with stage("inner"):
+                    sum(range(10 ** 5))
+                with stage("inner") as inner:
+                    inner.add_items(3)
+                    inner.add_items(4)
+                outer.add_items(1)
+
+        # stages run after recording stopped are not recorded
+        with stage("after"):
+            pass
+
+        spans = recorder.report()['spans']
+        self.assertEqual([span['name'] for span in spans], ["outer", "inner", "inner"])
+        self.assertEqual([span['parent'] for span in spans], [None, "outer", "outer"])
+        self.assertEqual([span['depth'] for span in spans], [0, 1, 1])
+        self.assertEqual([span['items'] for span in spans], [3, None, 7])
+        self.assertGreaterEqual(spans[0]['wall_time'], spans[1]['wall_time'] + spans[2]['wall_time'])
+
+        summary = recorder.summary()
+        self.assertEqual(set(summary), {"outer", "inner"})
+        self.assertEqual(summary["inner"]['count'], 2)
+        self.assertEqual(summary["inner"]['items'], 7)
+        self.assertAlmostEqual(summary["inner"]['wall_time'], spans[1]['wall_time'] + spans[2]['wall_time'])
+        self.assertGreater(summary["outer"]['peak_rss'], 0)
+
+    def test_recorders_nest(self):
+        with record_stages() as outer_recorder:
+            with record_stages() as inner_recorder:
+                with stage("inner"):
+                    pass
+            with stage("outer"):
+                pass
+
+        self.assertEqual([span['name'] for span in inner_recorder.spans], ["inner"])
+        self.assertEqual([span['name'] for span in outer_recorder.spans], ["outer"])
+
+    def test_pruning_pipeline_report(self):
+        n = 100
+        G = generate_connected_ER(n=n, m=5 * n, directed=False)
+        partitions = generate_random_partitions(num_nodes=n, num_partitions=50, K_max=5)
+
+        with record_stages() as recorder:
+            prune_to_stable_partitions(G, partitions, 0, 2, single_threaded=True)
+
+        summary = recorder.summary()
+        for name in ["prune_to_stable_partitions", "canonicalization", "coefficients_2D", "interior_point_lp",
+                     "halfspace_intersection", "gamma_estimates"]:
+            self.assertIn(name, summary)
+            self.assertEqual(summary[name]['count'], 1)
+        self.assertEqual(summary["canonicalization"]['items'], len(set(map(tuple, partitions))))
+        self.assertEqual(summary["coefficients_2D"]['items'], summary["canonicalization"]['items'])
+
+        pipeline_time = summary["prune_to_stable_partitions"]['wall_time']
+        self.assertLessEqual(sum(totals['wall_time'] for name, totals in summary.items()
+                                 if name != "prune_to_stable_partitions"), pipeline_time)
+
+        with tempfile.TemporaryDirectory() as directory:
+            report_path = os.path.join(directory, "report.json")
+            trace_path = os.path.join(directory, "trace.json")
+            recorder.to_json(report_path)
+            recorder.write_chrome_trace(trace_path)
+
+            with open(report_path) as file:
+                self.assertEqual(json.load(file)['stages'], json.loads(json.dumps(summary)))
+
+            with open(trace_path) as file:
+                events = json.load(file)['traceEvents']
+            self.assertEqual(len(events), len(recorder.spans))
+            for event in events:
+                self.assertEqual(event['ph'], 'X')
+                self.assertGreaterEqual(event['dur'], 0)
+                self.assertIn(event['name'], summary)
+
+
+if __name__ == "__main__":
+    seed(0)
+    unittest.main()
@@ -0,0 +1,56 @@
+from .shared_testing_functions import generate_random_partition
+from modularitypruning.lazy_imports import lazy_import, is_loaded, LazyModule
+from modularitypruning.partition_utilities import ami, nmi
+from random import seed
+import subprocess
+import sys
+import unittest
+
+
+class TestLazyImports(unittest.TestCase):
+    def test_package_import_defers_heavy_dependencies(self):
+        deferred = ['louvain', 'champ', 'psutil', 'sklearn', 'scipy.optimize', 'scipy.spatial', 'matplotlib',
+                    'seaborn']
+        script = ("import sys, modularitypruning, modularitypruning.parameter_estimation, modularitypruning.plotting, "
+                  "modularitypruning.adaptive_sweep, modularitypruning.resolution_profile\n"
+                  f"print(','.join(name for name in {deferred!r} if name in sys.modules))")
+        output = subprocess.run([sys.executable, "-c", script], check=True, capture_output=True, text=True).stdout
+        self.assertEqual(output.strip(), "")
+
+    def test_estimation_on_memberships_defers_louvain(self):
+        script = ("import sys, igraph\n"
+                  "from modularitypruning.parameter_estimation_utilities import gamma_estimate, "
+                  "prune_to_stable_partitions\n"
+                  "G = igraph.Graph.Famous('Zachary')\n"
+                  "membership = tuple(int(v >= 17) for v in range(G.vcount()))\n"
+                  "assert gamma_estimate(G, membership) > 0\n"
+                  "prune_to_stable_partitions(G, [membership], 0, 2, single_threaded=True)\n"
+                  "print('louvain' in sys.modules)")
+        output = subprocess.run([sys.executable, "-c", script], check=True, capture_output=True, text=True).stdout
+        self.assertEqual(output.strip(), "False")
+
+    def test_missing_module_fails_on_first_use(self):
+        module = lazy_import("modularitypruning_nonexistent_module")
+        self.assertIsInstance(module, LazyModule)
+        self.assertFalse(is_loaded(module))
+        with self.assertRaises(ModuleNotFoundError):
+            module.anything
+
+    def test_lazy_module_loads_on_first_use(self):
+        module = LazyModule("json")
+        self.assertFalse(is_loaded(module))
+        self.assertEqual(module.loads("[1, 2]"), [1, 2])
+        self.assertTrue(is_loaded(module))
+        self.assertIs(lazy_import("json"), sys.modules["json"])
+
+    def test_mutual_information_after_lazy_import(self):
+        p1 = generate_random_partition(num_nodes=100, K=5)
+        p2 = generate_random_partition(num_nodes=100, K=5)
+        self.assertAlmostEqual(ami(p1, p1), 1.0)
+        self.assertAlmostEqual(nmi(p1, p1), 1.0)
+        self.assertLess(nmi(p1, p2), 1.0)
+
+
+if __name__ == "__main__":
+    seed(0)
+    unittest.main()
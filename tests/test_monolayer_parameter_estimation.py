@@ -1,8 +1,9 @@
 from .shared_testing_functions import generate_igraph_famous, generate_random_partition
 import igraph as ig
 from math import log
-from numpy import mean
-from modularitypruning.parameter_estimation import iterative_monolayer_resolution_parameter_estimation
+from numpy import linspace, mean
+from modularitypruning.parameter_estimation import iterative_monolayer_resolution_parameter_estimation, \
+    batched_monolayer_resolution_parameter_estimation, _ConvergenceAccelerator
 from modularitypruning.parameter_estimation_utilities import gamma_estimate
 from modularitypruning.partition_utilities import all_degrees
 from random import seed
@@ -10,6 +11,23 @@ import unittest
 
 
 class TestMonolayerParameterEstimation(unittest.TestCase):
+    @staticmethod
+    def newman_synthetic_network(q):
+        """Returns an SBM network of q equally sized groups of 250 nodes, as in FIG 1 of Newman's paper on the
+        equivalence (see test_newman_synthetic_networks), along with its "ground truth" gamma estimate"""
+        community_sizes = [250] * q
+        n = 250 * q
+        p_in = 16 * n / (q * 250 * 249)  # ~16 in-edges per node
+        p_out = 8 * n / (q * (q - 1) * 250 * 250)  # ~8 out-edges per node to each community
+        pref_matrix = [[p_in if i == j else p_out for j in range(q)] for i in range(q)]
+        G = ig.Graph.SBM(n, pref_matrix, community_sizes)
+
+        k = mean(all_degrees(G))
+        true_omega_in = p_in * (2 * G.ecount()) / (k * k)
+        true_omega_out = p_out * (2 * G.ecount()) / (k * k)
+        true_gamma = (true_omega_in - true_omega_out) / (log(true_omega_in) - log(true_omega_out))
+        return G, true_gamma
+
     def test_newman_synthetic_networks(self):
         """This mimics the synthetic test from Newman's paper on the equivalence.
 
@@ -17,24 +35,80 @@ class TestMonolayerParameterEstimation(unittest.TestCase):
         methods for community detection', albeit using Louvain for modularity maximization."""
 
         for q in range(3, 15):
-            community_sizes = [250] * q  # q equally sized groups of 250 nodes
-            n = 250 * q
-            p_in = 16 * n / (q * 250 * 249)  # ~16 in-edges per node
-            p_out = 8 * n / (q * (q - 1) * 250 * 250)  # ~8 out-edges per node to each community
-            pref_matrix = [[p_in if i == j else p_out for j in range(q)] for i in range(q)]
-            G = ig.Graph.SBM(n, pref_matrix, community_sizes)
-
-            # compute "ground truth" gamma estimate
-            k = mean(all_degrees(G))
-            true_omega_in = p_in * (2 * G.ecount()) / (k * k)
-            true_omega_out = p_out * (2 * G.ecount()) / (k * k)
-            true_gamma = (true_omega_in - true_omega_out) / (log(true_omega_in) - log(true_omega_out))
-
+            G, true_gamma = self.newman_synthetic_network(q)
             gamma, _ = iterative_monolayer_resolution_parameter_estimation(G, gamma=1.0)
 
             # check we converged close to the ground truth "correct" value
             self.assertLess(abs(true_gamma - gamma), 0.05)
 
+    def test_batched_estimation_newman_synthetic_network(self):
+        G, true_gamma = self.newman_synthetic_network(q=4)
+
+        starting_gammas = linspace(0.5, 2.0, 50)
+        for single_threaded in [True, False]:
+            fixed_points = batched_monolayer_resolution_parameter_estimation(G, starting_gammas,
+                                                                             single_threaded=single_threaded)
+            self.assertLessEqual(sum(basin_size for _, _, basin_size in fixed_points), len(starting_gammas))
+
+            # the largest basin converges close to the ground truth "correct" value
+            gamma, _, _ = fixed_points[0]
+            self.assertLess(abs(true_gamma - gamma), 0.05)
+
+            # each fixed point's gamma is the estimate of its partition
+            for gamma, membership, _ in fixed_points:
+                self.assertAlmostEqual(gamma, gamma_estimate(G, membership), places=10)
+
+    def test_accelerated_estimation_newman_synthetic_network(self):
+        G, true_gamma = self.newman_synthetic_network(q=4)
+
+        # louvain occasionally merges everything into one (degenerate) community at gamma=0.5 on these networks
+        for starting_gamma in [0.6, 1.0]:
+            gamma, part, log_entries = iterative_monolayer_resolution_parameter_estimation(
+                G, gamma=starting_gamma, accelerate=True, return_strategy_log=True)
+            self.assertLess(abs(true_gamma - gamma), 0.05)
+            self.assertAlmostEqual(gamma, gamma_estimate(G, part.membership), places=10)
+            for iteration, strategy, reason in log_entries:
+                self.assertIn(strategy, ['fixed-point', 'damped'])
+
+    @staticmethod
+    def run_accelerated_iteration(estimate, membership, point, tol=1e-6, max_iter=100):
+        """Runs a synthetic fixed-point iteration point -> estimate(point) through a _ConvergenceAccelerator, where
+        membership(point) is the "partition" found at each point"""
+        accelerator = _ConvergenceAccelerator([tol], ([0.0], [100.0]))
+        for iteration in range(max_iter):
+            next_point = estimate(point)
+            if abs(next_point - point) < tol:
+                return point, iteration, accelerator.log
+            point, = accelerator.next_point(iteration, (point,), (next_point,), membership(point))
+        return point, max_iter, accelerator.log
+
+    def test_accelerator_slow_convergence(self):
+        def estimate(gamma):
+            return 1 + 0.95 * (gamma - 1)
+
+        def membership(gamma):
+            return [0] + [int(bit) for bit in f"{round(gamma * 1e9):040b}"]  # a different partition at every point
+
+        # plain fixed-point updates would take hundreds of iterations to get within tolerance
+        point, iterations, log_entries = self.run_accelerated_iteration(estimate, membership, 3.0)
+        self.assertAlmostEqual(point, 1.0, places=5)
+        self.assertLess(iterations, 10)
+        self.assertEqual(log_entries, [])
+
+    def test_accelerator_oscillation(self):
+        def estimate(gamma):
+            return 2 - 1.5 * (gamma - 2)
+
+        def membership(gamma):
+            return [0, int(gamma > 2)]  # the partition only depends on which side of the fixed point gamma is
+
+        # plain fixed-point updates overshoot further and further, alternating between the two partitions
+        point, iterations, log_entries = self.run_accelerated_iteration(estimate, membership, 1.5)
+        self.assertAlmostEqual(point, 2.0, places=5)
+        self.assertLess(iterations, 100)
+        self.assertIn('fixed-point', [strategy for _, strategy, _ in log_entries])
+        self.assertTrue(any(strategy == 'damped' and "recurred" in reason for _, strategy, reason in log_entries))
+
     def test_directed_consistency_igraph_famous(self):
         """Test gamma estimate consistency on undirected and (symmetric) directed versions of various famous graphs."""
 
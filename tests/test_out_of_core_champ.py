@@ -0,0 +1,87 @@
+from .shared_testing_functions import generate_connected_ER, generate_connected_multilayer_ER, \
+    generate_random_partitions
+from modularitypruning.champ_utilities import CHAMP_2D, CHAMP_3D, iter_membership_blocks, partition_coefficients_2D, \
+    partition_coefficients_3D
+from modularitypruning.partition_archive import PartitionArchive, write_partition_archive
+from random import seed
+import modularitypruning.champ_utilities as champ_utilities
+import numpy as np
+import os
+import tempfile
+import unittest
+
+
+class TestOutOfCoreCHAMP(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.original_block_elements = champ_utilities.COEFFICIENT_BLOCK_ELEMENTS
+
+    def tearDown(self):
+        champ_utilities.COEFFICIENT_BLOCK_ELEMENTS = self.original_block_elements
+        self.directory.cleanup()
+
+    def write_memmap(self, partitions):
+        path = os.path.join(self.directory.name, "partitions.dat")
+        memberships = np.memmap(path, dtype=np.uint16, mode='w+', shape=(len(partitions), len(partitions[0])))
+        memberships[:] = partitions
+        memberships.flush()
+        return np.memmap(path, dtype=np.uint16, mode='r', shape=memberships.shape)
+
+    def test_iter_membership_blocks(self):
+        partitions = generate_random_partitions(num_nodes=30, num_partitions=25, K_max=4)
+        path = os.path.join(self.directory.name, "partitions.npy")
+        write_partition_archive(path, partitions, chunk_size=8)
+        archive = PartitionArchive(path)
+
+        for source in [partitions, iter(partitions), np.array(partitions), self.write_memmap(partitions), archive]:
+            blocks = list(iter_membership_blocks(source, 7))
+            self.assertTrue(all(block.ndim == 2 and len(block) <= 7 for block in blocks))
+            expected = list(archive) if source is archive else partitions
+            self.assertEqual([tuple(row) for block in blocks for row in block.tolist()], expected)
+
+    def test_memmap_coefficients_2D(self):
+        # force many small blocks
+        champ_utilities.COEFFICIENT_BLOCK_ELEMENTS = 5000
+
+        for directed in [False, True]:
+            G = generate_connected_ER(n=100, m=500, directed=directed)
+            partitions = generate_random_partitions(num_nodes=100, num_partitions=150, K_max=8)
+            memberships = self.write_memmap(partitions)
+
+            for single_threaded in [True, False]:
+                A_hats, P_hats = partition_coefficients_2D(G, memberships, single_threaded=single_threaded)
+                expected_A_hats, expected_P_hats = partition_coefficients_2D(G, partitions, single_threaded=True)
+                self.assertEqual(len(A_hats), len(partitions))
+                self.assertTrue(np.allclose(A_hats, expected_A_hats))
+                self.assertTrue(np.allclose(P_hats, expected_P_hats))
+
+            memmap_ranges = CHAMP_2D(G, memberships, 0, 2)
+            list_ranges = CHAMP_2D(G, partitions, 0, 2)
+            self.assertEqual([membership for _, _, membership in memmap_ranges],
+                             [membership for _, _, membership in list_ranges])
+            self.assertTrue(all(isinstance(membership, tuple) for _, _, membership in memmap_ranges))
+
+    def test_memmap_coefficients_3D(self):
+        champ_utilities.COEFFICIENT_BLOCK_ELEMENTS = 20000
+
+        G_intralayer, G_interlayer, layer_membership = generate_connected_multilayer_ER(
+            num_nodes_per_layer=50, m=2000, num_layers=5, directed=False)
+        partitions = generate_random_partitions(num_nodes=G_intralayer.vcount(), num_partitions=100, K_max=6)
+        memberships = self.write_memmap(partitions)
+
+        coefficients = partition_coefficients_3D(G_intralayer, G_interlayer, layer_membership, memberships)
+        expected_coefficients = partition_coefficients_3D(G_intralayer, G_interlayer, layer_membership, partitions,
+                                                          single_threaded=True)
+        for values, expected_values in zip(coefficients, expected_coefficients):
+            self.assertEqual(len(values), len(partitions))
+            self.assertTrue(np.allclose(values, expected_values))
+
+        memmap_domains = CHAMP_3D(G_intralayer, G_interlayer, layer_membership, memberships, 0, 2, 0, 2)
+        list_domains = CHAMP_3D(G_intralayer, G_interlayer, layer_membership, partitions, 0, 2, 0, 2)
+        self.assertEqual(sorted(membership for _, membership in memmap_domains),
+                         sorted(membership for _, membership in list_domains))
+
+
+if __name__ == "__main__":
+    seed(0)
+    unittest.main()
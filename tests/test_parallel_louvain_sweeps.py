@@ -0,0 +1,182 @@
+from .shared_testing_functions import generate_connected_ER
+from modularitypruning.louvain_utilities import plan_parallel_sweep, repeated_parallel_louvain_from_gammas, \
+    iter_parallel_louvain_from_gammas, louvain_sweep_pool, sorted_tuple, WORKER_BASELINE_BYTES
+from modularitypruning.progress import SweepTelemetry
+from multiprocessing import active_children
+from random import seed
+import igraph as ig
+import numpy as np
+import subprocess
+import sys
+import unittest
+
+
+class TestParallelLouvainSweeps(unittest.TestCase):
+    def test_plan_respects_memory_budget(self):
+        task_memory, result_memory = 10 ** 8, 10 ** 4
+        worker_memory = WORKER_BASELINE_BYTES + task_memory
+
+        for processes in [1, 4, 16]:
+            for budget_in_workers in [1, 2, 3, 8]:
+                memory_budget = budget_in_workers * worker_memory
+                schedule = plan_parallel_sweep(10000, task_memory, result_memory, memory_budget=memory_budget,
+                                               processes=processes)
+
+                self.assertEqual(schedule.processes, min(processes, budget_in_workers))
+                self.assertGreaterEqual(schedule.chunk_size, 1)
+                self.assertGreaterEqual(schedule.dispatch_size, 1)
+                self.assertLessEqual(schedule.dispatch_size, schedule.chunk_size)
+
+                buffered_memory = (schedule.chunk_size - schedule.processes) * result_memory
+                self.assertLessEqual(schedule.processes * worker_memory + buffered_memory, memory_budget)
+
+    def test_plan_without_chunk_dispatch(self):
+        schedule = plan_parallel_sweep(1234, 10 ** 6, 10 ** 3, memory_budget=10 ** 10, processes=2,
+                                       chunk_dispatch=False)
+        self.assertEqual(schedule.chunk_size, 1234)
+
+    def test_plan_with_insufficient_budget_still_makes_progress(self):
+        schedule = plan_parallel_sweep(100, 10 ** 9, 10 ** 6, memory_budget=1, processes=8)
+        self.assertEqual(schedule.processes, 1)
+        self.assertGreaterEqual(schedule.chunk_size, 1)
+
+    def test_parallel_sweep_returns_canonical_partitions(self):
+        G = ig.Graph.Famous("Zachary")
+        gammas = np.linspace(0, 2, 50)
+
+        for chunk_dispatch in [True, False]:
+            partitions, worker_peak_rss = repeated_parallel_louvain_from_gammas(G, gammas, show_progress=False,
+                                                                                chunk_dispatch=chunk_dispatch,
+                                                                                max_tasks_per_child=5,
+                                                                                return_worker_peak_rss=True)
+            self.assertGreater(len(partitions), 0)
+            for membership in partitions:
+                self.assertEqual(len(membership), G.vcount())
+                self.assertEqual(sorted_tuple(membership), membership)
+
+            self.assertGreater(len(worker_peak_rss), 0)
+            self.assertTrue(all(rss > 0 for rss in worker_peak_rss.values()))
+
+    def test_parallel_sweep_with_small_budget(self):
+        G = generate_connected_ER(n=100, m=500, directed=False)
+        partitions = repeated_parallel_louvain_from_gammas(G, np.linspace(0.5, 1.5, 20), show_progress=False,
+                                                           memory_budget=1)
+        self.assertGreater(len(partitions), 0)
+
+    def test_iter_parallel_sweep_yields_every_gamma(self):
+        G = ig.Graph.Famous("Zachary")
+        gammas = np.linspace(0, 2, 40)
+
+        results = list(iter_parallel_louvain_from_gammas(G, gammas))
+        self.assertEqual(sorted(gamma for gamma, _, _ in results), sorted(gammas))
+
+        # each unique partition is flagged as new exactly once
+        new_partitions = [partition for _, partition, is_new in results if is_new]
+        self.assertEqual(len(new_partitions), len(set(new_partitions)))
+        self.assertEqual(set(new_partitions), {partition for _, partition, _ in results})
+
+        for _, partition, _ in results:
+            self.assertEqual(sorted_tuple(partition), partition)
+
+    def test_iter_parallel_sweep_without_duplicates(self):
+        G = ig.Graph.Famous("Zachary")
+        gammas = np.linspace(0, 2, 200)
+
+        results = list(iter_parallel_louvain_from_gammas(G, gammas, yield_duplicates=False))
+        self.assertTrue(all(is_new for _, _, is_new in results))
+
+        partitions = [partition for _, partition, _ in results]
+        self.assertEqual(len(partitions), len(set(partitions)))
+        for partition in partitions:
+            self.assertEqual(sorted_tuple(partition), partition)
+
+    def test_sweeps_share_a_pool(self):
+        G = ig.Graph.Famous("Zachary")
+        gammas = np.linspace(0, 2, 40)
+
+        with louvain_sweep_pool(G) as pool:
+            workers = {process.pid for process in active_children()}
+            self.assertGreaterEqual(len(workers), pool.processes)
+
+            first = list(iter_parallel_louvain_from_gammas(G, gammas, pool=pool))
+            self.assertEqual(sorted(gamma for gamma, _, _ in first), sorted(gammas))
+
+            # the workers have returned these partitions before, but a sweep on a shared pool still receives them
+            second = list(iter_parallel_louvain_from_gammas(G, gammas, yield_duplicates=False, pool=pool))
+            self.assertEqual({process.pid for process in active_children()}, workers)
+
+        partitions = [partition for _, partition, _ in second]
+        self.assertGreater(len(partitions), 0)
+        self.assertEqual(len(partitions), len(set(partitions)))
+        for partition in partitions:
+            self.assertEqual(sorted_tuple(partition), partition)
+
+    def test_sweep_telemetry(self):
+        G = ig.Graph.Famous("Zachary")
+        gammas = np.linspace(0, 2, 100)
+
+        reports = []
+        telemetry = SweepTelemetry(callback=reports.append, interval=0)
+        partitions = repeated_parallel_louvain_from_gammas(G, gammas, show_progress=telemetry)
+
+        # with no throttling, every run is reported, along with a final report
+        self.assertEqual(len(reports), len(gammas) + 1)
+        self.assertEqual([report['completed'] for report in reports[:-1]], list(range(1, len(gammas) + 1)))
+
+        final_report = reports[-1]
+        self.assertEqual(final_report['completed'], len(gammas))
+        self.assertEqual(final_report['total'], len(gammas))
+        self.assertEqual(final_report['unique_partitions'], len(partitions))
+        self.assertAlmostEqual(final_report['discovery_rate'], len(partitions) / len(gammas))
+        self.assertGreater(final_report['runs_per_second'], 0)
+        self.assertGreater(final_report['worker_utilization'], 0)
+        self.assertLessEqual(final_report['worker_utilization'], 1)
+
+    def test_show_progress_leaves_logging_to_the_application(self):
+        script = ("import igraph\n"
+                  "from modularitypruning.louvain_utilities import repeated_parallel_louvain_from_gammas\n"
+                  "{}"
+                  "repeated_parallel_louvain_from_gammas(igraph.Graph.Famous('Zachary'), [0.5, 1.0], "
+                  "show_progress=True)\n"
+                  "import logging\n"
+                  "logger = logging.getLogger('modularitypruning.progress')\n"
+                  "assert logger.level == logging.NOTSET\n"
+                  "assert any(isinstance(h, logging.NullHandler) for h in logger.handlers)")
+
+        # nothing is printed (and nothing is configured) unless the application configures logging
+        result = subprocess.run([sys.executable, "-c", script.format("")], check=True, capture_output=True,
+                                text=True)
+        self.assertEqual(result.stdout, "")
+        self.assertEqual(result.stderr, "")
+
+        configure = "import logging\nlogging.basicConfig(level=logging.INFO)\n"
+        result = subprocess.run([sys.executable, "-c", script.format(configure)], check=True, capture_output=True,
+                                text=True)
+        self.assertEqual(result.stdout, "")
+        self.assertIn("louvain sweep: 2/2 runs", result.stderr)
+
+    def test_sweep_telemetry_is_throttled(self):
+        G = ig.Graph.Famous("Zachary")
+
+        reports = []
+        telemetry = SweepTelemetry(callback=reports.append, interval=3600)
+        for _ in iter_parallel_louvain_from_gammas(G, np.linspace(0, 2, 50), show_progress=telemetry):
+            pass
+        self.assertEqual(len(reports), 1)  # only the final report
+
+        with self.assertLogs('modularitypruning.progress', level='INFO') as logs:
+            repeated_parallel_louvain_from_gammas(G, np.linspace(0, 2, 50), show_progress=True)
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn("50/50 runs", logs.output[0])
+
+    def test_iter_parallel_sweep_can_stop_early(self):
+        G = ig.Graph.Famous("Zachary")
+        sweep = iter_parallel_louvain_from_gammas(G, np.linspace(0, 2, 1000))
+        gamma, partition, is_new = next(sweep)
+        self.assertTrue(is_new)
+        sweep.close()
+
+
+if __name__ == "__main__":
+    seed(0)
+    unittest.main()
@@ -0,0 +1,116 @@
+from .shared_testing_functions import generate_connected_ER, generate_random_partitions, generate_random_values
+from modularitypruning import prune_to_stable_partitions
+from modularitypruning.champ_utilities import CHAMP_2D, partition_coefficients_2D
+from modularitypruning.louvain_utilities import repeated_louvain_from_gammas, sorted_tuple
+from modularitypruning.partition_archive import PartitionArchive, PartitionArchiveWriter, write_partition_archive
+from modularitypruning.partition_store import PartitionStore
+from random import seed
+import igraph as ig
+import numpy as np
+import os
+import tempfile
+import unittest
+
+
+class TestPartitionArchive(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "partitions.npy")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_round_trip(self):
+        partitions = generate_random_partitions(num_nodes=80, num_partitions=300, K_max=8)
+        expected = list(PartitionStore(partitions))
+
+        for compression in [None, 'zlib']:
+            for delta in [False, True]:
+                num_written = write_partition_archive(self.path, partitions + partitions[::-1], chunk_size=64,
+                                                      compression=compression, delta=delta)
+                self.assertEqual(num_written, len(expected))
+
+                archive = PartitionArchive(self.path)
+                self.assertEqual(len(archive), len(expected))
+                self.assertEqual(archive.num_nodes, 80)
+                self.assertEqual(list(archive), expected)
+                self.assertEqual(archive.memberships.tolist(), [list(p) for p in expected])
+                self.assertEqual(archive.num_communities().tolist(), [max(p) + 1 for p in expected])
+
+                # random access, including across chunk boundaries and from the end
+                for i in [0, 63, 64, 150, len(expected) - 1, -1, 5]:
+                    self.assertEqual(archive[i], expected[i])
+                with self.assertRaises(IndexError):
+                    archive[len(expected)]
+
+    def test_delta_encoding_of_similar_partitions(self):
+        base = np.array(generate_random_partitions(num_nodes=500, num_partitions=1, K_max=10)[0])
+        partitions = []
+        for _ in range(200):
+            base = base.copy()
+            base[np.random.randint(500, size=3)] = np.random.randint(10, size=3)
+            partitions.append(tuple(base.tolist()))
+        expected = list(PartitionStore(partitions))
+
+        sizes = {}
+        for delta in [False, True]:
+            write_partition_archive(self.path, partitions, compression='zlib', delta=delta)
+            sizes[delta] = os.path.getsize(self.path)
+            self.assertEqual(list(PartitionArchive(self.path)), expected)
+        self.assertLess(sizes[True], sizes[False])
+
+    def test_raw_archive_is_memory_mapped_npy(self):
+        partitions = generate_random_partitions(num_nodes=40, num_partitions=100, K_max=5)
+        write_partition_archive(self.path, partitions, chunk_size=16, compression=None, delta=False)
+
+        archive = PartitionArchive(self.path)
+        self.assertTrue(archive.is_raw)
+        self.assertIsInstance(archive.memberships, np.memmap)
+        self.assertEqual(archive.memberships.dtype, np.uint16)
+        self.assertEqual(np.load(self.path).tolist(), archive.memberships.tolist())
+
+    def test_writer_as_sweep_partition_store(self):
+        G = ig.Graph.Famous("Zachary")
+        gammas = generate_random_values(100, 0, 2)
+
+        with PartitionArchiveWriter(self.path, G.vcount()) as writer:
+            self.assertIs(repeated_louvain_from_gammas(G, gammas, partition_store=writer), writer)
+            num_swept = len(writer)
+            self.assertTrue(writer.add(tuple(range(G.vcount()))))
+            self.assertFalse(writer.add(tuple(range(G.vcount()))[::-1]))
+
+        archive = PartitionArchive(self.path)
+        self.assertEqual(len(archive), num_swept + 1)
+        self.assertEqual(len(set(archive)), len(archive))
+        self.assertTrue(all(sorted_tuple(p) == p for p in archive))
+
+    def test_champ_and_pruning_accept_archive(self):
+        G = generate_connected_ER(n=100, m=500, directed=False)
+        partitions = generate_random_partitions(num_nodes=100, num_partitions=100, K_max=5)
+        write_partition_archive(self.path, partitions, chunk_size=32)
+        archive = PartitionArchive(self.path)
+        canonical_partitions = list(archive)
+
+        A_hats, P_hats = partition_coefficients_2D(G, archive, single_threaded=True)
+        expected_A_hats, expected_P_hats = partition_coefficients_2D(G, canonical_partitions, single_threaded=True)
+        self.assertTrue(np.allclose(A_hats, expected_A_hats))
+        self.assertTrue(np.allclose(P_hats, expected_P_hats))
+
+        archive_ranges = CHAMP_2D(G, archive, 0, 2)
+        list_ranges = CHAMP_2D(G, canonical_partitions, 0, 2)
+        self.assertEqual([membership for _, _, membership in archive_ranges],
+                         [membership for _, _, membership in list_ranges])
+
+        G = ig.Graph.Famous("Zachary")
+        gammas = generate_random_values(200, 0, 2)
+        write_partition_archive(self.path, repeated_louvain_from_gammas(G, gammas))
+        archive = PartitionArchive(self.path)
+        self.assertEqual(sorted(prune_to_stable_partitions(G, archive, 0, 2)),
+                         sorted(prune_to_stable_partitions(G, list(archive), 0, 2)))
+        self.assertEqual(sorted(prune_to_stable_partitions(G, archive, 0, 2, restrict_num_communities=4)),
+                         sorted(prune_to_stable_partitions(G, list(archive), 0, 2, restrict_num_communities=4)))
+
+
+if __name__ == "__main__":
+    seed(0)
+    unittest.main()
@@ -0,0 +1,131 @@
+from .shared_testing_functions import generate_connected_ER, generate_random_partition
+from modularitypruning.champ_utilities import CHAMP_2D, partition_coefficients_2D
+from modularitypruning.partition_clustering import cluster_near_duplicates, prune_near_duplicates, \
+    minhash_signatures, lsh_band_rows
+from modularitypruning.partition_similarity import similarity_matrix
+from modularitypruning.partition_store import PartitionStore
+from random import randint, sample, seed
+from scipy.optimize import linear_sum_assignment
+import numpy as np
+import unittest
+
+
+def perturbed_partitions(base, num_partitions, max_moved):
+    """Returns copies of :base: with up to :max_moved: nodes moved to random communities"""
+    K = max(base) + 1
+    partitions = []
+    for _ in range(num_partitions):
+        partition = list(base)
+        for v in sample(range(len(base)), randint(1, max_moved)):
+            partition[v] = randint(0, K - 1)
+        partitions.append(partition)
+    return partitions
+
+
+def aligned_hamming_distance(p1, p2):
+    table = np.zeros((max(p1) + 1, max(p2) + 1))
+    np.add.at(table, (p1, p2), 1)
+    return 1 - table[linear_sum_assignment(table, maximize=True)].sum() / len(p1)
+
+
+class TestPartitionClustering(unittest.TestCase):
+    def test_signatures_are_label_invariant(self):
+        partition = generate_random_partition(num_nodes=100, K=5)
+        relabeled = [(4 - label) * 3 for label in partition]
+        other = generate_random_partition(num_nodes=100, K=5)
+        signatures = minhash_signatures(np.array([partition, relabeled, other]))
+        np.testing.assert_array_equal(signatures[0], signatures[1])
+        self.assertLess(np.mean(signatures[0] == signatures[2]), 0.5)
+
+    def test_band_rows(self):
+        self.assertEqual(lsh_band_rows(64, 1.0), 64)
+        self.assertEqual(lsh_band_rows(64, 0.0), 1)
+        rows = lsh_band_rows(64, 0.8)
+        self.assertEqual(64 % rows, 0)
+        self.assertGreaterEqual(1 - (1 - 0.8 ** rows) ** (64 // rows), 0.99)
+
+    def test_groups_are_near_representatives(self):
+        n = 200
+        bases = [generate_random_partition(num_nodes=n, K=K) for K in [3, 6, 10]]
+        partitions = [p for base in bases for p in perturbed_partitions(base, 100, max_moved=5)]
+        store = PartitionStore(partitions)
+
+        for distance, epsilon in [('vi', 0.05), ('hamming', 0.05)]:
+            representatives, num_candidate_pairs = cluster_near_duplicates(store, epsilon, distance=distance)
+            self.assertTrue(all(representatives[r] == r for r in representatives))
+            self.assertLess(num_candidate_pairs, len(store) ** 2 / 4)
+
+            memberships = [store[i] for i in range(len(store))]
+            if distance == 'hamming':
+                distances = [aligned_hamming_distance(memberships[i], memberships[r])
+                             for i, r in enumerate(representatives)]
+            else:
+                # VI = 2 H(X, Y) - H(X) - H(Y)
+                distances = [self.variation_of_information(memberships[i], memberships[r]) / np.log(n)
+                             for i, r in enumerate(representatives)]
+            self.assertLessEqual(max(distances), epsilon + 1e-12)
+
+            pruned, report = prune_near_duplicates(store, epsilon, distance=distance, return_report=True)
+            self.assertEqual(report['num_partitions'], len(store))
+            self.assertEqual(report['num_representatives'], len(pruned))
+            self.assertEqual(len(pruned), len(set(representatives)))
+            self.assertLess(len(pruned), len(store) / 2)
+            self.assertAlmostEqual(report['reduction'], 1 - len(pruned) / len(store))
+
+    @staticmethod
+    def variation_of_information(p1, p2):
+        def entropy(labels):
+            _, counts = np.unique(labels, axis=0, return_counts=True)
+            probabilities = counts / len(labels)
+            return -np.sum(probabilities * np.log(probabilities))
+
+        return 2 * entropy(np.column_stack((p1, p2))) - entropy(np.array(p1)) - entropy(np.array(p2))
+
+    def test_distant_partitions_are_kept(self):
+        partitions = [generate_random_partition(num_nodes=100, K=4) for _ in range(30)]
+        self.assertLess(similarity_matrix(partitions, measure='ari')[np.triu_indices(30, 1)].max(), 0.5)
+        pruned = prune_near_duplicates(partitions, 0.01)
+        self.assertEqual(len(pruned), len(PartitionStore(partitions)))
+
+    def test_best_scoring_representatives(self):
+        n = 100
+        G = generate_connected_ER(n=n, m=5 * n, directed=False)
+        base = generate_random_partition(num_nodes=n, K=4)
+        store = PartitionStore(perturbed_partitions(base, 50, max_moved=2))
+        A_hats, P_hats = partition_coefficients_2D(G, store, single_threaded=True)
+        scores = A_hats - P_hats
+
+        representatives, _ = cluster_near_duplicates(store, 0.1, distance='hamming', scores=scores)
+        for i, r in enumerate(representatives):
+            self.assertGreaterEqual(scores[r], scores[i])
+
+        pruned = prune_near_duplicates(store, 0.1, distance='hamming', scores=scores)
+        self.assertIn(store[int(np.argmax(scores))], pruned)
+        self.assertGreater(len(CHAMP_2D(G, pruned, 0, 2)), 0)
+
+        with self.assertRaises(ValueError):
+            prune_near_duplicates(store, 0.1, scores=scores[:-1])
+        with self.assertRaises(ValueError):
+            cluster_near_duplicates(store, 0.1, distance='jaccard')
+
+    def test_scores_aligned_with_repeated_input(self):
+        base = generate_random_partition(num_nodes=100, K=4)
+        partitions = perturbed_partitions(base, 20, max_moved=2)
+        partitions = partitions + [list(p) for p in partitions[:10]]  # each of the first ten is given twice
+        store = PartitionStore(partitions)
+        self.assertLess(len(store), len(partitions))
+
+        # scores are per input entry, and only the second copy of the first partition has the best score
+        scores = np.zeros(len(partitions))
+        scores[20] = 1.0
+        pruned = prune_near_duplicates(partitions, 0.5, distance='hamming', scores=scores)
+        self.assertIn(partitions[0], pruned)
+        self.assertEqual(len(pruned), 1)
+
+        with self.assertRaises(ValueError):
+            prune_near_duplicates(partitions, 0.5, scores=scores[:len(store)])
+
+
+if __name__ == "__main__":
+    seed(0)
+    unittest.main()
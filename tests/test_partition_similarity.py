@@ -0,0 +1,63 @@
+from .shared_testing_functions import generate_random_partition, generate_random_partitions
+from modularitypruning.partition_similarity import similarity_matrix, similarities_to
+from modularitypruning.partition_store import PartitionStore
+from modularitypruning.partition_utilities import ami, nmi
+from random import randint, seed
+from sklearn.metrics import adjusted_rand_score
+import numpy as np
+import unittest
+
+MEASURES = {'nmi': nmi, 'ami': ami, 'ari': adjusted_rand_score}
+
+
+class TestPartitionSimilarity(unittest.TestCase):
+    def assert_matches_pairwise(self, partitions, others, measure):
+        expected = np.array([[MEASURES[measure](p1, p2) for p2 in others] for p1 in partitions])
+        for single_threaded in [True, False]:
+            np.testing.assert_allclose(similarity_matrix(partitions, others, measure=measure,
+                                                         single_threaded=single_threaded), expected, atol=1e-10)
+
+    def test_all_pairs(self):
+        for K_max in [1, 4, 20]:
+            partitions = generate_random_partitions(num_nodes=100, num_partitions=15, K_max=K_max)
+            for measure in MEASURES:
+                expected = np.array([[MEASURES[measure](p1, p2) for p2 in partitions] for p1 in partitions])
+                similarities = similarity_matrix(partitions, measure=measure, single_threaded=True)
+                np.testing.assert_allclose(similarities, expected, atol=1e-10)
+                np.testing.assert_allclose(similarities, similarities.T)
+
+    def test_one_vs_many(self):
+        ground_truth = generate_random_partition(num_nodes=80, K=5)
+        partitions = generate_random_partitions(num_nodes=80, num_partitions=20, K_max=10)
+        for measure in MEASURES:
+            self.assert_matches_pairwise([ground_truth], partitions, measure)
+            np.testing.assert_allclose(similarities_to(ground_truth, partitions, measure=measure),
+                                       [MEASURES[measure](ground_truth, p) for p in partitions], atol=1e-10)
+
+    def test_many_communities(self):
+        # tables much larger than the memberships themselves, including all-singleton partitions
+        partitions = [[randint(0, K - 1) for _ in range(60)] for K in [20, 30, 45, 60]] + [list(range(60))]
+        others = [[randint(0, K - 1) for _ in range(60)] for K in [2, 40, 60]] + [[0] * 60]
+        for measure in MEASURES:
+            self.assert_matches_pairwise(partitions, others, measure)
+
+    def test_partition_store_and_labels(self):
+        partitions = generate_random_partitions(num_nodes=50, num_partitions=10, K_max=6)
+        store = PartitionStore(partitions)
+        relabeled = [[3 * label + 7 for label in p] for p in partitions]
+        for measure in MEASURES:
+            np.testing.assert_allclose(similarity_matrix(store, relabeled, measure=measure),
+                                       similarity_matrix(store.memberships, partitions, measure=measure))
+
+    def test_invalid_inputs(self):
+        with self.assertRaises(ValueError):
+            similarity_matrix([[0, 1]], measure='vi')
+        with self.assertRaises(ValueError):
+            similarity_matrix([[0, 1]], [[0, 1, 2]])
+        self.assertEqual(similarity_matrix([], [[0, 1]]).shape, (0, 1))
+        self.assertEqual(similarities_to([0, 1], []).shape, (0,))
+
+
+if __name__ == "__main__":
+    seed(0)
+    unittest.main()
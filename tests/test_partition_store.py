@@ -0,0 +1,89 @@
+from .shared_testing_functions import generate_connected_ER, generate_random_partitions, generate_random_values
+from modularitypruning import prune_to_stable_partitions
+from modularitypruning.champ_utilities import CHAMP_2D, partition_coefficients_2D
+from modularitypruning.louvain_utilities import repeated_louvain_from_gammas, sorted_tuple
+from modularitypruning.partition_store import PartitionStore
+from random import seed
+import igraph as ig
+import numpy as np
+import unittest
+
+
+class TestPartitionStore(unittest.TestCase):
+    def test_deduplicates_canonical_memberships(self):
+        partitions = generate_random_partitions(num_nodes=100, num_partitions=200, K_max=10)
+        relabeled = [tuple(9 - x for x in p) for p in partitions]
+
+        store = PartitionStore(partitions + relabeled)
+        expected = {sorted_tuple(p) for p in partitions}
+
+        self.assertEqual(len(store), len(expected))
+        self.assertEqual(set(store), expected)
+        self.assertTrue(all(p in store for p in relabeled))
+        self.assertFalse(store.add(relabeled[0]))
+
+        for i, membership in enumerate(store):
+            self.assertEqual(store[i], membership)
+            self.assertEqual(store.index(membership), i)
+            self.assertEqual(store.memberships[i].tolist(), list(membership))
+
+    def test_dtype_upcast(self):
+        store = PartitionStore([(0, 0, 1, 1)])
+        self.assertEqual(store.memberships.dtype, np.uint16)
+
+        large_membership = tuple(range(70000))
+        store = PartitionStore([(0,) * 70000])
+        store.add(large_membership)
+        self.assertEqual(store.memberships.dtype, np.int32)
+        self.assertEqual(store[1], large_membership)
+        self.assertEqual(store[0], (0,) * 70000)
+
+    def test_mismatched_lengths_raise(self):
+        store = PartitionStore([(0, 1, 2)])
+        with self.assertRaises(ValueError):
+            store.add((0, 1))
+
+    def test_subset_and_num_communities(self):
+        partitions = generate_random_partitions(num_nodes=50, num_partitions=100, K_max=6)
+        store = PartitionStore(partitions)
+        num_communities = store.num_communities()
+        self.assertEqual(num_communities.tolist(), [max(p) + 1 for p in store])
+
+        subset = store.subset(num_communities == 3)
+        self.assertEqual(set(subset), {p for p in store if max(p) + 1 == 3})
+        self.assertTrue(all(p in subset for p in subset))
+
+    def test_champ_and_pruning_accept_store(self):
+        G = generate_connected_ER(n=100, m=500, directed=False)
+        partitions = generate_random_partitions(num_nodes=100, num_partitions=100, K_max=5)
+        store = PartitionStore(partitions)
+        canonical_partitions = list(store)
+
+        for single_threaded in [True, False]:
+            A_hats, P_hats = partition_coefficients_2D(G, store, single_threaded=single_threaded)
+            expected_A_hats, expected_P_hats = partition_coefficients_2D(G, canonical_partitions,
+                                                                         single_threaded=single_threaded)
+            self.assertTrue(np.allclose(A_hats, expected_A_hats))
+            self.assertTrue(np.allclose(P_hats, expected_P_hats))
+
+        store_ranges = CHAMP_2D(G, store, 0, 2)
+        list_ranges = CHAMP_2D(G, canonical_partitions, 0, 2)
+        self.assertEqual([membership for _, _, membership in store_ranges],
+                         [membership for _, _, membership in list_ranges])
+        for (store_start, store_end, _), (list_start, list_end, _) in zip(store_ranges, list_ranges):
+            self.assertAlmostEqual(store_start, list_start, places=10)
+            self.assertAlmostEqual(store_end, list_end, places=10)
+
+        G = ig.Graph.Famous("Zachary")
+        gammas = generate_random_values(200, 0, 2)
+        store = repeated_louvain_from_gammas(G, gammas, partition_store=PartitionStore())
+        self.assertIsInstance(store, PartitionStore)
+        self.assertEqual(sorted(prune_to_stable_partitions(G, store, 0, 2)),
+                         sorted(prune_to_stable_partitions(G, list(store), 0, 2)))
+        self.assertEqual(sorted(prune_to_stable_partitions(G, store, 0, 2, restrict_num_communities=4)),
+                         sorted(prune_to_stable_partitions(G, list(store), 0, 2, restrict_num_communities=4)))
+
+
+if __name__ == "__main__":
+    seed(0)
+    unittest.main()
@@ -0,0 +1,99 @@
+from .shared_testing_functions import generate_connected_ER, generate_random_partitions, generate_random_values
+from modularitypruning import prune_to_stable_partitions
+from modularitypruning.champ_utilities import CHAMP_2D, partition_coefficients_2D
+from modularitypruning.louvain_utilities import repeated_louvain_from_gammas, singlelayer_louvain
+from modularitypruning.parameter_estimation import iterative_monolayer_resolution_parameter_estimation
+from modularitypruning.parameter_estimation_utilities import gamma_estimate
+from modularitypruning.prepared_graph import PreparedGraph, _prepared_graphs, as_igraph, prepare_graph
+from random import random, seed
+import gc
+import igraph as ig
+import numpy as np
+import pickle
+import unittest
+
+
+class TestPreparedGraph(unittest.TestCase):
+    def test_arrays_match_graph(self):
+        for directed in [False, True]:
+            G = generate_connected_ER(n=50, m=200, directed=directed)
+            G.add_edge(3, 3)  # self-loops count twice towards the degree of their vertex
+            G.es['weight'] = [random() for _ in range(G.ecount())]
+            prepared = prepare_graph(G)
+
+            self.assertEqual(prepared.vcount, G.vcount())
+            self.assertEqual(prepared.ecount, G.ecount())
+            self.assertEqual(prepared.directed, directed)
+            self.assertEqual(prepared.sources.dtype, np.int32)
+            self.assertEqual(list(zip(prepared.sources.tolist(), prepared.targets.tolist())), G.get_edgelist())
+            self.assertTrue(np.allclose(prepared.weights, G.es['weight']))
+            self.assertAlmostEqual(prepared.total_weight, sum(G.es['weight']), places=10)
+            self.assertTrue(prepared.is_weighted)
+            self.assertEqual(prepared.degree.tolist(), G.degree())
+            self.assertEqual(prepared.in_degree.tolist(), G.indegree())
+            self.assertEqual(prepared.out_degree.tolist(), G.outdegree())
+            self.assertTrue(np.allclose(prepared.strength, G.strength(weights='weight')))
+            self.assertFalse(prepared.weights.flags.writeable)
+
+    def test_cache(self):
+        G = ig.Graph.Famous("Zachary")
+        prepared = prepare_graph(G)
+        self.assertIs(prepare_graph(G).sources, prepared.sources)
+        self.assertIs(prepare_graph(prepared), prepared)
+        self.assertIs(as_igraph(prepared), G)
+        self.assertFalse(prepared.is_weighted)
+        self.assertEqual(prepared.total_weight, G.ecount())
+
+        # in-place changes to the graph's structure or weights invalidate the cache
+        G.es['weight'] = [2.0] * G.ecount()
+        self.assertEqual(prepare_graph(G).total_weight, 2 * G.ecount())
+        G.add_edge(0, 33, weight=2.0)
+        self.assertEqual(prepare_graph(G).ecount, G.ecount())
+        G.delete_edges([0])
+        G.add_edge(0, 9, weight=2.0)
+        self.assertEqual(prepare_graph(G).sources.tolist(), [u for u, v in G.get_edgelist()])
+
+        # changes to unsampled weights are only picked up on refresh
+        G.es[1]['weight'] = 5.0
+        self.assertEqual(prepare_graph(G, refresh=True).total_weight, sum(G.es['weight']))
+
+        restored = pickle.loads(pickle.dumps(prepared))
+        self.assertIsInstance(restored, PreparedGraph)
+        self.assertEqual(restored.sources.tolist(), prepare_graph(G).sources.tolist())
+
+        num_cached = len(_prepared_graphs)
+        del G, prepared, restored
+        gc.collect()
+        self.assertLess(len(_prepared_graphs), num_cached)
+
+    def test_pipeline_does_not_add_weights(self):
+        G = ig.Graph.Famous("Zachary")
+        singlelayer_louvain(G, 1.0)
+        gamma_estimate(G, singlelayer_louvain(G, 1.0))
+        iterative_monolayer_resolution_parameter_estimation(G)
+        self.assertNotIn('weight', G.es.attributes())
+
+    def test_prepared_graph_accepted_everywhere(self):
+        G = ig.Graph.Famous("Zachary")
+        prepared = prepare_graph(G)
+        gammas = generate_random_values(100, 0, 2)
+        partitions = list(repeated_louvain_from_gammas(prepared, gammas))
+
+        for A, B in zip(partition_coefficients_2D(prepared, partitions), partition_coefficients_2D(G, partitions)):
+            self.assertTrue(np.allclose(A, B))
+        self.assertEqual([membership for _, _, membership in CHAMP_2D(prepared, partitions, 0, 2)],
+                         [membership for _, _, membership in CHAMP_2D(G, partitions, 0, 2)])
+        self.assertEqual(sorted(prune_to_stable_partitions(prepared, partitions, 0, 2)),
+                         sorted(prune_to_stable_partitions(G, partitions, 0, 2)))
+
+        for membership in generate_random_partitions(num_nodes=G.vcount(), num_partitions=10, K_max=4):
+            self.assertEqual(gamma_estimate(prepared, membership), gamma_estimate(G, membership))
+
+        # louvain is randomized, so the iteration may converge to different fixed points for G and prepared
+        gamma, partition = iterative_monolayer_resolution_parameter_estimation(prepared)
+        self.assertAlmostEqual(gamma, gamma_estimate(G, partition.membership), places=10)
+
+
+if __name__ == "__main__":
+    seed(0)
+    unittest.main()
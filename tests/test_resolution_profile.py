@@ -0,0 +1,105 @@
+from .shared_testing_functions import generate_connected_ER, generate_random_values, generate_random_partitions
+from modularitypruning.louvain_utilities import repeated_louvain_from_gammas
+from modularitypruning.champ_utilities import CHAMP_2D, partition_coefficients_2D
+from modularitypruning.louvain_utilities import louvain_part_with_membership
+from modularitypruning.parameter_estimation_utilities import gamma_estimates_to_stable_partitions, \
+    ranges_to_gamma_estimates
+from modularitypruning.partition_store import PartitionStore
+from modularitypruning.resolution_profile import ResolutionProfile
+from random import seed
+import numpy as np
+import unittest
+
+
+class TestResolutionProfile(unittest.TestCase):
+    def test_matches_champ(self):
+        for directed in [False, True]:
+            G = generate_connected_ER(n=100, m=1000, directed=directed)
+            G.es['weight'] = generate_random_values(G.ecount(), start_value=0.5, end_value=2.0)
+            partitions = PartitionStore(generate_random_partitions(num_nodes=100, num_partitions=50, K_max=8))
+            profile = ResolutionProfile.from_champ(G, partitions, 0.0, 2.0)
+
+            # CHAMP's halfspace intersection is randomized, so domain boundaries only agree up to rounding
+            champ_ranges = CHAMP_2D(G, partitions, 0.0, 2.0)
+            self.assertEqual(len(profile), len(champ_ranges))
+            for (gamma_start, gamma_end, membership), expected in zip(profile.ranges(), champ_ranges):
+                self.assertAlmostEqual(gamma_start, expected[0], places=8)
+                self.assertAlmostEqual(gamma_end, expected[1], places=8)
+                self.assertEqual(membership, expected[2])
+
+            gammas = np.array(generate_random_values(100, 0.0, 2.0))
+            indices = profile.optimal_partition_index(gammas)
+            A_hats, P_hats = partition_coefficients_2D(G, partitions)
+            qualities = A_hats[:, np.newaxis] - np.outer(P_hats, gammas)
+
+            # the profile's partitions are optimal among all partitions at every gamma
+            self.assertTrue(np.allclose(qualities[indices, np.arange(len(gammas))], qualities.max(axis=0)))
+            self.assertTrue(np.allclose(profile.quality(gammas), qualities.max(axis=0)))
+
+            for gamma, index, modularity in zip(gammas[:10], indices, profile.modularity(gammas[:10])):
+                membership = profile.optimal_partition(gamma)
+                self.assertEqual(membership, partitions[index])
+                louvain_part = louvain_part_with_membership(G, membership)
+                self.assertAlmostEqual(modularity * profile.normalization,
+                                       louvain_part.quality(resolution_parameter=gamma), places=8)
+
+    def test_queries_outside_range(self):
+        G = generate_connected_ER(n=50, m=250, directed=False)
+        partitions = generate_random_partitions(num_nodes=50, num_partitions=20, K_max=5)
+        profile = ResolutionProfile.from_champ(G, partitions, 0.0, 2.0)
+        gamma_start, gamma_end = profile.gamma_range
+
+        self.assertTrue((profile.domain_index([gamma_start - 1, gamma_end + 1]) == -1).all())
+        self.assertTrue(np.isnan(profile.quality([gamma_end + 1])).all())
+        with self.assertRaises(ValueError):
+            profile.optimal_partition(gamma_end + 1)
+
+        # every partition optimal somewhere in the whole range, in order
+        self.assertEqual(profile.partitions_between(gamma_start, gamma_end).tolist(),
+                         profile.partition_indices.tolist())
+        middle = (gamma_start + gamma_end) / 2
+        self.assertEqual(profile.partitions_between(middle, middle).tolist(),
+                         [profile.optimal_partition_index(middle)] if profile.domain_index(middle) >= 0 else [])
+
+    def test_empty_profile(self):
+        G = generate_connected_ER(n=50, m=250, directed=False)
+        profile = ResolutionProfile.from_champ(G, [], 0.0, 2.0)
+        self.assertEqual(len(profile), 0)
+        self.assertIsNone(profile.gamma_range)
+        self.assertEqual(profile.optimal_partition_index([0.5]).tolist(), [-1])
+        self.assertEqual(profile.ranges(), [])
+
+    def test_fixed_points_and_basins(self):
+        G = generate_connected_ER(n=200, m=1000, directed=False)
+        partitions = PartitionStore(repeated_louvain_from_gammas(G, np.linspace(0, 3, 200)))
+        profile = ResolutionProfile.from_champ(G, partitions, 0.0, 3.0)
+        gamma_estimates = profile.gamma_estimates(G)
+        fixed_domains, attractors = profile.fixed_points(gamma_estimates)
+
+        # the fixed points are exactly the stable partitions of the pruning pipeline
+        stable_partitions = gamma_estimates_to_stable_partitions(ranges_to_gamma_estimates(G, profile.ranges()))
+        self.assertEqual([partitions[profile.partition_indices[domain]] for domain in fixed_domains],
+                         stable_partitions)
+
+        # compare with running the iteration from every domain, one step at a time
+        for start in range(len(profile)):
+            domain, visited = start, set()
+            while domain >= 0 and domain not in visited:
+                visited.add(domain)
+                domain = -1 if np.isnan(gamma_estimates[domain]) else int(profile.domain_index(gamma_estimates[domain]))
+            # the iteration either left the profile or revisited a domain, which converged only if it is a fixed point
+            expected = domain if domain in fixed_domains else -1
+            self.assertEqual(attractors[start], expected)
+
+        basins = profile.basins(gamma_estimates)
+        self.assertEqual(sorted(basins), sorted(profile.partition_indices[fixed_domains].tolist()))
+        for partition_index, intervals in basins.items():
+            for gamma_start, gamma_end in intervals:
+                gammas = np.linspace(gamma_start, gamma_end, 5)[1:-1]
+                domains = profile.domain_index(gammas)
+                self.assertTrue((profile.partition_indices[attractors[domains]] == partition_index).all())
+
+
+if __name__ == "__main__":
+    seed(0)
+    unittest.main()
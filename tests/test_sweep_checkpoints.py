@@ -0,0 +1,81 @@
+from modularitypruning.checkpoint_utilities import SweepCheckpoint
+from modularitypruning.louvain_utilities import iter_parallel_louvain_from_gammas, \
+    repeated_parallel_louvain_from_gammas
+from random import seed
+import igraph as ig
+import numpy as np
+import os
+import tempfile
+import unittest
+
+
+class TestSweepCheckpoints(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "sweep.ckpt")
+        self.G = ig.Graph.Famous("Zachary")
+        self.gammas = np.linspace(0, 2, 500)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_completed_sweep_is_restored(self):
+        partitions = repeated_parallel_louvain_from_gammas(self.G, self.gammas, show_progress=False,
+                                                           checkpoint_path=self.path)
+
+        checkpoint = SweepCheckpoint(self.path, self.gammas)
+        self.assertEqual(checkpoint.pending_indices(), [])
+        self.assertEqual({partition for _, partition in checkpoint.partitions}, partitions)
+        checkpoint.close()
+
+        restored_partitions = repeated_parallel_louvain_from_gammas(self.G, self.gammas, show_progress=False,
+                                                                    checkpoint_path=self.path)
+        self.assertEqual(restored_partitions, partitions)
+
+    def test_interrupted_sweep_resumes(self):
+        sweep = iter_parallel_louvain_from_gammas(self.G, self.gammas, checkpoint_path=self.path)
+        first_results = [next(sweep) for _ in range(100)]
+        sweep.close()  # simulate an interruption partway through the sweep
+
+        checkpoint = SweepCheckpoint(self.path, self.gammas)
+        pending_gammas = {self.gammas[i] for i in checkpoint.pending_indices()}
+        num_pending = len(pending_gammas)
+        self.assertGreater(num_pending, 0)
+        self.assertLess(num_pending, len(self.gammas))
+        checkpoint.close()
+
+        resumed_results = list(iter_parallel_louvain_from_gammas(self.G, self.gammas, checkpoint_path=self.path))
+        resumed_partitions = [partition for _, partition, is_new in resumed_results if is_new]
+        self.assertEqual(len(resumed_partitions), len(set(resumed_partitions)))
+
+        # the resumed sweep only reruns the pending gammas, but restores every partition committed before
+        rerun_gammas = [gamma for gamma, _, _ in resumed_results[len(resumed_results) - num_pending:]]
+        self.assertEqual(len(rerun_gammas), num_pending)
+
+        checkpoint = SweepCheckpoint(self.path, self.gammas)
+        self.assertEqual(checkpoint.pending_indices(), [])
+        # partitions first found in the interrupted (uncommitted) chunk are discarded, and rerunning louvain at its
+        # gammas need not find them again, so only those of committed chunks are guaranteed to be kept
+        committed_partitions = {p for gamma, p, new in first_results if new and gamma not in pending_gammas}
+        self.assertTrue({p for _, p in checkpoint.partitions}.issuperset(committed_partitions))
+        checkpoint.close()
+
+    def test_partially_written_record_is_discarded(self):
+        partitions = repeated_parallel_louvain_from_gammas(self.G, self.gammas, show_progress=False,
+                                                           checkpoint_path=self.path)
+        with open(self.path, 'ab') as f:
+            f.write(b'\x10\x00\x00')  # simulate a crash in the middle of appending a record
+
+        restored_partitions = repeated_parallel_louvain_from_gammas(self.G, self.gammas, show_progress=False,
+                                                                    checkpoint_path=self.path)
+        self.assertEqual(restored_partitions, partitions)
+
+    def test_mismatched_parameters_raise(self):
+        SweepCheckpoint(self.path, self.gammas).close()
+        with self.assertRaises(ValueError):
+            SweepCheckpoint(self.path, self.gammas[:-1])
+
+
+if __name__ == "__main__":
+    seed(0)
+    unittest.main()
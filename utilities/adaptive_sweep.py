@@ -0,0 +1,168 @@
+from .champ_utilities import partition_coefficients_3D
+from .louvain_utilities import multilayer_louvain, iter_parallel_louvain_from_points, louvain_sweep_pool, \
+    DEFAULT_MAX_TASKS_PER_CHILD
+from .partition_store import PartitionStore
+from contextlib import nullcontext
+from math import ceil, log2
+import numpy as np
+
+DEFAULT_INITIAL_GRID_SIZE = (9, 9)  # number of gammas and omegas in the initial, coarse grid
+DEFAULT_REFINEMENT_LEVELS = 5  # default number of times a coarse grid cell may be subdivided
+
+
+def _lattice_values(value_range, num_intervals):
+    start, end = value_range
+    return start + (end - start) * np.arange(num_intervals + 1) / num_intervals
+
+
+def _refine_resolution_grid(evaluate, gamma_range, omega_range, initial_grid_size, refinement_levels, max_runs,
+                            optimal_partitions=None):
+    """Quadtree refinement of a (gamma, omega) grid.
+
+    All points lie on a lattice that is 2^:refinement_levels: times finer than the initial grid (along each axis), so
+    points shared by neighboring cells are only evaluated once. Each round, every cell whose corners do not all yield
+    the same partition is split in half along each axis that is not yet at the lattice spacing. If
+    :optimal_partitions: is given, cells whose corners have different optimal partitions among all partitions found so
+    far (i.e. cells that straddle a CHAMP domain boundary) are split as well.
+
+    :param evaluate: function from a list of (gamma, omega) points to a list of their partition ids
+    :param gamma_range: (smallest gamma, largest gamma)
+    :param omega_range: (smallest omega, largest omega)
+    :param initial_grid_size: (number of gammas, number of omegas) of the initial grid
+    :param refinement_levels: maximum number of times a cell of the initial grid is subdivided, either for both axes
+                              or as (gamma levels, omega levels)
+    :param max_runs: if not None, the maximum number of points evaluated
+    :param optimal_partitions: if not None, function from arrays of gammas and omegas to the ids of their optimal
+                               partitions
+    :return: dict of {(gamma, omega): partition id} of all evaluated points"""
+    num_gammas, num_omegas = initial_grid_size
+    if num_gammas < 2 or num_omegas < 2:
+        raise ValueError("The initial grid must have at least two gammas and two omegas")
+
+    gamma_levels, omega_levels = np.broadcast_to(refinement_levels, 2)
+    gamma_scale, omega_scale = 2 ** int(gamma_levels), 2 ** int(omega_levels)
+    gammas = _lattice_values(gamma_range, (num_gammas - 1) * gamma_scale)
+    omegas = _lattice_values(omega_range, (num_omegas - 1) * omega_scale)
+    partition_ids = {}
+
+    def evaluate_lattice_points(points):
+        points = [point for point in dict.fromkeys(points) if point not in partition_ids]
+        if max_runs is not None:
+            points = points[:max(max_runs - len(partition_ids), 0)]
+        if points:
+            results = evaluate([(gammas[i], omegas[j]) for i, j in points])
+            partition_ids.update(zip(points, results))
+
+    def corners(cell):
+        i0, i1, j0, j1 = cell
+        return [(i0, j0), (i1, j0), (i0, j1), (i1, j1)]
+
+    def halves(start, end):
+        # an axis already at the lattice spacing is left whole
+        return [(start, (start + end) // 2), ((start + end) // 2, end)] if end - start > 1 else [(start, end)]
+
+    cells = [(i * gamma_scale, (i + 1) * gamma_scale, j * omega_scale, (j + 1) * omega_scale)
+             for i in range(num_gammas - 1) for j in range(num_omegas - 1)]
+    evaluate_lattice_points([corner for cell in cells for corner in corners(cell)])
+
+    # all cells of a round have the same size, so the first one tells whether any can still be split
+    while cells and (cells[0][1] - cells[0][0] > 1 or cells[0][3] - cells[0][2] > 1):
+        # cells with unevaluated corners are only possible once the run budget is exhausted
+        cells = [cell for cell in cells if all(corner in partition_ids for corner in corners(cell))]
+        if not cells:
+            break
+
+        cell_corners = np.array([[partition_ids[corner] for corner in corners(cell)] for cell in cells])
+        split = (cell_corners != cell_corners[:, :1]).any(axis=1)
+        if optimal_partitions is not None:
+            corner_points = np.array([corner for cell in cells for corner in corners(cell)])
+            optimal = optimal_partitions(gammas[corner_points[:, 0]], omegas[corner_points[:, 1]]).reshape(-1, 4)
+            split |= (optimal != optimal[:, :1]).any(axis=1)
+
+        children = []
+        for (i0, i1, j0, j1), split_cell in zip(cells, split):
+            if split_cell:
+                children.extend((i_start, i_end, j_start, j_end) for i_start, i_end in halves(i0, i1)
+                                for j_start, j_end in halves(j0, j1))
+        evaluate_lattice_points([corner for cell in children for corner in corners(cell)])
+        cells = children
+
+    return {(gammas[i], omegas[j]): partition_id for (i, j), partition_id in partition_ids.items()}
+
+
+def adaptive_louvain_from_gammas_omegas(G_intralayer, G_interlayer, layer_vec, gamma_range, omega_range,
+                                        initial_grid_size=DEFAULT_INITIAL_GRID_SIZE, min_cell_size=None,
+                                        max_runs=None, refine_champ_boundaries=True, single_threaded=False,
+                                        partition_store=None, return_samples=False,
+                                        max_tasks_per_child=DEFAULT_MAX_TASKS_PER_CHILD):
+    """
+    Runs louvain on an adaptively refined grid of (gamma, omega) values.
+
+    Starting from a coarse grid, each cell whose corners give different partitions (or, if :refine_champ_boundaries:,
+    whose corners are in different CHAMP domains of the partitions found so far) is subdivided into four. This
+    concentrates the runs near the boundaries of the partitions' domains of optimality, so that it finds essentially
+    the same somewhere-optimal partitions as a dense grid with a small fraction of the runs.
+
+    :param G_intralayer: input graph containing all intra-layer edges
+    :param G_interlayer: input graph containing all inter-layer edges
+    :param layer_vec: vector of each vertex's layer membership
+    :param gamma_range: (smallest gamma, largest gamma) to run louvain at
+    :param omega_range: (smallest omega, largest omega) to run louvain at
+    :param initial_grid_size: (number of gammas, number of omegas) of the initial grid
+    :param min_cell_size: (gamma size, omega size) below which cells are no longer subdivided along that axis. If
+                          None, cells of the initial grid are subdivided at most five times along each axis
+    :param max_runs: if not None, the maximum number of louvain runs
+    :param refine_champ_boundaries: if True, also subdivide cells that straddle CHAMP domain boundaries
+    :param single_threaded: if True, run louvain serially. Otherwise, each round of refinement runs in parallel, on a
+                            single worker pool shared by all rounds
+    :param partition_store: if not None, a PartitionStore to which the unique partitions are added
+    :param return_samples: if True, also return a dictionary of each (gamma, omega) run to the index of its partition
+                           in the returned store
+    :param max_tasks_per_child: number of louvain runs after which a worker process is replaced
+    :return: PartitionStore of all unique partitions encountered (:partition_store:, if provided)
+    """
+    store = partition_store if partition_store is not None else PartitionStore()
+
+    if min_cell_size is None:
+        refinement_levels = DEFAULT_REFINEMENT_LEVELS
+    else:
+        coarse_cell_size = ((gamma_range[1] - gamma_range[0]) / (initial_grid_size[0] - 1),
+                            (omega_range[1] - omega_range[0]) / (initial_grid_size[1] - 1))
+        refinement_levels = tuple(ceil(log2(coarse / minimum)) if coarse > minimum > 0 else 0
+                                  for coarse, minimum in zip(coarse_cell_size, min_cell_size))
+
+    def evaluate(points):
+        if pool is None:
+            partitions = [multilayer_louvain(G_intralayer, G_interlayer, layer_vec, gamma, omega)
+                          for gamma, omega in points]
+        else:
+            point_partitions = {}
+            results = iter_parallel_louvain_from_points(G_intralayer, G_interlayer, layer_vec, points, pool=pool)
+            for gamma, omega, partition, _ in results:
+                point_partitions[gamma, omega] = partition
+            partitions = [point_partitions[point] for point in points]
+
+        store.update(partitions)
+        return [store.index(partition) for partition in partitions]
+
+    coefficients = [np.zeros(0)] * 3
+
+    def optimal_partitions(gammas, omegas):
+        # partitions are only ever appended to the store, so only the new ones need their coefficients computed
+        num_known = len(coefficients[0])
+        if num_known < len(store):
+            new_coefficients = partition_coefficients_3D(G_intralayer, G_interlayer, layer_vec,
+                                                         store.memberships[num_known:], single_threaded=True)
+            coefficients[:] = [np.concatenate((known, new)) for known, new in zip(coefficients, new_coefficients)]
+        A_hats, P_hats, C_hats = coefficients
+        qualities = A_hats - np.outer(gammas, P_hats) + np.outer(omegas, C_hats)
+        return np.argmax(qualities, axis=1)
+
+    with (nullcontext() if single_threaded else
+          louvain_sweep_pool(G_intralayer, G_interlayer, layer_vec, max_tasks_per_child=max_tasks_per_child)) as pool:
+        samples = _refine_resolution_grid(evaluate, gamma_range, omega_range, initial_grid_size, refinement_levels,
+                                          max_runs, optimal_partitions if refine_champ_boundaries else None)
+
+    if return_samples:
+        return store, samples
+    return store
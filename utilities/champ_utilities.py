@@ -1,17 +1,23 @@
-from .partition_utilities import all_degrees, in_degrees, out_degrees, membership_to_communities, \
-    membership_to_layered_communities
+from .instrumentation import stage
+from .lazy_imports import lazy_import
+from .partition_archive import PartitionArchive
+from .partition_store import PartitionStore
+from .prepared_graph import prepare_graph
+from .progress import sweep_telemetry
 from collections import defaultdict
-from champ import get_intersection
+from itertools import islice
 import numpy as np
 from numpy import VisibleDeprecationWarning
 from numpy.random import choice
-from math import floor
 from multiprocessing import Pool, cpu_count
-from scipy.spatial import HalfspaceIntersection
-from scipy.linalg import LinAlgWarning
-from scipy.optimize import linprog, OptimizeWarning
+from time import perf_counter
 import warnings
 
+champ = lazy_import("champ")
+scipy_linalg = lazy_import("scipy.linalg")
+scipy_optimize = lazy_import("scipy.optimize")
+scipy_spatial = lazy_import("scipy.spatial")
+
 
 def get_interior_point(halfspaces, initial_num_sampled=50):
     """
@@ -26,8 +32,8 @@ def get_interior_point(halfspaces, initial_num_sampled=50):
     # We suppress these two warnings to avoid cluttering output, some of these warnings are expected as the result is
     # converged to and we've checked the consistency of results in our own tests. Moreover, we explicitly check the
     # interior point's validity prior to returning.
-    warnings.filterwarnings("ignore", category=LinAlgWarning)
-    warnings.filterwarnings("ignore", category=OptimizeWarning)
+    warnings.filterwarnings("ignore", category=scipy_linalg.LinAlgWarning)
+    warnings.filterwarnings("ignore", category=scipy_optimize.OptimizeWarning)
 
     normals, offsets = np.split(halfspaces, [-1], axis=1)
 
@@ -46,20 +52,22 @@ def get_interior_point(halfspaces, initial_num_sampled=50):
         A = np.hstack((sampled_hs[:, :-1], norm_vector))
         b = -sampled_hs[:, -1:]
 
-        res = linprog(c, A_ub=A, b_ub=b, bounds=(-np.inf, np.inf), method='interior-point')
+        res = scipy_optimize.linprog(c, A_ub=A, b_ub=b, bounds=(-np.inf, np.inf), method='interior-point')
 
-        if res.status == 0 and res.success:
+        # res.status codes
+        # 1: "Interior point calculation: scipy.optimize.linprog exceeded iteration limit"
+        # 2: "Interior point calculation: scipy.optimize.linprog problem is infeasible"
+        # 3: "Interior point calculation: scipy.optimize.linprog problem is unbounded"
+        # 4: "Interior point calculation: scipy.optimize.linprog encountered numerical difficulties"
+        # With badly scaled coefficients (e.g. large graphs), status 4 is often reported along with a usable point, so
+        # any point returned is accepted as long as it is actually interior.
+        if res.status in (0, 4) and res.x is not None and np.isfinite(res.x).all():
             intpt = res.x[:-1]  # res.x contains [interior_point, distance to enclosing polyhedron]
 
             # ensure that the computed point is actually interior to all halfspaces
             if (np.dot(normals, intpt) + np.transpose(offsets) < 0).all():
                 break
 
-        # res.status codes
-        # 1: "Interior point calculation: scipy.optimize.linprog exceeded iteration limit"
-        # 2: "Interior point calculation: scipy.optimize.linprog problem is infeasible"
-        # 3: "Interior point calculation: scipy.optimize.linprog problem is unbounded"
-
         # if we failed while sampling all halfspaces, the linear program seems impossible
         assert initial_num_sampled < len(interior_hs), "get_interior_point problem is impossible or degenerate!"
         initial_num_sampled *= 2  # try again and sample more halfspaces this time
@@ -67,38 +75,73 @@ def get_interior_point(halfspaces, initial_num_sampled=50):
     return intpt
 
 
-def CHAMP_2D(G, all_parts, gamma_0, gamma_f, single_threaded=False):
+def _indexable_partitions(all_parts):
+    """Returns :all_parts: as a sequence supporting len() and indexing, without loading matrices or archives"""
+    if isinstance(all_parts, (PartitionStore, PartitionArchive, np.ndarray)):
+        return all_parts
+    return list(all_parts)
+
+
+def _membership_at(all_parts, i):
+    membership = all_parts[i]
+    return tuple(membership.tolist()) if isinstance(membership, np.ndarray) else membership
+
+
+def CHAMP_2D(G, all_parts, gamma_0, gamma_f, single_threaded=False, partition_coefficients=None):
     """Calculates the pruned set of partitions from CHAMP on gamma_0 <= gamma <= gamma_f
 
-    :param G: graph of interest
-    :param all_parts: partitions to prune
+    :param G: graph of interest (igraph graph or PreparedGraph)
+    :param all_parts: partitions to prune (an iterable of memberships, a membership matrix such as a numpy.memmap, a
+                      PartitionStore, or a PartitionArchive). Only the partitions' coefficients are kept in memory.
     :param gamma_0: starting gamma value
     :param gamma_f: ending gamma value
     :param single_threaded: if True, run without parallelization
+    :param partition_coefficients: if not None, precomputed (A_hats, P_hats) of :all_parts: (e.g. from
+                                   IncrementalCoefficients2D), in which case G is not used
     :return: list of [(domain_gamma_start, domain_gamma_end, membership), ...]
     """
 
-    # TODO: remove this filter once scipy updates their library
-    # scipy.linprog currently uses deprecated numpy behavior, so we suppress this warning to avoid output clutter
-    warnings.filterwarnings("ignore", category=VisibleDeprecationWarning)
+    all_parts = _indexable_partitions(all_parts)
 
     if len(all_parts) == 0:
         return []
 
-    all_parts = list(all_parts)
-    num_partitions = len(all_parts)
+    if partition_coefficients is None:
+        partition_coefficients = partition_coefficients_2D(G, all_parts, single_threaded=single_threaded)
+
+    return [(gamma_start, gamma_end, _membership_at(all_parts, i))
+            for gamma_start, gamma_end, i in champ_2D_domains(*partition_coefficients, gamma_0, gamma_f)]
 
-    partition_coefficients = partition_coefficients_2D(G, all_parts, single_threaded=single_threaded)
-    A_hats, P_hats = partition_coefficients
+
+def champ_2D_domains(A_hats, P_hats, gamma_0, gamma_f):
+    """Calculates the CHAMP domains of optimality on gamma_0 <= gamma <= gamma_f from partitions' coefficients alone
+
+    :param A_hats: array of the partitions' A_hat coefficients
+    :param P_hats: array of the partitions' P_hat coefficients
+    :param gamma_0: starting gamma value
+    :param gamma_f: ending gamma value
+    :return: list of [(domain_gamma_start, domain_gamma_end, partition index), ...], sorted by domain_gamma_start
+    """
+
+    # TODO: remove this filter once scipy updates their library
+    # scipy.linprog currently uses deprecated numpy behavior, so we suppress this warning to avoid output clutter
+    warnings.filterwarnings("ignore", category=VisibleDeprecationWarning)
+
+    A_hats, P_hats = np.asarray(A_hats), np.asarray(P_hats)
+    num_partitions = len(A_hats)
+    if num_partitions == 0:
+        return []
 
     top = max(A_hats - P_hats * gamma_0)  # Could potentially be optimized
     right = gamma_f  # Could potentially use the max intersection x value
-    halfspaces = np.vstack((halfspaces_from_coefficients_2D(*partition_coefficients),
+    halfspaces = np.vstack((halfspaces_from_coefficients_2D(A_hats, P_hats),
                             np.array([[0, 1, -top], [1, 0, -right]])))
 
     # Could potentially scale axes so Chebyshev center is better for problem
-    interior_point = get_interior_point(halfspaces)
-    hs = HalfspaceIntersection(halfspaces, interior_point)
+    with stage("interior_point_lp", items=len(halfspaces)):
+        interior_point = get_interior_point(halfspaces)
+    with stage("halfspace_intersection", items=len(halfspaces)):
+        hs = scipy_spatial.HalfspaceIntersection(halfspaces, interior_point)
 
     # scipy does not support facets by halfspace directly, so we must compute them
     facets_by_halfspace = defaultdict(list)
@@ -113,93 +156,252 @@ def CHAMP_2D(G, all_parts, gamma_0, gamma_f, single_threaded=False):
         x1, x2 = intersections[0][0], intersections[1][0]
         if x1 > x2:
             x1, x2 = x2, x1
-        ranges.append((x1, x2, all_parts[i]))
+        ranges.append((x1, x2, i))
 
     return sorted(ranges, key=lambda x: x[0])
 
 
-def CHAMP_3D(G_intralayer, G_interlayer, layer_vec, all_parts, gamma_0, gamma_f, omega_0, omega_f):
+def CHAMP_3D(G_intralayer, G_interlayer, layer_vec, all_parts, gamma_0, gamma_f, omega_0, omega_f,
+             partition_coefficients=None):
     """Calculates the CHAMP set at :gamma_0: <= gamma <= :gamma_f: and :omega_0: <= omega <= :omega_f:
 
     Defers to the original CHAMP implementation for most of the halfspace intersection for now.
 
+    If :partition_coefficients: is not None, it holds the precomputed (A_hats, P_hats, C_hats) of :all_parts: (e.g.
+    from IncrementalCoefficients3D) and the graphs are not used.
+
     Returns a list of [(list of polygon vertices in (gamma, omega) plane, membership), ...]"""
     # TODO: we resort to the original CHAMP implementation, so gamma_0 and omega_0 have no effect for now
 
-    all_parts = list(all_parts)
-    A_hats, P_hats, C_hats = partition_coefficients_3D(G_intralayer, G_interlayer, layer_vec, all_parts)
+    all_parts = _indexable_partitions(all_parts)
+    if partition_coefficients is None:
+        partition_coefficients = partition_coefficients_3D(G_intralayer, G_interlayer, layer_vec, all_parts)
+    A_hats, P_hats, C_hats = partition_coefficients
     champ_coef_array = np.vstack((A_hats, P_hats, C_hats)).T
 
-    for attempt in range(1, 10):
-        try:
-            champ_domains = get_intersection(champ_coef_array, max_pt=(omega_f, gamma_f))
-            break
-        except:  # noqa TODO: I think this is generally QhullError, but this needs to be checked
-            continue
-    else:
-        # If this actually occurs, it's best to break your input partitions into smaller subsets
-        # Then, repeatedly combine the somewhere dominant (or "admissible") domains with CHAMP
-        assert False, "CHAMP failed, " \
-                      "perhaps break your input partitions into smaller subsets and then combine with CHAMP?"
-
-    domains = [([x[:2] for x in polyverts], all_parts[part_idx]) for part_idx, polyverts in champ_domains.items()]
+    with stage("halfspace_intersection_3D", items=len(champ_coef_array)):
+        for attempt in range(1, 10):
+            try:
+                champ_domains = champ.get_intersection(champ_coef_array, max_pt=(omega_f, gamma_f))
+                break
+            except:  # noqa TODO: I think this is generally QhullError, but this needs to be checked
+                continue
+        else:
+            # If this actually occurs, it's best to break your input partitions into smaller subsets
+            # Then, repeatedly combine the somewhere dominant (or "admissible") domains with CHAMP
+            assert False, "CHAMP failed, " \
+                          "perhaps break your input partitions into smaller subsets and then combine with CHAMP?"
+
+    domains = [([x[:2] for x in polyverts], _membership_at(all_parts, part_idx))
+               for part_idx, polyverts in champ_domains.items()]
     return domains
 
 
-def partition_coefficients_2D_serial(G, partitions):
-    """Computes A_hat and P_hat for partitions of :G:
+# partition matrices are processed in blocks of rows, each holding roughly this many (partition, edge) comparisons
+COEFFICIENT_BLOCK_ELEMENTS = 2 ** 22
 
-    TODO: support edge weights"""
 
-    all_edges = [(e.source, e.target) for e in G.es]
+def coefficient_block_rows(num_nodes, num_edges, block_elements=COEFFICIENT_BLOCK_ELEMENTS):
+    """Returns the number of partitions to process at once for a graph with :num_nodes: nodes and :num_edges: edges"""
+    return max(1, block_elements // max(num_nodes, num_edges, 1))
 
-    # multiply by 2 only if undirected here
-    if G.is_directed():
-        A_hats = np.array([sum([membership[u] == membership[v] for u, v in all_edges])
-                           for membership in partitions])
-    else:
-        A_hats = np.array([2 * sum([membership[u] == membership[v] for u, v in all_edges])
-                           for membership in partitions])
 
-    if G.is_directed():
+def iter_membership_blocks(partitions, block_rows):
+    """Yields the memberships in :partitions: as consecutive 2D arrays of at most :block_rows: rows.
+
+    Membership matrices (including numpy.memmap) are sliced so that only one block is paged into memory at a time and
+    PartitionArchives are decoded one chunk at a time. Other iterables of memberships are consumed lazily."""
+    if isinstance(partitions, PartitionArchive):
+        for chunk in partitions.iter_blocks():
+            yield from iter_membership_blocks(chunk, block_rows)
+        return
+
+    if isinstance(partitions, PartitionStore):
+        partitions = partitions.memberships
+
+    if isinstance(partitions, np.ndarray):
+        for start in range(0, len(partitions), block_rows):
+            yield np.asarray(partitions[start:start + block_rows])
+        return
+
+    block = []
+    for membership in partitions:
+        block.append(membership)
+        if len(block) == block_rows:
+            yield np.array(block)
+            block = []
+    if block:
+        yield np.array(block)
+
+
+def _internal_edge_weights(block, sources, targets, weights, directed):
+    """Sums the weights of edges (twice if undirected) within communities for each membership in :block:.
+
+    :weights: is None for unweighted graphs, in which case the edges are simply counted"""
+    internal = block[:, sources] == block[:, targets]
+    totals = internal.sum(axis=1) if weights is None else internal @ weights
+    return totals if directed else 2 * totals
+
+
+def _community_sums(block, weights, num_labels):
+    """Sums :weights: over the nodes of each label in :block:, returning a (len(block) x num_labels) array"""
+    keys = block + num_labels * np.arange(len(block), dtype=np.int64)[:, np.newaxis]
+    sums = np.bincount(keys.ravel(), weights=np.broadcast_to(weights, block.shape).ravel(),
+                       minlength=len(block) * num_labels)
+    return sums.reshape(len(block), num_labels)
+
+
+def _partition_coefficients_2D_block(sources, targets, weights, in_strength, out_strength, total_weight, directed,
+                                     block):
+    A_hats = _internal_edge_weights(block, sources, targets, weights, directed)
+
+    block = block.astype(np.int64, copy=False)
+    num_labels = int(block.max()) + 1 if block.size else 0
+    if directed:
         # directed modularity of Leicht and Newman is actually
         #   (1/m) sum_{ij} [A_{ij} - k_i^{in} * k_j^{out} / m] delta(c_i, c_j)
-        in_degree = in_degrees(G)
-        out_degree = out_degrees(G)
-        P_hats = np.array([sum(sum(in_degree[v] for v in vs) * sum(out_degree[v] for v in vs)
-                               for vs in membership_to_communities(membership).values())
-                           for membership in partitions]) / G.ecount()
+        in_sums = _community_sums(block, in_strength, num_labels)
+        out_sums = _community_sums(block, out_strength, num_labels)
+        P_hats = (in_sums * out_sums).sum(axis=1) / total_weight
     else:
-        twom = 2 * G.ecount()
-        degree = all_degrees(G)
-        P_hats = np.array([sum(sum(degree[v] for v in vs) ** 2 for vs in membership_to_communities(membership).values())
-                           for membership in partitions]) / twom
+        strength_sums = _community_sums(block, in_strength, num_labels)
+        P_hats = (strength_sums ** 2).sum(axis=1) / (2 * total_weight)
 
     return A_hats, P_hats
 
 
-def partition_coefficients_2D(G, partitions, single_threaded=False):
-    """Computes partitions coefficients in parallel by calling partition_coefficients_2D_serial"""
-    partitions = list(partitions)
+def _partition_coefficients_3D_block(intralayer_sources, intralayer_targets, intralayer_weights, interlayer_sources,
+                                     interlayer_targets, interlayer_weights, in_strength, out_strength,
+                                     intralayer_directed, interlayer_directed, layer_vec, weight_per_layer, block):
+    A_hats = _internal_edge_weights(block, intralayer_sources, intralayer_targets, intralayer_weights,
+                                    intralayer_directed)
+    C_hats = _internal_edge_weights(block, interlayer_sources, interlayer_targets, interlayer_weights,
+                                    interlayer_directed)
+
+    # communities are split by layer, so each (community, layer) pair is treated as its own label
+    num_layers = len(weight_per_layer)
+    block = block.astype(np.int64, copy=False) * num_layers + layer_vec
+    num_labels = int(block.max()) + 1 if block.size else 0
+    layer_weights = np.resize(weight_per_layer, num_labels)
+
+    if intralayer_directed:
+        community_terms = _community_sums(block, in_strength, num_labels) * _community_sums(block, out_strength,
+                                                                                            num_labels)
+    else:
+        community_terms = _community_sums(block, in_strength, num_labels) ** 2
+        layer_weights = 2 * layer_weights
+
+    # layers without intralayer edges contribute nothing to the null model
+    P_hats = np.divide(community_terms, layer_weights, out=np.zeros_like(community_terms),
+                       where=layer_weights > 0).sum(axis=1)
+
+    return A_hats, P_hats, C_hats
+
+
+def _edge_weights(G):
+    """Returns the edge weights of :G: for the coefficient kernels, or None if it is unweighted"""
+    return G.weights if G.is_weighted else None
+
+
+def _graph_arrays_2D(G):
+    return G.sources, G.targets, _edge_weights(G), G.in_strength, G.out_strength, G.total_weight, G.directed
+
+
+def _graph_arrays_3D(G_intralayer, G_interlayer, layer_vec):
+    layer_vec = np.asarray(layer_vec, dtype=np.int64)
+    weight_per_layer = np.bincount(layer_vec[G_intralayer.sources], weights=G_intralayer.weights,
+                                   minlength=layer_vec.max() + 1)
+    return (G_intralayer.sources, G_intralayer.targets, _edge_weights(G_intralayer), G_interlayer.sources,
+            G_interlayer.targets, _edge_weights(G_interlayer), G_intralayer.in_strength, G_intralayer.out_strength,
+            G_intralayer.directed, G_interlayer.directed, layer_vec, weight_per_layer)
+
+
+def _concatenate_coefficients(results, num_coefficients):
+    if not results:
+        return tuple(np.zeros(0) for _ in range(num_coefficients))
+    return tuple(np.concatenate(coefficients) for coefficients in zip(*results))
+
+
+_coefficient_worker_args = None
+
+
+def _initialize_coefficient_worker(block_function, *args):
+    global _coefficient_worker_args
+    _coefficient_worker_args = (block_function,) + args
+
+
+def _timed_block_coefficients(block_function, *args):
+    """Returns the result of :block_function: along with the number of rows of its block and its run time"""
+    start = perf_counter()
+    result = block_function(*args)
+    return result, len(args[-1]), perf_counter() - start
 
+
+def _coefficient_worker_task(block):
+    block_function, *args = _coefficient_worker_args
+    return _timed_block_coefficients(block_function, *args, block)
+
+
+def _blocked_partition_coefficients(block_function, graph_arrays, partitions, block_rows, num_coefficients,
+                                    single_threaded, telemetry=None):
+    """Applies :block_function: to consecutive row blocks of :partitions:, concatenating the resulting coefficients.
+
+    In parallel, at most one block per worker is resident at a time, so the partitions never have to fit in memory
+    (see iter_membership_blocks). If :telemetry: is not None, each completed block is recorded to the
+    SweepTelemetry."""
+    blocks = iter_membership_blocks(partitions, block_rows)
+    processes = 1 if single_threaded else cpu_count()
+    if telemetry is not None:
+        telemetry.start(len(partitions) if hasattr(partitions, '__len__') else None, processes)
+
+    def record(timed_results):
+        for result, num_rows, run_time in timed_results:
+            if telemetry is not None:
+                telemetry.record(num_rows, busy_time=run_time)
+            results.append(result)
+
+    results = []
     if single_threaded:
-        A_hats, P_hats = partition_coefficients_2D_serial(G, partitions)
+        record(_timed_block_coefficients(block_function, *graph_arrays, block) for block in blocks)
     else:
-        partition_chunks = [
-            partitions[floor(i * len(partitions) / cpu_count()):floor((i + 1) * len(partitions) / cpu_count())]
-            for i in range(cpu_count())
-        ]
+        with Pool(processes=processes, initializer=_initialize_coefficient_worker,
+                  initargs=(block_function,) + graph_arrays) as pool:
+            while True:
+                window = list(islice(blocks, processes))
+                if not window:
+                    break
+                record(pool.map(_coefficient_worker_task, window))
 
-        pool = Pool(processes=cpu_count())
-        results = pool.starmap(partition_coefficients_2D_serial,
-                               [(G, partition_chunk) for partition_chunk in partition_chunks])
-        pool.close()
+    if telemetry is not None:
+        telemetry.finish()
+    return _concatenate_coefficients(results, num_coefficients)
 
-        A_hats = np.array([v for A_hats, P_hats in results for v in A_hats])
-        P_hats = np.array([v for A_hats, P_hats in results for v in P_hats])
 
-    assert len(A_hats) == len(P_hats) == len(partitions)
+def partition_coefficients_2D_serial(G, partitions):
+    """Computes A_hat and P_hat for partitions of :G:, using its 'weight' edge attribute if present"""
+    return partition_coefficients_2D(G, partitions, single_threaded=True)
+
+
+def partition_coefficients_2D(G, partitions, single_threaded=False, show_progress=False):
+    """Computes A_hat and P_hat for partitions of :G:, vectorized over blocks of partitions.
 
+    If :G: has a 'weight' edge attribute, A_hat and P_hat are computed from edge weights and node strengths.
+
+    :param G: graph of interest (igraph graph or PreparedGraph)
+    :param partitions: iterable of memberships, membership matrix (possibly a numpy.memmap), PartitionStore, or
+                       PartitionArchive. Only one block of partitions is loaded into memory at a time.
+    :param single_threaded: if True, run without parallelization
+    :param show_progress: if True, log throughput telemetry at INFO level (see SweepTelemetry), which is only shown if
+                          logging is configured. A SweepTelemetry may be passed to customize the reports
+    :return: arrays A_hats, P_hats"""
+    G = prepare_graph(G)
+    block_rows = coefficient_block_rows(G.vcount, G.ecount)
+    with stage("coefficients_2D") as span:
+        telemetry = sweep_telemetry(show_progress, "partition coefficients", unit="partitions")
+        A_hats, P_hats = _blocked_partition_coefficients(_partition_coefficients_2D_block, _graph_arrays_2D(G),
+                                                         partitions, block_rows, 2, single_threaded, telemetry)
+        span.add_items(len(A_hats))
+    assert len(A_hats) == len(P_hats)
     return A_hats, P_hats
 
 
@@ -215,71 +417,33 @@ def halfspaces_from_coefficients_2D(A_hats, P_hats):
 
 def partition_coefficients_3D_serial(G_intralayer, G_interlayer, layer_vec, partitions):
     """Computes A_hat, P_hat, C_hat for partitions of a graph with intralayer edges given in :G_intralayer:,
-    interlayer edges given in :G_interlayer:, and layer membership :layer_vec:
+    interlayer edges given in :G_interlayer:, and layer membership :layer_vec:, using their 'weight' edge attributes if
+    present"""
+    return partition_coefficients_3D(G_intralayer, G_interlayer, layer_vec, partitions, single_threaded=True)
 
-    TODO: support edge weights"""
 
-    all_intralayer_edges = [(e.source, e.target) for e in G_intralayer.es]
-    all_interlayer_edges = [(e.source, e.target) for e in G_interlayer.es]
-
-    # multiply by 2 only if undirected here
-    if G_intralayer.is_directed():
-        A_hats = np.array([sum([membership[u] == membership[v] for u, v in all_intralayer_edges])
-                           for membership in partitions])
-    else:
-        A_hats = np.array([2 * sum([membership[u] == membership[v] for u, v in all_intralayer_edges])
-                           for membership in partitions])
-
-    num_layers = max(layer_vec) + 1
-    ecount_per_layer = np.zeros(num_layers)
-    for e in G_intralayer.es:
-        ecount_per_layer[layer_vec[e.source]] += 1
-
-    if G_intralayer.is_directed():
-        in_degree = in_degrees(G_intralayer)
-        out_degree = out_degrees(G_intralayer)
-        P_hats = np.array([
-            sum(sum(in_degree[v] for v in vs) * sum(out_degree[v] for v in vs) / ecount_per_layer[layer]
-                for (_, layer), vs in membership_to_layered_communities(membership, layer_vec).items())
-            for membership in partitions
-        ])
-    else:
-        degree = all_degrees(G_intralayer)
-        P_hats = np.array([
-            sum(sum(degree[v] for v in vs) ** 2 / (2 * ecount_per_layer[layer])
-                for (_, layer), vs in membership_to_layered_communities(membership, layer_vec).items())
-            for membership in partitions
-        ])
-
-    # multiply by 2 only if undirected here
-    if G_interlayer.is_directed():
-        C_hats = np.array([sum([membership[u] == membership[v] for u, v in all_interlayer_edges])
-                           for membership in partitions])
-    else:
-        C_hats = np.array([2 * sum([membership[u] == membership[v] for u, v in all_interlayer_edges])
-                           for membership in partitions])
-
-    return A_hats, P_hats, C_hats
+def partition_coefficients_3D(G_intralayer, G_interlayer, layer_vec, partitions, single_threaded=False,
+                              show_progress=False):
+    """Computes A_hat, P_hat, C_hat for partitions of a multilayer graph, vectorized over blocks of partitions.
 
+    If either graph has a 'weight' edge attribute, its coefficients are computed from edge weights and node strengths.
 
-def partition_coefficients_3D(G_intralayer, G_interlayer, layer_vec, partitions):
-    """Computes partitions coefficients in parallel by calling partition_coefficients_3D_serial"""
-    partitions = list(partitions)
-    partition_chunks = [
-        partitions[floor(i * len(partitions) / cpu_count()):floor((i + 1) * len(partitions) / cpu_count())]
-        for i in range(cpu_count())
-    ]
-
-    pool = Pool(processes=cpu_count())
-    results = pool.starmap(partition_coefficients_3D_serial,
-                           [(G_intralayer, G_interlayer, layer_vec, partition_chunk)
-                            for partition_chunk in partition_chunks])
-    pool.close()
-
-    A_hats = np.array([v for A_hats, P_hats, C_hats in results for v in A_hats])
-    P_hats = np.array([v for A_hats, P_hats, C_hats in results for v in P_hats])
-    C_hats = np.array([v for A_hats, P_hats, C_hats in results for v in C_hats])
-
-    assert len(A_hats) == len(P_hats) == len(C_hats) == len(partitions)
-
+    :param G_intralayer: intralayer graph of interest (igraph graph or PreparedGraph)
+    :param G_interlayer: interlayer graph of interest (igraph graph or PreparedGraph)
+    :param layer_vec: list of each vertex's layer membership
+    :param partitions: iterable of memberships, membership matrix (possibly a numpy.memmap), PartitionStore, or
+                       PartitionArchive. Only one block of partitions is loaded into memory at a time.
+    :param single_threaded: if True, run without parallelization
+    :param show_progress: if True, log throughput telemetry at INFO level (see SweepTelemetry), which is only shown if
+                          logging is configured. A SweepTelemetry may be passed to customize the reports
+    :return: arrays A_hats, P_hats, C_hats"""
+    G_intralayer, G_interlayer = prepare_graph(G_intralayer), prepare_graph(G_interlayer)
+    block_rows = coefficient_block_rows(G_intralayer.vcount, G_intralayer.ecount + G_interlayer.ecount)
+    with stage("coefficients_3D") as span:
+        telemetry = sweep_telemetry(show_progress, "multilayer partition coefficients", unit="partitions")
+        A_hats, P_hats, C_hats = _blocked_partition_coefficients(
+            _partition_coefficients_3D_block, _graph_arrays_3D(G_intralayer, G_interlayer, layer_vec), partitions,
+            block_rows, 3, single_threaded, telemetry)
+        span.add_items(len(A_hats))
+    assert len(A_hats) == len(P_hats) == len(C_hats)
     return A_hats, P_hats, C_hats
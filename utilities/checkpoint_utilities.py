@@ -0,0 +1,107 @@
+import hashlib
+import numpy as np
+import os
+import pickle
+import struct
+
+CHECKPOINT_VERSION = 1
+
+# each record is stored as (payload length, payload digest, pickled payload)
+_RECORD_HEADER = struct.Struct('<Q16s')
+
+
+def parameters_fingerprint(parameters):
+    """Returns a digest identifying a list of resolution parameters (e.g. gammas or (gamma, omega) pairs)."""
+    return hashlib.blake2b(np.asarray(parameters, dtype=np.float64).tobytes(), digest_size=16).digest()
+
+
+def _payload_digest(payload):
+    return hashlib.blake2b(payload, digest_size=16).digest()
+
+
+def _read_records(file):
+    """Reads all intact records from :file:, returning the records and the byte offset just past the last of them."""
+    records = []
+    valid_length = 0
+
+    while True:
+        header = file.read(_RECORD_HEADER.size)
+        if len(header) < _RECORD_HEADER.size:
+            break
+
+        length, digest = _RECORD_HEADER.unpack(header)
+        payload = file.read(length)
+        if len(payload) < length or _payload_digest(payload) != digest:
+            break  # truncated or corrupted by a crash mid-write
+
+        records.append(pickle.loads(payload))
+        valid_length += _RECORD_HEADER.size + length
+
+    return records, valid_length
+
+
+class SweepCheckpoint:
+    """Append-only checkpoint of a parallel Louvain sweep over :parameters:, stored at :path:.
+
+    The first record of the file identifies the sweep's resolution parameters. Every subsequent record holds the
+    indices of one completed chunk of :parameters: along with the (parameters, partition) pairs first encountered in
+    that chunk. Each record is written with a single append followed by an fsync, so a crash can at worst leave a
+    partially written final record, which is discarded when the checkpoint is reopened."""
+
+    def __init__(self, path, parameters):
+        self.path = path
+        self.fingerprint = parameters_fingerprint(parameters)
+        self.completed = np.zeros(len(parameters), dtype=bool)
+        self.partitions = []  # (parameters, partition) pairs restored from previous runs
+        self._uncommitted_partitions = []
+
+        if os.path.exists(path):
+            self._file = open(path, 'r+b')
+            records, valid_length = _read_records(self._file)
+            self._file.seek(valid_length)
+            self._file.truncate()
+        else:
+            self._file = open(path, 'wb')
+            records = []
+
+        if not records:
+            self._append({'version': CHECKPOINT_VERSION, 'fingerprint': self.fingerprint,
+                          'num_parameters': len(parameters)})
+            return
+
+        header, chunk_records = records[0], records[1:]
+        if header.get('version') != CHECKPOINT_VERSION or header.get('fingerprint') != self.fingerprint:
+            self._file.close()
+            raise ValueError(f"Checkpoint {path} was written by a sweep over different resolution parameters")
+
+        for record in chunk_records:
+            self.completed[record['indices']] = True
+            self.partitions.extend(zip(record['parameters'], (tuple(row) for row in record['memberships'].tolist())))
+
+    def _append(self, record):
+        payload = pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL)
+        self._file.write(_RECORD_HEADER.pack(len(payload), _payload_digest(payload)) + payload)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def pending_indices(self):
+        """Returns the indices of the parameters that have not been completed yet."""
+        return np.flatnonzero(~self.completed).tolist()
+
+    def record_partition(self, parameters, partition):
+        """Records a newly encountered partition, to be persisted when its chunk is committed."""
+        self._uncommitted_partitions.append((parameters, partition))
+
+    def commit_chunk(self, indices):
+        """Persists the completion of the parameters at :indices: along with the partitions recorded since the last
+        commit."""
+        parameters = [p for p, _ in self._uncommitted_partitions]
+        memberships = np.array([m for _, m in self._uncommitted_partitions], dtype=np.int64)
+        self._append({'indices': np.asarray(indices, dtype=np.int64), 'parameters': parameters,
+                      'memberships': memberships})
+
+        self.completed[indices] = True
+        self._uncommitted_partitions = []
+
+    def close(self):
+        self._file.close()
@@ -0,0 +1,360 @@
+from .champ_utilities import _community_sums, iter_membership_blocks, coefficient_block_rows
+from .partition_archive import PartitionArchive
+from .partition_store import PartitionStore
+from .prepared_graph import prepare_graph
+from collections import namedtuple
+import numpy as np
+
+# Coefficients of a single partition along with the community degree sums needed to update them as nodes move. For
+# undirected graphs, out_sums is in_sums.
+PartitionCoefficientState = namedtuple('PartitionCoefficientState',
+                                       ['membership', 'internal_weight', 'in_sums', 'out_sums', 'null_sum',
+                                        'total_weight', 'directed'])
+
+
+def _membership_matrix(partitions):
+    """Returns the membership matrix of :partitions:, except for compressed or delta-encoded PartitionArchives, which
+    are returned as is so that they can be decoded one chunk at a time rather than all at once."""
+    if isinstance(partitions, PartitionArchive):
+        return partitions.memberships if partitions.is_raw else partitions
+    if isinstance(partitions, PartitionStore):
+        return partitions.memberships
+    if isinstance(partitions, np.ndarray):
+        return partitions
+    return np.array(list(partitions))
+
+
+def _num_labels(memberships):
+    if isinstance(memberships, PartitionArchive):
+        return int(memberships.num_communities().max(initial=0))
+    return int(memberships.max()) + 1 if memberships.size else 0
+
+
+def _membership_columns(memberships, columns):
+    """Returns the labels of :columns: in every partition of a membership matrix or (non-raw) PartitionArchive"""
+    if isinstance(memberships, PartitionArchive):
+        blocks = [block[:, columns] for block in memberships.iter_blocks()]
+        return np.vstack(blocks).astype(np.int64) if blocks else np.empty((0, len(columns)), dtype=np.int64)
+    return np.asarray(memberships[:, columns], dtype=np.int64)
+
+
+def _edge_delta(edges, weights):
+    edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+    weights = np.ones(len(edges)) if weights is None else np.asarray(weights, dtype=float)
+    if len(weights) != len(edges):
+        raise ValueError(f"{len(weights)} weights were given for {len(edges)} edges")
+    return edges, weights
+
+
+class _IncrementalCoefficients:
+    """Shared edge delta handling of IncrementalCoefficients2D and IncrementalCoefficients3D.
+
+    Each changed edge is applied to every partition at once, so a delta costs O(|delta| * num_partitions) and only
+    the memberships of its endpoints are read from the (possibly memory-mapped) membership matrix. Compressed or
+    delta-encoded PartitionArchives are never decoded into memory as a whole. Instead, they are decoded one chunk at a
+    time, during construction and again for each delta."""
+
+    def _delta_labels(self, edges):
+        """Returns the labels of the endpoints of :edges: in every partition, as a (num_partitions x |edges| x 2)
+        array"""
+        endpoints, local_edges = np.unique(edges, return_inverse=True)
+        labels = _membership_columns(self.memberships, endpoints)
+        return labels[:, local_edges.reshape(edges.shape)]
+
+    def _add_to_sums(self, null_sums, in_sums, out_sums, directed, source_keys, target_keys, weight):
+        """Adds an edge of :weight: between the (community, layer) keys of its endpoints to the community degree
+        sums, updating the null model sums (of in_sum * out_sum or squared degree sums) accordingly."""
+        rows = self._rows
+        if directed:
+            null_sums += weight * in_sums[rows, source_keys]
+            out_sums[rows, source_keys] += weight
+            null_sums += weight * out_sums[rows, target_keys]
+            in_sums[rows, target_keys] += weight
+        else:
+            for keys in (source_keys, target_keys):
+                degree_sums = in_sums[rows, keys]
+                null_sums += weight * (2 * degree_sums + weight)
+                in_sums[rows, keys] = degree_sums + weight
+
+    def save(self, path):
+        """Saves the cached coefficient state (but not the memberships) to :path: as a .npz file"""
+        np.savez(path, **{name: getattr(self, name) for name in self._state_arrays})
+
+    @classmethod
+    def load(cls, path, partitions):
+        """Restores coefficients saved with save() for the same :partitions:"""
+        coefficients = cls.__new__(cls)
+        coefficients.memberships = _membership_matrix(partitions)
+        coefficients._rows = np.arange(len(coefficients.memberships))
+        with np.load(path) as state:
+            for name in cls._state_arrays:
+                setattr(coefficients, name, state[name])
+        coefficients._restore()
+        return coefficients
+
+    def _restore(self):
+        pass
+
+    def add_edges(self, edges, weights=None, **kwargs):
+        """Updates the coefficients for the addition of :edges: (with :weights:, which default to 1)"""
+        self._apply(*_edge_delta(edges, weights), **kwargs)
+
+    def remove_edges(self, edges, weights=None, **kwargs):
+        """Updates the coefficients for the removal of :edges: (with :weights:, which default to 1)"""
+        edges, weights = _edge_delta(edges, weights)
+        self._apply(edges, -weights, **kwargs)
+
+
+class IncrementalCoefficients2D(_IncrementalCoefficients):
+    """A_hat and P_hat of a fixed set of partitions, maintained as edges are added to or removed from the graph.
+
+    Besides the coefficients, this caches each partition's community degree sums (num_partitions x num_labels), from
+    which P_hat can be updated exactly as edge weights change. The coefficients match partition_coefficients_2D on
+    the updated graph, so they can be passed to CHAMP_2D via its partition_coefficients argument.
+
+    :param G: graph of interest (igraph graph or PreparedGraph)
+    :param partitions: membership matrix (possibly a numpy.memmap), PartitionStore, PartitionArchive, or list of
+                       memberships"""
+
+    _state_arrays = ('directed', 'total_weight', 'internal_weights', 'in_sums', 'out_sums', 'null_sums')
+
+    def __init__(self, G, partitions):
+        G = prepare_graph(G)
+        self.memberships = _membership_matrix(partitions)
+        self._rows = np.arange(len(self.memberships))
+        self.directed = np.array(G.directed)
+        self.total_weight = np.array(G.total_weight)
+
+        num_labels = _num_labels(self.memberships)
+        internal_weights, in_sums, out_sums = [], [], []
+        for block in iter_membership_blocks(self.memberships, coefficient_block_rows(G.vcount, G.ecount)):
+            block = block.astype(np.int64, copy=False)
+            internal_weights.append((block[:, G.sources] == block[:, G.targets]) @ G.weights)
+            in_sums.append(_community_sums(block, G.in_strength, num_labels))
+            if G.directed:
+                out_sums.append(_community_sums(block, G.out_strength, num_labels))
+
+        self.internal_weights = np.concatenate(internal_weights) if internal_weights else np.zeros(0)
+        self.in_sums = np.vstack(in_sums) if in_sums else np.zeros((0, num_labels))
+        self.out_sums = np.vstack(out_sums) if G.directed and out_sums else self.in_sums
+        self.null_sums = (self.in_sums * self.out_sums).sum(axis=1)
+
+    def _restore(self):
+        if not self.directed:
+            self.out_sums = self.in_sums
+
+    @property
+    def A_hats(self):
+        return self.internal_weights if self.directed else 2 * self.internal_weights
+
+    @property
+    def P_hats(self):
+        return self.null_sums / self.total_weight if self.directed else self.null_sums / (2 * self.total_weight)
+
+    @property
+    def coefficients(self):
+        """Current (A_hats, P_hats)"""
+        return self.A_hats, self.P_hats
+
+    def _apply(self, edges, weights):
+        if len(edges) == 0:
+            return
+
+        labels = self._delta_labels(edges)
+        for i, weight in enumerate(weights):
+            source_labels, target_labels = labels[:, i, 0], labels[:, i, 1]
+            self.internal_weights += weight * (source_labels == target_labels)
+            self._add_to_sums(self.null_sums, self.in_sums, self.out_sums, self.directed, source_labels,
+                              target_labels, weight)
+        self.total_weight = self.total_weight + weights.sum()
+
+
+class IncrementalCoefficients3D(_IncrementalCoefficients):
+    """A_hat, P_hat, and C_hat of a fixed set of multilayer partitions, maintained as intralayer or interlayer edges
+    are added to or removed from the graph.
+
+    Besides the coefficients, this caches each partition's community degree sums within each layer
+    (num_partitions x num_labels * num_layers). The coefficients match partition_coefficients_3D on the updated
+    graphs, so they can be passed to CHAMP_3D via its partition_coefficients argument.
+
+    :param G_intralayer: intralayer graph of interest (igraph graph or PreparedGraph)
+    :param G_interlayer: interlayer graph of interest (igraph graph or PreparedGraph)
+    :param layer_vec: list of each vertex's layer membership
+    :param partitions: membership matrix (possibly a numpy.memmap), PartitionStore, PartitionArchive, or list of
+                       memberships"""
+
+    _state_arrays = ('intralayer_directed', 'interlayer_directed', 'layer_vec', 'layer_weights', 'internal_weights',
+                     'interlayer_internal_weights', 'in_sums', 'out_sums', 'null_sums')
+
+    def __init__(self, G_intralayer, G_interlayer, layer_vec, partitions):
+        G_intralayer, G_interlayer = prepare_graph(G_intralayer), prepare_graph(G_interlayer)
+        self.memberships = _membership_matrix(partitions)
+        self._rows = np.arange(len(self.memberships))
+        self.intralayer_directed = np.array(G_intralayer.directed)
+        self.interlayer_directed = np.array(G_interlayer.directed)
+        self.layer_vec = np.asarray(layer_vec, dtype=np.int64)
+
+        num_layers = int(self.layer_vec.max()) + 1
+        self.layer_weights = np.bincount(self.layer_vec[G_intralayer.sources], weights=G_intralayer.weights,
+                                         minlength=num_layers)
+
+        num_keys = _num_labels(self.memberships) * num_layers
+        internal_weights, interlayer_internal_weights, in_sums, out_sums = [], [], [], []
+        block_rows = coefficient_block_rows(G_intralayer.vcount, G_intralayer.ecount + G_interlayer.ecount)
+        for block in iter_membership_blocks(self.memberships, block_rows):
+            block = block.astype(np.int64, copy=False)
+            internal_weights.append((block[:, G_intralayer.sources] == block[:, G_intralayer.targets]) @
+                                    G_intralayer.weights)
+            interlayer_internal_weights.append((block[:, G_interlayer.sources] == block[:, G_interlayer.targets]) @
+                                               G_interlayer.weights)
+
+            # communities are split by layer, so each (community, layer) pair is its own key
+            keys = block * num_layers + self.layer_vec
+            in_sums.append(_community_sums(keys, G_intralayer.in_strength, num_keys))
+            if G_intralayer.directed:
+                out_sums.append(_community_sums(keys, G_intralayer.out_strength, num_keys))
+
+        self.internal_weights = np.concatenate(internal_weights) if internal_weights else np.zeros(0)
+        self.interlayer_internal_weights = (np.concatenate(interlayer_internal_weights)
+                                            if interlayer_internal_weights else np.zeros(0))
+        self.in_sums = np.vstack(in_sums) if in_sums else np.zeros((0, num_keys))
+        self.out_sums = np.vstack(out_sums) if G_intralayer.directed and out_sums else self.in_sums
+        self.null_sums = (self.in_sums * self.out_sums).reshape(len(self.memberships), -1, num_layers).sum(axis=1)
+
+    def _restore(self):
+        if not self.intralayer_directed:
+            self.out_sums = self.in_sums
+
+    @property
+    def A_hats(self):
+        return self.internal_weights if self.intralayer_directed else 2 * self.internal_weights
+
+    @property
+    def P_hats(self):
+        layer_weights = self.layer_weights if self.intralayer_directed else 2 * self.layer_weights
+        # layers without intralayer edges contribute nothing to the null model
+        return np.divide(self.null_sums, layer_weights, out=np.zeros_like(self.null_sums),
+                         where=layer_weights > 0).sum(axis=1)
+
+    @property
+    def C_hats(self):
+        return (self.interlayer_internal_weights if self.interlayer_directed
+                else 2 * self.interlayer_internal_weights)
+
+    @property
+    def coefficients(self):
+        """Current (A_hats, P_hats, C_hats)"""
+        return self.A_hats, self.P_hats, self.C_hats
+
+    def add_edges(self, edges, weights=None, interlayer=False):
+        """Updates the coefficients for the addition of intralayer (or, if :interlayer:, interlayer) :edges: with
+        :weights:, which default to 1"""
+        super().add_edges(edges, weights, interlayer=interlayer)
+
+    def remove_edges(self, edges, weights=None, interlayer=False):
+        """Updates the coefficients for the removal of intralayer (or, if :interlayer:, interlayer) :edges: with
+        :weights:, which default to 1"""
+        super().remove_edges(edges, weights, interlayer=interlayer)
+
+    def _apply(self, edges, weights, interlayer=False):
+        if len(edges) == 0:
+            return
+
+        labels = self._delta_labels(edges)
+        if interlayer:
+            same_community = labels[:, :, 0] == labels[:, :, 1]
+            self.interlayer_internal_weights += same_community @ weights
+            return
+
+        layers = self.layer_vec[edges[:, 0]]
+        if (layers != self.layer_vec[edges[:, 1]]).any():
+            raise ValueError("Intralayer edges must connect vertices in the same layer")
+
+        num_layers = len(self.layer_weights)
+        for i, (weight, layer) in enumerate(zip(weights, layers)):
+            source_labels, target_labels = labels[:, i, 0], labels[:, i, 1]
+            self.internal_weights += weight * (source_labels == target_labels)
+            null_sums = self.null_sums[:, layer]
+            self._add_to_sums(null_sums, self.in_sums, self.out_sums, self.intralayer_directed,
+                              source_labels * num_layers + layer, target_labels * num_layers + layer, weight)
+            self.null_sums[:, layer] = null_sums
+        self.layer_weights = self.layer_weights + np.bincount(layers, weights=weights, minlength=num_layers)
+
+
+def partition_coefficient_state(G, membership):
+    """Computes the PartitionCoefficientState of a single partition from scratch, in O(m) time.
+
+    :param G: graph of interest (igraph graph or PreparedGraph)
+    :param membership: community membership of the partition
+    :return: PartitionCoefficientState"""
+    G = prepare_graph(G)
+    membership = np.array(membership, dtype=np.int64)
+    num_labels = int(membership.max()) + 1 if len(membership) else 0
+
+    internal_weight = float((membership[G.sources] == membership[G.targets]) @ G.weights)
+    in_sums = np.bincount(membership, weights=G.in_strength, minlength=num_labels)
+    out_sums = np.bincount(membership, weights=G.out_strength, minlength=num_labels) if G.directed else in_sums
+    return PartitionCoefficientState(membership, internal_weight, in_sums, out_sums, float(in_sums @ out_sums),
+                                     G.total_weight, G.directed)
+
+
+def state_coefficients(state):
+    """Returns the (A_hat, P_hat) of a PartitionCoefficientState, as in partition_coefficients_2D."""
+    if state.directed:
+        return state.internal_weight, state.null_sum / state.total_weight
+    return 2 * state.internal_weight, state.null_sum / (2 * state.total_weight)
+
+
+def move_nodes(G, state, child_membership, moved_nodes=None):
+    """Computes the PartitionCoefficientState of a child partition that differs from the parent partition of :state:
+    only in the communities of a few nodes.
+
+    Only the edges incident to the moved nodes and the degree sums of the communities they leave or join are
+    touched, so the update costs O(sum of moved degrees + number of labels) rather than the O(m) of a full pass.
+
+    The child's labels must agree with the parent's on every unmoved node, i.e. the child must not be relabeled
+    (e.g. canonicalized) relative to the parent.
+
+    :param G: graph of interest (igraph graph or PreparedGraph), the same as that of :state:
+    :param state: PartitionCoefficientState of the parent partition
+    :param child_membership: community membership of the child partition
+    :param moved_nodes: nodes whose community differs between the parent and the child (if None, this is found by
+                        comparing the memberships)
+    :return: PartitionCoefficientState of the child partition"""
+    G = prepare_graph(G)
+    parent = state.membership
+    child = np.asarray(child_membership, dtype=np.int64)
+    if moved_nodes is None:
+        moved_nodes = np.flatnonzero(parent != child)
+    moved_nodes = np.unique(np.asarray(moved_nodes, dtype=np.int64))
+    if len(moved_nodes) == 0:
+        return state._replace(membership=child)
+
+    # each edge incident to a moved node is counted once, even if both of its endpoints moved
+    indptr, incident_edges = G.incidence
+    edge_ids = np.unique(np.concatenate([incident_edges[indptr[v]:indptr[v + 1]] for v in moved_nodes]))
+    sources, targets = G.sources[edge_ids], G.targets[edge_ids]
+    internal_weight = state.internal_weight + float(((child[sources] == child[targets]).astype(np.float64) -
+                                                     (parent[sources] == parent[targets])) @ G.weights[edge_ids])
+
+    old_labels, new_labels = parent[moved_nodes], child[moved_nodes]
+    num_labels = max(len(state.in_sums), int(new_labels.max()) + 1)
+    in_sums = np.zeros(num_labels)
+    in_sums[:len(state.in_sums)] = state.in_sums
+    out_sums = in_sums
+    if state.directed:
+        out_sums = np.zeros(num_labels)
+        out_sums[:len(state.out_sums)] = state.out_sums
+
+    # only the terms of the null sum (of in_sum * out_sum) for communities that nodes leave or join change
+    touched = np.unique(np.concatenate((old_labels, new_labels)))
+    null_sum = state.null_sum - float(in_sums[touched] @ out_sums[touched])
+    np.subtract.at(in_sums, old_labels, G.in_strength[moved_nodes])
+    np.add.at(in_sums, new_labels, G.in_strength[moved_nodes])
+    if state.directed:
+        np.subtract.at(out_sums, old_labels, G.out_strength[moved_nodes])
+        np.add.at(out_sums, new_labels, G.out_strength[moved_nodes])
+    null_sum += float(in_sums[touched] @ out_sums[touched])
+
+    return PartitionCoefficientState(child, internal_weight, in_sums, out_sums, null_sum, state.total_weight,
+                                     state.directed)
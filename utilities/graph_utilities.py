@@ -0,0 +1,155 @@
+import igraph as ig
+import io
+import numpy as np
+import os
+import re
+import warnings
+import zlib
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import connected_components
+
+GRAPH_CACHE_VERSION = 3
+_GRAPH_CACHE_ARRAYS = ('indptr', 'indices')
+
+# comment lines, e.g. SNAP's "# FromNodeId\tToNodeId" or Matrix Market style "% ..."
+_COMMENT_LINE = re.compile(r'^[ \t]*[#%].*$', flags=re.MULTILINE)
+
+
+def read_edge_list(path, delimiter=None, num_columns=2, skip_header=False):
+    """Parses a text edge list with one edge per line, ignoring comment lines (starting with "#" or "%").
+
+    The whole file is parsed by NumPy at once rather than line by line.
+
+    :param path: path of the edge list
+    :param delimiter: column delimiter (if None, columns are separated by whitespace)
+    :param num_columns: number of columns per line (only the first two, the edge endpoints, are returned)
+    :param skip_header: if True, the first line of the file is a header (e.g. "node_1,node_2") and is skipped
+    :return: (num_edges x 2) int64 array of edge endpoints
+    :raises ValueError: if any other line is malformed, has a negative vertex id, or does not have :num_columns:
+                        columns
+    """
+    with open(path) as file:
+        if skip_header:
+            file.readline()
+        text = _COMMENT_LINE.sub('', file.read())
+
+    if not text.strip():
+        return np.empty((0, 2), dtype=np.int64)
+
+    try:
+        with warnings.catch_warnings():
+            # NumPy deprecates (rather than rejects) truncating non-integer vertex ids such as "4.5"
+            warnings.simplefilter("error", DeprecationWarning)
+            values = np.loadtxt(io.StringIO(text), dtype=np.int64, delimiter=delimiter, ndmin=2)
+    except (ValueError, DeprecationWarning) as error:
+        raise ValueError(f"{path} is not a valid edge list: {error}") from error
+
+    if values.shape[1] != num_columns:
+        raise ValueError(f"{path} does not contain {num_columns} columns on every line")
+    if (values[:, :2] < 0).any():
+        raise ValueError(f"{path} is not a valid edge list: vertex ids must be non-negative")
+    return values[:, :2]
+
+
+def edges_to_csr(edges, num_vertices=None):
+    """Converts an edge list to CSR arrays (indptr, indices), where the targets of vertex i's edges are
+    indices[indptr[i]:indptr[i + 1]]. Edges are ordered by source vertex, keeping their relative order otherwise."""
+    edges = np.asarray(edges).reshape(-1, 2)
+    if num_vertices is None:
+        num_vertices = int(edges.max()) + 1 if len(edges) else 0
+
+    order = np.argsort(edges[:, 0], kind='stable')
+    indptr = np.zeros(num_vertices + 1, dtype=np.int64)
+    np.cumsum(np.bincount(edges[:, 0], minlength=num_vertices), out=indptr[1:])
+    return indptr, edges[order, 1].astype(np.int32)
+
+
+def graph_from_csr(indptr, indices, directed=False):
+    """Builds an igraph graph from CSR arrays (see edges_to_csr) without going through lists of Python tuples."""
+    num_vertices = len(indptr) - 1
+    sources = np.repeat(np.arange(num_vertices, dtype=np.int32), np.diff(indptr))
+    return ig.Graph(n=num_vertices, edges=np.column_stack((sources, indices)), directed=directed)
+
+
+def giant_component_edges(edges, directed=False):
+    """Restricts an edge list to the largest connected component of its graph, relabeling vertices consecutively.
+
+    Components are strongly connected if :directed:, as in igraph's Graph.clusters().giant(). Ties between equally
+    large components are broken towards the one containing the lowest vertex id. For undirected graphs this is
+    exactly igraph's choice; for directed graphs igraph instead picks by its own component numbering.
+
+    :return: (edges of the giant component, number of vertices in the giant component)
+    """
+    edges = np.asarray(edges).reshape(-1, 2)
+    num_vertices = int(edges.max()) + 1 if len(edges) else 0
+    adjacency = csr_matrix((np.ones(len(edges), dtype=bool), (edges[:, 0], edges[:, 1])),
+                           shape=(num_vertices, num_vertices))
+    _, labels = connected_components(adjacency, directed=directed, connection='strong')
+
+    # scipy's labels follow its traversal order, so ties are broken explicitly by the first vertex with a largest label
+    is_largest = np.bincount(labels) == np.bincount(labels).max()
+    in_giant = labels == labels[np.argmax(is_largest[labels])]
+    relabeling = np.cumsum(in_giant) - 1
+    giant_edges = edges[in_giant[edges[:, 0]] & in_giant[edges[:, 1]]]
+    return relabeling[giant_edges], int(in_giant.sum())
+
+
+def _graph_cache_paths(path):
+    return {name: f"{path}.{name}.npy" for name in _GRAPH_CACHE_ARRAYS + ('meta',)}
+
+
+def _graph_cache_metadata(path, delimiter, skip_header, directed, giant_component):
+    stat = os.stat(path)
+    delimiter_key = -1 if delimiter is None else zlib.crc32(delimiter.encode())
+    return np.array([GRAPH_CACHE_VERSION, stat.st_size, stat.st_mtime_ns, delimiter_key, skip_header, directed,
+                     giant_component], dtype=np.int64)
+
+
+def _load_graph_cache(path, metadata):
+    paths = _graph_cache_paths(path)
+    try:
+        if not np.array_equal(np.load(paths['meta']), metadata):
+            return None
+        return tuple(np.load(paths[name], mmap_mode='r') for name in _GRAPH_CACHE_ARRAYS)
+    except (OSError, ValueError):
+        return None
+
+
+def _save_graph_cache(path, metadata, arrays):
+    paths = _graph_cache_paths(path)
+    # the metadata is written last, so a partially written cache is never considered valid
+    for name, array in list(zip(_GRAPH_CACHE_ARRAYS, arrays)) + [('meta', metadata)]:
+        temporary_path = paths[name] + ".tmp"
+        with open(temporary_path, 'wb') as file:
+            np.save(file, array)
+        os.replace(temporary_path, paths[name])
+
+
+def load_edge_list_graph(path, delimiter=None, directed=False, giant_component=True, use_cache=True,
+                         skip_header=False):
+    """Loads a graph from a text edge list (e.g. from SNAP), optionally restricted to its giant component.
+
+    The parsed graph is cached as CSR arrays in .npy files next to :path: (e.g. "edges.txt.indptr.npy"). Later loads
+    memory-map these instead of parsing the text again, as long as the edge list is unchanged.
+
+    :param path: path of the edge list
+    :param delimiter: column delimiter (if None, columns are separated by whitespace)
+    :param directed: whether the graph is directed
+    :param giant_component: if True, return only the largest connected component of the graph
+    :param use_cache: if True, read and write the CSR cache
+    :param skip_header: if True, the first line of the file is a header (e.g. "node_1,node_2") and is skipped
+    :return: igraph graph
+    """
+    metadata = _graph_cache_metadata(path, delimiter, skip_header, directed, giant_component)
+    arrays = _load_graph_cache(path, metadata) if use_cache else None
+
+    if arrays is None:
+        edges = read_edge_list(path, delimiter=delimiter, skip_header=skip_header)
+        num_vertices = None
+        if giant_component:
+            edges, num_vertices = giant_component_edges(edges, directed=directed)
+        arrays = edges_to_csr(edges, num_vertices=num_vertices)
+        if use_cache:
+            _save_graph_cache(path, metadata, arrays)
+
+    return graph_from_csr(*arrays, directed=directed)
@@ -0,0 +1,176 @@
+from .lazy_imports import lazy_import
+from contextlib import contextmanager
+import json
+import os
+import sys
+import threading
+from time import perf_counter, process_time
+
+psutil = lazy_import("psutil")
+
+try:
+    import resource
+except ImportError:  # resource is not available on Windows
+    resource = None
+
+# the StageRecorder that spans are currently recorded to, or None if instrumentation is disabled
+_active_recorder = None
+
+
+def peak_rss():
+    """Returns the peak resident set size (in bytes) of the current process."""
+    if resource is None:
+        memory_info = psutil.Process().memory_info()
+        return getattr(memory_info, 'peak_wset', memory_info.rss)
+
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss if sys.platform == 'darwin' else 1024 * max_rss  # ru_maxrss is in kilobytes on Linux
+
+
+class _DisabledSpan:
+    """Span returned by stage() while instrumentation is disabled. A single instance is shared and does nothing."""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+    def add_items(self, count):
+        pass
+
+
+_DISABLED_SPAN = _DisabledSpan()
+
+
+class _Span:
+    __slots__ = ('recorder', 'name', 'items', 'parent', 'depth', 'start', 'start_cpu', 'start_peak_rss')
+
+    def __init__(self, recorder, name, items):
+        self.recorder = recorder
+        self.name = name
+        self.items = items
+
+    def __enter__(self):
+        stack = self.recorder._stack()
+        self.parent = stack[-1] if stack else None
+        self.depth = len(stack)
+        stack.append(self.name)
+        self.start_peak_rss = peak_rss()
+        self.start_cpu = process_time()
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        wall_time = perf_counter() - self.start
+        cpu_time = process_time() - self.start_cpu
+        end_peak_rss = peak_rss()
+        self.recorder._stack().pop()
+        self.recorder.spans.append({'name': self.name, 'parent': self.parent, 'depth': self.depth,
+                                    'start': self.start - self.recorder.start, 'wall_time': wall_time,
+                                    'cpu_time': cpu_time, 'items': self.items, 'peak_rss': end_peak_rss,
+                                    'peak_rss_increase': end_peak_rss - self.start_peak_rss,
+                                    'thread': threading.get_ident()})
+        return False
+
+    def add_items(self, count):
+        """Adds :count: to the number of items (e.g. partitions or halfspaces) processed in this span"""
+        self.items = count if self.items is None else self.items + count
+
+
+class StageRecorder:
+    """Records the spans of the pipeline stages run while it is active (see record_stages).
+
+    Each span holds the stage's wall and CPU time (CPU time covers the whole process, so it excludes worker processes),
+    the number of items it processed if known, and the process' peak RSS at the end of the stage along with how much
+    the stage increased it."""
+
+    def __init__(self):
+        self.spans = []
+        self.start = perf_counter()
+        self._thread_stacks = threading.local()
+
+    def _stack(self):
+        stack = getattr(self._thread_stacks, 'stack', None)
+        if stack is None:
+            stack = self._thread_stacks.stack = []
+        return stack
+
+    def summary(self):
+        """Returns a dict of {stage name: totals}, where totals holds the number of spans of the stage along with
+        their total wall time, CPU time, and items and their largest peak RSS"""
+        stages = {}
+        for span in sorted(self.spans, key=lambda s: s['start']):
+            totals = stages.setdefault(span['name'], {'count': 0, 'wall_time': 0.0, 'cpu_time': 0.0, 'items': None,
+                                                      'peak_rss': 0})
+            totals['count'] += 1
+            totals['wall_time'] += span['wall_time']
+            totals['cpu_time'] += span['cpu_time']
+            if span['items'] is not None:
+                totals['items'] = (totals['items'] or 0) + span['items']
+            totals['peak_rss'] = max(totals['peak_rss'], span['peak_rss'])
+        return stages
+
+    def report(self):
+        """Returns a JSON-serializable dict with the summary() of each stage and every span in order of starting
+        time"""
+        return {'stages': self.summary(), 'spans': sorted(self.spans, key=lambda s: s['start'])}
+
+    def to_json(self, path=None):
+        """Returns the report() as a JSON string, also writing it to :path: if given"""
+        text = json.dumps(self.report(), indent=2)
+        if path is not None:
+            with open(path, 'w') as file:
+                file.write(text)
+        return text
+
+    def chrome_trace(self):
+        """Returns the spans in the Chrome trace event format, viewable in chrome://tracing or Perfetto"""
+        pid = os.getpid()
+        events = [{'name': span['name'], 'cat': 'modularitypruning', 'ph': 'X', 'ts': span['start'] * 1e6,
+                   'dur': span['wall_time'] * 1e6, 'pid': pid, 'tid': span['thread'],
+                   'args': {'cpu_time': span['cpu_time'], 'items': span['items'], 'peak_rss': span['peak_rss']}}
+                  for span in sorted(self.spans, key=lambda s: s['start'])]
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def write_chrome_trace(self, path):
+        """Writes the chrome_trace() to :path: as JSON"""
+        with open(path, 'w') as file:
+            json.dump(self.chrome_trace(), file)
+
+
+def stage(name, items=None):
+    """Returns a context manager that records the pipeline stage :name: to the active StageRecorder.
+
+    While no recorder is active, a shared do-nothing context manager is returned, so stages can always be left
+    instrumented.
+
+    :param name: name of the stage
+    :param items: number of items (e.g. partitions) processed by the stage, if known. More can be added with the
+                  span's add_items() method
+    :return: context manager yielding the span"""
+    if _active_recorder is None:
+        return _DISABLED_SPAN
+    return _Span(_active_recorder, name, items)
+
+
+@contextmanager
+def record_stages():
+    """Context manager that records the pipeline stages run within it, e.g.
+
+    >>> with record_stages() as recorder:
+    ...     prune_to_stable_partitions(G, parts, 0, 2)
+    >>> recorder.summary()['coefficients_2D']['wall_time']
+
+    Stages run in worker processes are not recorded, but their time counts towards the stage that started them.
+
+    :return: context manager yielding a StageRecorder"""
+    global _active_recorder
+    previous_recorder = _active_recorder
+    recorder = StageRecorder()
+    _active_recorder = recorder
+    try:
+        yield recorder
+    finally:
+        _active_recorder = previous_recorder
@@ -0,0 +1,53 @@
+import importlib
+import sys
+import threading
+
+_import_lock = threading.Lock()
+
+
+class LazyModule:
+    """Stand-in for a module that is only imported when one of its attributes is first accessed.
+
+    Heavy optional dependencies (louvain, champ, scipy's optimizers, sklearn, matplotlib, ...) are bound to module-level
+    names through lazy_import() so that importing this package stays cheap, e.g. in every spawned worker process or a
+    short command line invocation. A missing dependency is only reported when it is actually used."""
+
+    def __init__(self, name):
+        self.__dict__['_name'] = name
+        self.__dict__['_module'] = None
+
+    def _load(self):
+        module = self.__dict__['_module']
+        if module is None:
+            with _import_lock:
+                module = self.__dict__['_module']
+                if module is None:
+                    module = importlib.import_module(self.__dict__['_name'])
+                    self.__dict__['_module'] = module
+        return module
+
+    def __getattr__(self, attribute):
+        return getattr(self._load(), attribute)
+
+    def __setattr__(self, attribute, value):
+        setattr(self._load(), attribute, value)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        state = "loaded" if self.__dict__['_module'] is not None else "not yet loaded"
+        return f"<lazy module '{self.__dict__['_name']}' ({state})>"
+
+
+def lazy_import(name):
+    """Returns a LazyModule for the module :name: (e.g. "scipy.optimize"), which imports it on first attribute access.
+
+    If the module was already imported, it is returned directly."""
+    module = sys.modules.get(name)
+    return module if module is not None else LazyModule(name)
+
+
+def is_loaded(module):
+    """Returns whether :module: (a module or LazyModule) has been imported"""
+    return not isinstance(module, LazyModule) or module.__dict__['_module'] is not None
@@ -1,27 +1,43 @@
-from .progress import Progress
-import functools
-import louvain
+from .checkpoint_utilities import SweepCheckpoint
+from .instrumentation import peak_rss, stage
+from .lazy_imports import lazy_import
+from .partition_utilities import canonical_membership, membership_digest
+from .prepared_graph import as_igraph, louvain_weights
+from .progress import sweep_telemetry
+from collections import namedtuple
+from contextlib import contextmanager, nullcontext
 from math import ceil
 from multiprocessing import Pool, cpu_count
 import numpy as np
-import psutil
+import os
+from time import perf_counter
 
-LOW_MEMORY_THRESHOLD = 1e9  # 1 GB
+louvain = lazy_import("louvain")
+psutil = lazy_import("psutil")
+
+# Rough (deliberately pessimistic) memory costs used to size parallel Louvain sweeps. The per-task costs cover the
+# worker's copy of the graph and louvain-igraph's internal partition bookkeeping during a single run.
+LOUVAIN_BYTES_PER_VERTEX = 512
+LOUVAIN_BYTES_PER_EDGE = 256
+MEMBERSHIP_BYTES_PER_VERTEX = 64  # returned membership tuple, both pickled and unpickled
+WORKER_BASELINE_BYTES = 2e8  # interpreter and imported modules of each worker process
+
+DEFAULT_MEMORY_BUDGET_FRACTION = 0.5  # fraction of available memory a sweep may use by default
+DEFAULT_MAX_TASKS_PER_CHILD = 1000  # workers are recycled after this many Louvain runs
+MIN_SWEEP_CHUNKS = 100  # lower bound on the number of chunks dispatched, mostly for progress reporting
+
+SweepSchedule = namedtuple('SweepSchedule', ['processes', 'chunk_size', 'dispatch_size', 'max_tasks_per_child'])
+SweepPool = namedtuple('SweepPool', ['pool', 'processes'])
 
 
-@functools.lru_cache(maxsize=1000)
 def sorted_tuple(t):
     """Converts a tuple :t: to a canonical form (labels' first occurrences are sorted)."""
-
-    sort_map = {x[0]: i for i, x in enumerate(sorted(zip(*np.unique(t, return_index=True)), key=lambda x: x[1]))}
-    return tuple(sort_map[x] for x in t)
+    return tuple(canonical_membership(t).tolist())
 
 
 def singlelayer_louvain(G, gamma, return_partition=False):
-    if 'weight' not in G.es:
-        G.es['weight'] = [1.0] * G.ecount()
-
-    partition = louvain.find_partition(G, louvain.RBConfigurationVertexPartition, weights='weight',
+    G = as_igraph(G)
+    partition = louvain.find_partition(G, louvain.RBConfigurationVertexPartition, weights=louvain_weights(G),
                                        resolution_parameter=gamma)
 
     if return_partition:
@@ -53,18 +69,11 @@ def multilayer_louvain(G_intralayer, G_interlayer, layer_vec, gamma, omega, opti
     # the Reichardt and Bornholdt's Potts model with configuration null model).
     check_multilayer_louvain_capabilities()
 
-    if 'weight' not in G_intralayer.es:
-        G_intralayer.es['weight'] = [1.0] * G_intralayer.ecount()
-
-    if 'weight' not in G_interlayer.es:
-        G_interlayer.es['weight'] = [1.0] * G_interlayer.ecount()
-
     if optimiser is None:
         optimiser = louvain.Optimiser()
 
-    intralayer_part = louvain.RBConfigurationVertexPartitionWeightedLayers(G_intralayer, layer_vec=layer_vec,
-                                                                           weights='weight', resolution_parameter=gamma)
-    interlayer_part = louvain.CPMVertexPartition(G_interlayer, resolution_parameter=0.0, weights='weight')
+    intralayer_part, interlayer_part = multilayer_louvain_part(G_intralayer, G_interlayer, layer_vec,
+                                                               resolution_parameter=gamma)
     optimiser.optimise_partition_multiplex([intralayer_part, interlayer_part], layer_weights=[1, omega])
 
     if return_partition:
@@ -74,7 +83,8 @@ def multilayer_louvain(G_intralayer, G_interlayer, layer_vec, gamma, omega, opti
 
 
 def louvain_part(G):
-    return louvain.RBConfigurationVertexPartition(G)
+    G = as_igraph(G)
+    return louvain.RBConfigurationVertexPartition(G, weights=louvain_weights(G))
 
 
 def louvain_part_with_membership(G, membership):
@@ -85,16 +95,13 @@ def louvain_part_with_membership(G, membership):
     return part
 
 
-def multilayer_louvain_part(G_intralayer, G_interlayer, layer_membership):
-    if 'weight' not in G_intralayer.es:
-        G_intralayer.es['weight'] = [1.0] * G_intralayer.ecount()
-
-    if 'weight' not in G_interlayer.es:
-        G_interlayer.es['weight'] = [1.0] * G_interlayer.ecount()
-
+def multilayer_louvain_part(G_intralayer, G_interlayer, layer_membership, resolution_parameter=1.0):
+    G_intralayer, G_interlayer = as_igraph(G_intralayer), as_igraph(G_interlayer)
     intralayer_part = louvain.RBConfigurationVertexPartitionWeightedLayers(G_intralayer, layer_vec=layer_membership,
-                                                                           weights='weight')
-    interlayer_part = louvain.CPMVertexPartition(G_interlayer, resolution_parameter=0.0, weights='weight')
+                                                                           weights=louvain_weights(G_intralayer),
+                                                                           resolution_parameter=resolution_parameter)
+    interlayer_part = louvain.CPMVertexPartition(G_interlayer, resolution_parameter=0.0,
+                                                 weights=louvain_weights(G_interlayer))
     return intralayer_part, interlayer_part
 
 
@@ -107,107 +114,440 @@ def multilayer_louvain_part_with_membership(G_intralayer, G_interlayer, layer_me
     return intralayer_part, interlayer_part
 
 
-def repeated_louvain_from_gammas(G, gammas):
-    return {sorted_tuple(singlelayer_louvain(G, gamma)) for gamma in gammas}
+def repeated_louvain_from_gammas(G, gammas, partition_store=None):
+    with stage("louvain_sweep", items=len(gammas)):
+        if partition_store is not None:
+            partition_store.update(singlelayer_louvain(G, gamma) for gamma in gammas)
+            return partition_store
+        return {sorted_tuple(singlelayer_louvain(G, gamma)) for gamma in gammas}
 
 
-def repeated_parallel_louvain_from_gammas(G, gammas, show_progress=True, chunk_dispatch=True):
-    """
-    Runs louvain at each gamma in :gammas:, using all CPU cores available.
+def estimate_louvain_task_memory(vcount, ecount):
+    """Estimates the peak memory (in bytes) used by a worker to run Louvain once on a graph of this size."""
+    return LOUVAIN_BYTES_PER_VERTEX * vcount + LOUVAIN_BYTES_PER_EDGE * ecount
 
-    :param G: input graph
-    :param gammas: list of gammas (resolution parameters) to run louvain at
-    :param show_progress: if True, render a progress bar
-    :param chunk_dispatch: if True, dispatch parallel work in chunks. Setting this to False may increase performance,
-                           but can lead to out-of-memory issues
-    :return: a set of all unique partitions encountered
+
+def plan_parallel_sweep(num_tasks, task_memory, result_memory, memory_budget=None, processes=None,
+                        max_tasks_per_child=DEFAULT_MAX_TASKS_PER_CHILD, chunk_dispatch=True):
     """
+    Sizes the worker pool and chunks of a parallel Louvain sweep to fit within a memory budget.
+
+    Every worker runs one task at a time, so at most :processes: tasks are running concurrently. The rest of the budget
+    bounds the size of a chunk, i.e. the number of results that may be outstanding (and buffered in the parent) at once.
+
+    :param num_tasks: total number of Louvain runs in the sweep
+    :param task_memory: estimated memory (in bytes) used by a worker during one Louvain run
+    :param result_memory: estimated memory (in bytes) of one returned membership
+    :param memory_budget: memory (in bytes) the sweep may use. If None, use a fraction of the available memory
+    :param processes: maximum number of worker processes. If None, use all CPU cores available
+    :param max_tasks_per_child: number of tasks a worker runs before it is replaced with a fresh process
+    :param chunk_dispatch: if False, dispatch all tasks in a single chunk regardless of the memory budget
+    :return: SweepSchedule of (processes, chunk_size, dispatch_size, max_tasks_per_child)
+    """
+
+    if memory_budget is None:
+        memory_budget = DEFAULT_MEMORY_BUDGET_FRACTION * psutil.virtual_memory().available
+
+    if processes is None:
+        processes = cpu_count()
+
+    worker_memory = WORKER_BASELINE_BYTES + task_memory
+    processes = int(max(1, min(processes, memory_budget // worker_memory)))
+
+    if chunk_dispatch:
+        remaining_budget = max(memory_budget - processes * worker_memory, 0)
+        chunk_size = int(max(processes, remaining_budget // max(result_memory, 1)))
+        chunk_size = min(chunk_size, max(ceil(num_tasks / MIN_SWEEP_CHUNKS), processes))
+    else:
+        chunk_size = num_tasks
+    chunk_size = max(1, min(chunk_size, num_tasks))
+
+    # mirrors the default chunksize heuristic of multiprocessing's map functions
+    dispatch_size = max(1, chunk_size // (4 * processes))
+
+    return SweepSchedule(processes, chunk_size, dispatch_size, max_tasks_per_child)
 
-    pool = Pool(processes=cpu_count())
-    total = set()
 
-    chunk_size = len(gammas) // 99
-    if chunk_size > 0 and chunk_dispatch:
-        chunk_params = ([(G, g) for g in gammas[i:i + chunk_size]] for i in range(0, len(gammas), chunk_size))
+_sweep_worker_args = None
+_sweep_worker_sends_duplicates = True
+_sweep_worker_seen_digests = set()
+
+
+def _initialize_sweep_worker(send_duplicates, *args):
+    """Stores the (potentially large) graph arguments once per worker rather than pickling them with every task."""
+    global _sweep_worker_args, _sweep_worker_sends_duplicates, _sweep_worker_seen_digests
+    _sweep_worker_args = args
+    _sweep_worker_sends_duplicates = send_duplicates
+    _sweep_worker_seen_digests = set()
+
+
+def _sweep_result(parameters, membership, run_time):
+    """Canonicalizes and digests a worker's Louvain result, which took :run_time: seconds.
+
+    Unless the worker was told to send duplicates, the membership is omitted (i.e. only the 128-bit digest is returned)
+    when this worker has already returned the same partition. Memberships are sent as the most compact integer array
+    that can hold their labels."""
+    membership = canonical_membership(membership)
+    digest = membership_digest(membership)
+
+    if digest in _sweep_worker_seen_digests and not _sweep_worker_sends_duplicates:
+        membership = None
+    else:
+        _sweep_worker_seen_digests.add(digest)
+        if len(membership) and membership.max() <= np.iinfo(np.uint16).max:
+            membership = membership.astype(np.uint16)
+
+    return parameters, digest, membership, os.getpid(), peak_rss(), run_time
+
+
+def _singlelayer_sweep_task(gamma):
+    G, = _sweep_worker_args
+    start = perf_counter()
+    membership = singlelayer_louvain(G, gamma)
+    return _sweep_result(gamma, membership, perf_counter() - start)
+
+
+def _multilayer_sweep_task(resolution_parameters):
+    G_intralayer, G_interlayer, layer_vec = _sweep_worker_args
+    gamma, omega = resolution_parameters
+    start = perf_counter()
+    membership = multilayer_louvain(G_intralayer, G_interlayer, layer_vec, gamma, omega)
+    return _sweep_result(resolution_parameters, membership, perf_counter() - start)
+
+
+def _parallel_louvain_sweep(task, worker_args, parameters, schedule, telemetry, send_duplicates, checkpoint=None,
+                            pool=None):
+    """Runs :task: on each of :parameters: according to :schedule:, yielding (parameters, digest, canonical membership,
+    pid, peak_rss, run_time) results in completion order. See _sweep_result for the meaning of :send_duplicates:.
+
+    If :checkpoint: is not None, parameters completed in a previous run are skipped and each chunk is committed to the
+    checkpoint once all of its results have been consumed. If :telemetry: is not None, the SweepTelemetry is started
+    and finished around the sweep (the results themselves are recorded by _canonical_sweep_results). If :pool: is not
+    None, the sweep runs on that SweepPool (whose workers already hold :worker_args: and send duplicates) instead of
+    starting a new pool."""
+
+    indices = checkpoint.pending_indices() if checkpoint is not None else range(len(parameters))
+    if len(indices) == 0:
+        return
+
+    if telemetry is not None:
+        telemetry.start(len(indices), schedule.processes)
+
+    if pool is None:
+        pool = Pool(processes=schedule.processes, initializer=_initialize_sweep_worker,
+                    initargs=(send_duplicates,) + worker_args, maxtasksperchild=schedule.max_tasks_per_child)
     else:
-        chunk_params = [[(G, g) for g in gammas]]
-        chunk_size = len(gammas)
+        pool = nullcontext(pool.pool)  # shared pools are left running for later sweeps
+
+    with pool as workers:
+        for i in range(0, len(indices), schedule.chunk_size):
+            chunk_indices = indices[i:i + schedule.chunk_size]
+            yield from workers.imap_unordered(task, [parameters[j] for j in chunk_indices],
+                                              chunksize=schedule.dispatch_size)
 
-    if show_progress:
-        progress = Progress(ceil(len(gammas) / chunk_size))
+            if checkpoint is not None:
+                checkpoint.commit_chunk(chunk_indices)
 
-    for chunk in chunk_params:
-        for partition in pool.starmap(singlelayer_louvain, chunk):
-            total.add(sorted_tuple(partition))
+    if telemetry is not None:
+        telemetry.finish()
 
-        if show_progress:
-            progress.increment()
 
-        if psutil.virtual_memory().available < LOW_MEMORY_THRESHOLD:
-            # Reinitialize pool to get around an apparent memory leak in multiprocessing
-            pool.close()
-            pool = Pool(processes=cpu_count())
+def _canonical_sweep_results(results, worker_peak_rss, yield_duplicates, checkpoint=None, telemetry=None):
+    """Converts sweep results into (parameters, partition, is_new), recording the workers' peak RSS.
 
-    if show_progress:
-        progress.done()
+    Only digests of the partitions seen so far are retained. If :yield_duplicates: is False, only new partitions are
+    yielded. If :checkpoint: is not None, the partitions restored from it are yielded first and newly encountered
+    partitions are recorded to it. If :telemetry: is not None, every result is recorded to the SweepTelemetry."""
+    seen_digests = set()
 
-    pool.close()
+    try:
+        if checkpoint is not None:
+            for parameters, partition in checkpoint.partitions:
+                seen_digests.add(membership_digest(partition))
+                if telemetry is not None:
+                    telemetry.add_known_partitions(1)
+                yield parameters, partition, True
+
+        for parameters, digest, partition, pid, rss, run_time in results:
+            worker_peak_rss[pid] = max(worker_peak_rss.get(pid, 0), rss)
+
+            is_new = digest not in seen_digests
+            if telemetry is not None:
+                telemetry.record(1, int(is_new), run_time)
+            if not is_new and not yield_duplicates:
+                continue
+
+            # a worker returns each partition in full at least once before sending just its digest, and each worker's
+            # results arrive in order, so the membership of a new digest is always present
+            seen_digests.add(digest)
+            partition = tuple(partition.tolist())
+
+            if is_new and checkpoint is not None:
+                checkpoint.record_partition(parameters, partition)
+
+            yield parameters, partition, is_new
+    finally:
+        if checkpoint is not None:
+            checkpoint.close()
+
+
+def _sweep_worker_graphs(G_intralayer, G_interlayer=None, layer_vec=None):
+    """Returns the graph arguments stored by each sweep worker and the estimated memory of one louvain run on them"""
+    G_intralayer = as_igraph(G_intralayer)
+    if G_interlayer is None:
+        return (G_intralayer,), estimate_louvain_task_memory(G_intralayer.vcount(), G_intralayer.ecount())
+
+    G_interlayer = as_igraph(G_interlayer)
+    task_memory = estimate_louvain_task_memory(G_intralayer.vcount(), G_intralayer.ecount() + G_interlayer.ecount())
+    return (G_intralayer, G_interlayer, layer_vec), task_memory
+
+
+@contextmanager
+def louvain_sweep_pool(G_intralayer, G_interlayer=None, layer_vec=None, memory_budget=None,
+                       max_tasks_per_child=DEFAULT_MAX_TASKS_PER_CHILD):
+    """
+    Starts a pool of louvain workers that several parallel sweeps over the same graph can share.
+
+    Each worker receives the graph once, when the pool starts, so repeated sweeps (e.g. the rounds of an iterative
+    search) avoid starting new processes and pickling the graph again every time. Workers of a shared pool always
+    return full memberships, since they cannot know which partitions a later sweep has already seen.
+
+    :param G_intralayer: input graph (or, for multilayer sweeps, the graph containing all intra-layer edges)
+    :param G_interlayer: for multilayer sweeps, the graph containing all inter-layer edges
+    :param layer_vec: for multilayer sweeps, vector of each vertex's layer membership
+    :param memory_budget: memory (in bytes) the workers may use. If None, use half of the available memory
+    :param max_tasks_per_child: number of louvain runs after which a worker process is replaced
+    :return: context manager yielding a SweepPool, to be passed as the :pool: of iter_parallel_louvain_from_gammas
+             (singlelayer) or iter_parallel_louvain_from_points (multilayer)
+    """
+
+    worker_args, task_memory = _sweep_worker_graphs(G_intralayer, G_interlayer, layer_vec)
+    processes = plan_parallel_sweep(1, task_memory, 0, memory_budget=memory_budget).processes
+    with Pool(processes=processes, initializer=_initialize_sweep_worker, initargs=(True,) + worker_args,
+              maxtasksperchild=max_tasks_per_child) as pool:
+        yield SweepPool(pool, processes)
+
+
+def _singlelayer_parallel_sweep(G, gammas, show_progress, chunk_dispatch, memory_budget, max_tasks_per_child,
+                                checkpoint_path, yield_duplicates, worker_peak_rss, pool=None):
+    worker_args, task_memory = _sweep_worker_graphs(G)
+    checkpoint = SweepCheckpoint(checkpoint_path, gammas) if checkpoint_path is not None else None
+    schedule = plan_parallel_sweep(len(gammas), task_memory, MEMBERSHIP_BYTES_PER_VERTEX * worker_args[0].vcount(),
+                                   memory_budget=memory_budget, processes=pool.processes if pool is not None else None,
+                                   max_tasks_per_child=max_tasks_per_child, chunk_dispatch=chunk_dispatch)
+    telemetry = sweep_telemetry(show_progress, "louvain sweep")
+    results = _parallel_louvain_sweep(_singlelayer_sweep_task, worker_args, gammas, schedule, telemetry,
+                                      send_duplicates=yield_duplicates, checkpoint=checkpoint, pool=pool)
+    return _canonical_sweep_results(results, worker_peak_rss, yield_duplicates, checkpoint, telemetry)
+
+
+def _multilayer_parallel_sweep(G_intralayer, G_interlayer, layer_vec, gammas, omegas, show_progress, chunk_dispatch,
+                               memory_budget, max_tasks_per_child, checkpoint_path, yield_duplicates, worker_peak_rss):
+    resolution_parameter_points = [(gamma, omega) for gamma in gammas for omega in omegas]
+    return _multilayer_parallel_points_sweep(G_intralayer, G_interlayer, layer_vec, resolution_parameter_points,
+                                             show_progress, chunk_dispatch, memory_budget, max_tasks_per_child,
+                                             checkpoint_path, yield_duplicates, worker_peak_rss)
+
+
+def _multilayer_parallel_points_sweep(G_intralayer, G_interlayer, layer_vec, resolution_parameter_points,
+                                      show_progress, chunk_dispatch, memory_budget, max_tasks_per_child,
+                                      checkpoint_path, yield_duplicates, worker_peak_rss, pool=None):
+    worker_args, task_memory = _sweep_worker_graphs(G_intralayer, G_interlayer, layer_vec)
+    checkpoint = (SweepCheckpoint(checkpoint_path, resolution_parameter_points) if checkpoint_path is not None
+                  else None)
+    schedule = plan_parallel_sweep(len(resolution_parameter_points), task_memory,
+                                   MEMBERSHIP_BYTES_PER_VERTEX * worker_args[0].vcount(), memory_budget=memory_budget,
+                                   processes=pool.processes if pool is not None else None,
+                                   max_tasks_per_child=max_tasks_per_child, chunk_dispatch=chunk_dispatch)
+    telemetry = sweep_telemetry(show_progress, "multilayer louvain sweep")
+    results = _parallel_louvain_sweep(_multilayer_sweep_task, worker_args, resolution_parameter_points, schedule,
+                                      telemetry, send_duplicates=yield_duplicates, checkpoint=checkpoint, pool=pool)
+    return _canonical_sweep_results(results, worker_peak_rss, yield_duplicates, checkpoint, telemetry)
+
+
+def iter_parallel_louvain_from_gammas(G, gammas, show_progress=False, chunk_dispatch=True, memory_budget=None,
+                                      max_tasks_per_child=DEFAULT_MAX_TASKS_PER_CHILD, checkpoint_path=None,
+                                      yield_duplicates=True, pool=None):
+    """
+    Runs louvain at each gamma in :gammas:, using all CPU cores available, and yields each result as it arrives.
+
+    Results are yielded in completion order rather than in the order of :gammas:. Only digests of previously seen
+    partitions are kept, so callers can process partitions (e.g. compute their coefficients or write them to disk)
+    while the sweep is still running and without holding all of them in memory.
+
+    :param G: input graph
+    :param gammas: list of gammas (resolution parameters) to run louvain at
+    :param show_progress: if True, log throughput telemetry at INFO level (see SweepTelemetry), which is only shown if
+                          logging is configured. A SweepTelemetry may be passed to customize the reports
+    :param chunk_dispatch: if True, dispatch parallel work in chunks sized to :memory_budget:
+    :param memory_budget: memory (in bytes) the sweep may use. If None, use half of the available memory
+    :param max_tasks_per_child: number of louvain runs after which a worker process is replaced
+    :param checkpoint_path: if not None, path of an append-only checkpoint file. Completed chunks and the partitions
+                            found in them are persisted there, and a rerun with the same file resumes the sweep
+    :param yield_duplicates: if False, only yield new partitions. Workers then return just a digest for partitions
+                             they have already returned, which greatly reduces inter-process communication
+    :param pool: if not None, a SweepPool started on :G: by louvain_sweep_pool to run the sweep on, instead of starting
+                 a new pool. Its workers' count and :max_tasks_per_child: then apply
+    :return: generator of (gamma, partition, is_new) where partition is in canonical form and is_new is True only the
+             first time that partition is encountered
+    """
+
+    yield from _singlelayer_parallel_sweep(G, gammas, show_progress, chunk_dispatch, memory_budget,
+                                           max_tasks_per_child, checkpoint_path, yield_duplicates, worker_peak_rss={},
+                                           pool=pool)
+
+
+def repeated_parallel_louvain_from_gammas(G, gammas, show_progress=True, chunk_dispatch=True, memory_budget=None,
+                                          max_tasks_per_child=DEFAULT_MAX_TASKS_PER_CHILD, checkpoint_path=None,
+                                          partition_store=None, return_worker_peak_rss=False):
+    """
+    Runs louvain at each gamma in :gammas:, using all CPU cores available.
+
+    :param G: input graph
+    :param gammas: list of gammas (resolution parameters) to run louvain at
+    :param show_progress: if True, log throughput telemetry at INFO level (see SweepTelemetry), which is only shown if
+                          logging is configured. A SweepTelemetry may be passed to customize the reports
+    :param chunk_dispatch: if True, dispatch parallel work in chunks sized to :memory_budget:. Setting this to False
+                           may increase performance, but can lead to out-of-memory issues
+    :param memory_budget: memory (in bytes) the sweep may use. If None, use half of the available memory
+    :param max_tasks_per_child: number of louvain runs after which a worker process is replaced
+    :param checkpoint_path: if not None, path of an append-only checkpoint file. Completed chunks and the partitions
+                            found in them are persisted there, and a rerun with the same file resumes the sweep
+    :param partition_store: if not None, a PartitionStore to which the unique partitions are added
+    :param return_worker_peak_rss: if True, also return a dictionary of worker process ID to peak RSS (in bytes)
+    :return: a set of all unique partitions encountered (or :partition_store:, if provided)
+    """
+
+    worker_peak_rss = {}
+    total = partition_store if partition_store is not None else set()
+    with stage("louvain_sweep", items=len(gammas)):
+        for _, partition, _ in _singlelayer_parallel_sweep(G, gammas, show_progress, chunk_dispatch, memory_budget,
+                                                           max_tasks_per_child, checkpoint_path, yield_duplicates=False,
+                                                           worker_peak_rss=worker_peak_rss):
+            total.add(partition)
+
+    if return_worker_peak_rss:
+        return total, worker_peak_rss
     return total
 
 
-def repeated_louvain_from_gammas_omegas(G_intralayer, G_interlayer, layer_vec, gammas, omegas):
-    return {sorted_tuple(multilayer_louvain(G_intralayer, G_interlayer, layer_vec, gamma, omega))
-            for gamma in gammas for omega in omegas}
+def repeated_louvain_from_gammas_omegas(G_intralayer, G_interlayer, layer_vec, gammas, omegas, partition_store=None):
+    with stage("multilayer_louvain_sweep", items=len(gammas) * len(omegas)):
+        if partition_store is not None:
+            partition_store.update(multilayer_louvain(G_intralayer, G_interlayer, layer_vec, gamma, omega)
+                                   for gamma in gammas for omega in omegas)
+            return partition_store
+        return {sorted_tuple(multilayer_louvain(G_intralayer, G_interlayer, layer_vec, gamma, omega))
+                for gamma in gammas for omega in omegas}
 
 
-def repeated_parallel_louvain_from_gammas_omegas(G_intralayer, G_interlayer, layer_vec, gammas, omegas,
-                                                 show_progress=True, chunk_dispatch=True):
+def iter_parallel_louvain_from_gammas_omegas(G_intralayer, G_interlayer, layer_vec, gammas, omegas,
+                                             show_progress=False, chunk_dispatch=True, memory_budget=None,
+                                             max_tasks_per_child=DEFAULT_MAX_TASKS_PER_CHILD, checkpoint_path=None,
+                                             yield_duplicates=True):
     """
-    Runs louvain at each gamma and omega in :gammas: and :omegas:, using all CPU cores available.
+    Runs louvain at each gamma and omega in :gammas: and :omegas:, using all CPU cores available, and yields each
+    result as it arrives.
+
+    See iter_parallel_louvain_from_gammas for details on the order and deduplication of results.
 
     :param G_intralayer: input graph containing all intra-layer edges
     :param G_interlayer: input graph containing all inter-layer edges
     :param layer_vec: vector of each vertex's layer membership
     :param gammas: list of gammas to run louvain at
     :param omegas: list of omegas to run louvain at
-    :param show_progress: if True, render a progress bar
-    :param chunk_dispatch: if True, dispatch parallel work in chunks. Setting this to False may increase performance,
-                           but can lead to out-of-memory issues
-    :return: a set of all unique partitions encountered
+    :param show_progress: if True, log throughput telemetry at INFO level (see SweepTelemetry), which is only shown if
+                          logging is configured. A SweepTelemetry may be passed to customize the reports
+    :param chunk_dispatch: if True, dispatch parallel work in chunks sized to :memory_budget:
+    :param memory_budget: memory (in bytes) the sweep may use. If None, use half of the available memory
+    :param max_tasks_per_child: number of louvain runs after which a worker process is replaced
+    :param checkpoint_path: if not None, path of an append-only checkpoint file. Completed chunks and the partitions
+                            found in them are persisted there, and a rerun with the same file resumes the sweep
+    :param yield_duplicates: if False, only yield new partitions. Workers then return just a digest for partitions
+                             they have already returned, which greatly reduces inter-process communication
+    :return: generator of (gamma, omega, partition, is_new) where partition is in canonical form and is_new is True
+             only the first time that partition is encountered
     """
 
-    resolution_parameter_points = [(gamma, omega) for gamma in gammas for omega in omegas]
+    results = _multilayer_parallel_sweep(G_intralayer, G_interlayer, layer_vec, gammas, omegas, show_progress,
+                                         chunk_dispatch, memory_budget, max_tasks_per_child, checkpoint_path,
+                                         yield_duplicates, worker_peak_rss={})
+    for (gamma, omega), partition, is_new in results:
+        yield gamma, omega, partition, is_new
 
-    pool = Pool(processes=cpu_count())
-    total = set()
 
-    chunk_size = len(resolution_parameter_points) // 99
-    if chunk_size > 0 and chunk_dispatch:
-        chunk_params = ([(G_intralayer, G_interlayer, layer_vec, gamma, omega)
-                         for gamma, omega in resolution_parameter_points[i:i + chunk_size]]
-                        for i in range(0, len(resolution_parameter_points), chunk_size))
-    else:
-        chunk_params = [[(G_intralayer, G_interlayer, layer_vec, gamma, omega)
-                         for gamma, omega in resolution_parameter_points]]
-        chunk_size = len(gammas)
+def iter_parallel_louvain_from_points(G_intralayer, G_interlayer, layer_vec, resolution_parameter_points,
+                                      show_progress=False, chunk_dispatch=True, memory_budget=None,
+                                      max_tasks_per_child=DEFAULT_MAX_TASKS_PER_CHILD, checkpoint_path=None,
+                                      yield_duplicates=True, pool=None):
+    """
+    Runs louvain at each (gamma, omega) in :resolution_parameter_points:, using all CPU cores available, and yields
+    each result as it arrives.
 
-    if show_progress:
-        progress = Progress(ceil(len(resolution_parameter_points) / chunk_size))
+    Unlike iter_parallel_louvain_from_gammas_omegas, the points need not form a grid (e.g. the points visited by an
+    adaptive or iterative search). See iter_parallel_louvain_from_gammas for details on the order and deduplication of
+    results.
 
-    for chunk in chunk_params:
-        for partition in pool.starmap(multilayer_louvain, chunk):
-            total.add(sorted_tuple(partition))
+    :param G_intralayer: input graph containing all intra-layer edges
+    :param G_interlayer: input graph containing all inter-layer edges
+    :param layer_vec: vector of each vertex's layer membership
+    :param resolution_parameter_points: list of (gamma, omega) tuples to run louvain at
+    :param show_progress: if True, log throughput telemetry at INFO level (see SweepTelemetry), which is only shown if
+                          logging is configured. A SweepTelemetry may be passed to customize the reports
+    :param chunk_dispatch: if True, dispatch parallel work in chunks sized to :memory_budget:
+    :param memory_budget: memory (in bytes) the sweep may use. If None, use half of the available memory
+    :param max_tasks_per_child: number of louvain runs after which a worker process is replaced
+    :param checkpoint_path: if not None, path of an append-only checkpoint file. Completed chunks and the partitions
+                            found in them are persisted there, and a rerun with the same file resumes the sweep
+    :param yield_duplicates: if False, only yield new partitions. Workers then return just a digest for partitions
+                             they have already returned, which greatly reduces inter-process communication
+    :param pool: if not None, a SweepPool started on these graphs by louvain_sweep_pool to run the sweep on, instead
+                 of starting a new pool. Its workers' count and :max_tasks_per_child: then apply
+    :return: generator of (gamma, omega, partition, is_new) where partition is in canonical form and is_new is True
+             only the first time that partition is encountered
+    """
 
-        if show_progress:
-            progress.increment()
+    results = _multilayer_parallel_points_sweep(G_intralayer, G_interlayer, layer_vec, resolution_parameter_points,
+                                                show_progress, chunk_dispatch, memory_budget, max_tasks_per_child,
+                                                checkpoint_path, yield_duplicates, worker_peak_rss={}, pool=pool)
+    for (gamma, omega), partition, is_new in results:
+        yield gamma, omega, partition, is_new
 
-        if psutil.virtual_memory().available < LOW_MEMORY_THRESHOLD:
-            # Reinitialize pool to get around an apparent memory leak in multiprocessing
-            pool.close()
-            pool = Pool(processes=cpu_count())
 
-    if show_progress:
-        progress.done()
+def repeated_parallel_louvain_from_gammas_omegas(G_intralayer, G_interlayer, layer_vec, gammas, omegas,
+                                                 show_progress=True, chunk_dispatch=True, memory_budget=None,
+                                                 max_tasks_per_child=DEFAULT_MAX_TASKS_PER_CHILD, checkpoint_path=None,
+                                                 partition_store=None, return_worker_peak_rss=False):
+    """
+    Runs louvain at each gamma and omega in :gammas: and :omegas:, using all CPU cores available.
+
+    :param G_intralayer: input graph containing all intra-layer edges
+    :param G_interlayer: input graph containing all inter-layer edges
+    :param layer_vec: vector of each vertex's layer membership
+    :param gammas: list of gammas to run louvain at
+    :param omegas: list of omegas to run louvain at
+    :param show_progress: if True, log throughput telemetry at INFO level (see SweepTelemetry), which is only shown if
+                          logging is configured. A SweepTelemetry may be passed to customize the reports
+    :param chunk_dispatch: if True, dispatch parallel work in chunks sized to :memory_budget:. Setting this to False
+                           may increase performance, but can lead to out-of-memory issues
+    :param memory_budget: memory (in bytes) the sweep may use. If None, use half of the available memory
+    :param max_tasks_per_child: number of louvain runs after which a worker process is replaced
+    :param checkpoint_path: if not None, path of an append-only checkpoint file. Completed chunks and the partitions
+                            found in them are persisted there, and a rerun with the same file resumes the sweep
+    :param partition_store: if not None, a PartitionStore to which the unique partitions are added
+    :param return_worker_peak_rss: if True, also return a dictionary of worker process ID to peak RSS (in bytes)
+    :return: a set of all unique partitions encountered (or :partition_store:, if provided)
+    """
 
-    pool.close()
+    worker_peak_rss = {}
+    total = partition_store if partition_store is not None else set()
+    with stage("multilayer_louvain_sweep", items=len(gammas) * len(omegas)):
+        for _, partition, _ in _multilayer_parallel_sweep(G_intralayer, G_interlayer, layer_vec, gammas, omegas,
+                                                          show_progress, chunk_dispatch, memory_budget,
+                                                          max_tasks_per_child, checkpoint_path, yield_duplicates=False,
+                                                          worker_peak_rss=worker_peak_rss):
+            total.add(partition)
+
+    if return_worker_peak_rss:
+        return total, worker_peak_rss
     return total
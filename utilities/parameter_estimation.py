@@ -1,35 +1,135 @@
-from .louvain_utilities import singlelayer_louvain, multilayer_louvain
-from .parameter_estimation_utilities import louvain_part_with_membership, estimate_singlelayer_SBM_parameters, \
-    gamma_estimate_from_parameters, omega_function_from_model, estimate_multilayer_SBM_parameters
-from .partition_utilities import in_degrees
-import louvain
+from .lazy_imports import lazy_import
+from .louvain_utilities import singlelayer_louvain, multilayer_louvain, sorted_tuple, louvain_part_with_membership, \
+    iter_parallel_louvain_from_gammas, iter_parallel_louvain_from_points, louvain_sweep_pool
+from .parameter_estimation_utilities import estimate_singlelayer_SBM_parameters, gamma_estimate_from_parameters, \
+    omega_function_from_model, estimate_multilayer_SBM_parameters
+from .partition_utilities import canonical_membership, membership_digest
+from .prepared_graph import prepare_graph
+from contextlib import nullcontext
+import numpy as np
+
+louvain = lazy_import("louvain")
+
+ANDERSON_MEMORY = 3  # number of previous iterations used by Anderson-accelerated updates
+DEFAULT_DAMPING = 0.5  # fraction of the estimate's move taken by damped updates once the iteration oscillates
+SLOW_CONVERGENCE_RATIO = 0.5  # residual reduction per iteration beyond which updates are accelerated
+
+
+class _ConvergenceAccelerator:
+    """Chooses the next resolution parameters of the iterative estimation from the estimates seen so far.
+
+    The estimates are piecewise constant in the resolution parameters, so a plain fixed-point update (i.e. using the
+    estimate directly) is exact once the partition stops changing. Only while the iteration converges slowly, with each
+    (tolerance-scaled) residual above SLOW_CONVERGENCE_RATIO times the previous one, are updates extrapolated from the
+    previous iterations with Anderson acceleration (a secant update for gamma alone). Anderson steps that leave the
+    valid parameter range fall back to a plain update.
+
+    Once a partition recurs after a different one was found in between, i.e. the iteration oscillates, this switches
+    to damped updates for the rest of the iteration, halving the damping each time another oscillation is detected.
+
+    Every change of strategy (including single fixed-point fallback steps) is recorded in log as
+    (iteration, strategy, reason).
+
+    :param scales: tolerance of each resolution parameter, used to scale the residuals
+    :param bounds: (lower bounds, upper bounds) of the resolution parameters
+    :param memory: number of previous iterations used by Anderson updates
+    :param damping: initial fraction of the estimate's move taken by damped updates
+    :param verbose: whether or not to print strategy changes"""
+
+    def __init__(self, scales, bounds, memory=ANDERSON_MEMORY, damping=DEFAULT_DAMPING, verbose=False):
+        self.scales = np.asarray(scales, dtype=np.float64)
+        self.lower_bounds, self.upper_bounds = (np.asarray(bound, dtype=np.float64) for bound in bounds)
+        self.memory = memory
+        self.damping = damping
+        self.verbose = verbose
+        self.strategy = 'accelerated'
+        self.log = []
+        self._points, self._estimates, self._digests = [], [], []
+
+    def _record(self, iteration, strategy, reason):
+        self.log.append((iteration, strategy, reason))
+        if self.verbose:
+            print(f"Iter {iteration:>2}: using {strategy} update since {reason}")
+
+    def _switch(self, iteration, strategy, reason):
+        self._record(iteration, strategy, reason)
+        self.strategy = strategy
+
+    def next_point(self, iteration, point, estimate, membership):
+        """Returns the resolution parameters at which to run the next iteration, given that running the current one at
+        :point: found a partition with :membership: whose estimated resolution parameters are :estimate:"""
+        point, estimate = np.asarray(point, dtype=np.float64), np.asarray(estimate, dtype=np.float64)
+        digest = membership_digest(canonical_membership(membership))
+
+        # a partition recurring after some other partition was found means the iteration is oscillating
+        if len(self._digests) >= 2 and digest != self._digests[-1] and digest in self._digests[:-1]:
+            recurrence = self._digests.index(digest)
+            if self.strategy == 'damped':
+                self.damping /= 2
+            self._switch(iteration, 'damped', f"the partition of iteration {recurrence} recurred "
+                                              f"(damping {self.damping:g})")
+
+        self._points.append(point)
+        self._estimates.append(estimate)
+        self._digests.append(digest)
+
+        if self.strategy == 'damped':
+            return tuple((point + self.damping * (estimate - point)).tolist())
+
+        if len(self._points) < 2 or digest == self._digests[-2]:
+            return tuple(estimate.tolist())
+
+        points = np.array(self._points[-self.memory - 1:])
+        estimates = np.array(self._estimates[-self.memory - 1:])
+        residuals = (estimates - points) / self.scales
+        convergence_ratio = np.linalg.norm(residuals[-1]) / np.linalg.norm(residuals[-2])
+        if convergence_ratio >= 1:
+            # extrapolation would not help, so restart the Anderson history from this iteration
+            self._points, self._estimates = self._points[-1:], self._estimates[-1:]
+            self._record(iteration, 'fixed-point', "the residual increased")
+            return tuple(estimate.tolist())
+        if convergence_ratio < SLOW_CONVERGENCE_RATIO:
+            return tuple(estimate.tolist())
+
+        residual_differences = np.diff(residuals, axis=0)
+        coefficients = np.linalg.lstsq(residual_differences.T, residuals[-1], rcond=None)[0]
+        accelerated = estimate - np.diff(estimates, axis=0).T @ coefficients
+        if not np.isfinite(accelerated).all() or (accelerated < self.lower_bounds).any() or \
+                (accelerated > self.upper_bounds).any():
+            self._record(iteration, 'fixed-point', "the Anderson step left the valid parameter range")
+            return tuple(estimate.tolist())
+        return tuple(accelerated.tolist())
 
 
 def iterative_monolayer_resolution_parameter_estimation(G, gamma=1.0, tol=1e-2, max_iter=25, verbose=False,
-                                                        method="louvain"):
+                                                        method="louvain", accelerate=False,
+                                                        return_strategy_log=False):
     """
     Monolayer variant of ALG. 1 from "Relating modularity maximization and stochastic block models in multilayer
     networks." The nested functions here are just used to match the pseudocode in the paper.
 
-    :param G: input graph
+    :param G: input graph (igraph graph or PreparedGraph)
     :param gamma: starting gamma value
     :param tol: convergence tolerance
     :param max_iter: maximum number of iterations
     :param verbose: whether or not to print verbose output
     :param method: community detection method to use
+    :param accelerate: if True, choose each next gamma with secant updates while the iteration converges slowly,
+                       switching to damped updates if it oscillates, rather than using each estimate directly
+    :param return_strategy_log: if True, also return the list of (iteration, strategy, reason) changes of update
+                                strategy made by :accelerate:
     :return: gamma to which the iteration converged and the resulting partition
     """
 
-    if 'weight' not in G.es:
-        G.es['weight'] = [1.0] * G.ecount()
-    m = sum(G.es['weight'])
+    G = prepare_graph(G)
+    m = G.total_weight
 
     if method == "louvain":
         def maximize_modularity(resolution_param):
             return singlelayer_louvain(G, resolution_param, return_partition=True)
     elif method == "2-spinglass":
         def maximize_modularity(resolution_param):
-            membership = G.community_spinglass(spins=2, gamma=resolution_param).membership
+            membership = G.graph.community_spinglass(spins=2, gamma=resolution_param).membership
             return louvain_part_with_membership(G, membership)
     else:
         raise ValueError(f"Community detection method {method} not supported")
@@ -40,12 +140,14 @@ def iterative_monolayer_resolution_parameter_estimation(G, gamma=1.0, tol=1e-2,
     def update_gamma(omega_in, omega_out):
         return gamma_estimate_from_parameters(omega_in, omega_out)
 
-    part, last_gamma = None, None
+    accelerator = _ConvergenceAccelerator([tol], ([0.0], [np.inf]), verbose=verbose) if accelerate else None
+
+    part, last_gamma, next_gamma = None, None, gamma
     for iteration in range(max_iter):
-        part = maximize_modularity(gamma)
+        part = maximize_modularity(next_gamma)
         omega_in, omega_out = estimate_SBM_parameters(part)
 
-        last_gamma = gamma
+        last_gamma = next_gamma
         gamma = update_gamma(omega_in, omega_out)
 
         if gamma is None:
@@ -57,6 +159,10 @@ def iterative_monolayer_resolution_parameter_estimation(G, gamma=1.0, tol=1e-2,
 
         if abs(gamma - last_gamma) < tol:
             break  # gamma converged
+
+        next_gamma = gamma
+        if accelerator is not None:
+            next_gamma, = accelerator.next_point(iteration, (last_gamma,), (gamma,), part.membership)
     else:
         if verbose:
             print(f"Gamma failed to converge within {max_iter} iterations. "
@@ -65,6 +171,8 @@ def iterative_monolayer_resolution_parameter_estimation(G, gamma=1.0, tol=1e-2,
     if verbose:
         print(f"Returned {len(part)} communities with Q={part.q:.3f} and gamma={gamma:.3f}")
 
+    if return_strategy_log:
+        return gamma, part, accelerator.log if accelerator is not None else []
     return gamma, part
 
 
@@ -82,31 +190,34 @@ def check_multilayer_graph_consistency(G_intralayer, G_interlayer, layer_vec, mo
     :param Nt: vector of nodes per layer
     """
 
+    G_intralayer, G_interlayer = prepare_graph(G_intralayer), prepare_graph(G_interlayer)
+    layer_vec = np.asarray(layer_vec)
+
     rules = [T > 1,
              "Graph must have multiple layers",
-             G_interlayer.is_directed(),
+             G_interlayer.directed,
              "Interlayer graph should be directed",
-             G_interlayer.vcount() == G_intralayer.vcount(),
+             G_interlayer.vcount == G_intralayer.vcount,
              "Inter-layer and Intra-layer graphs must be of the same size",
-             len(layer_vec) == G_intralayer.vcount(),
+             len(layer_vec) == G_intralayer.vcount,
              "Layer membership vector must have length matching graph size",
              all(m > 0 for m in m_t),
              "All layers of graph must contain edges",
-             all(layer_vec[e.source] == layer_vec[e.target] for e in G_intralayer.es),
+             (layer_vec[G_intralayer.sources] == layer_vec[G_intralayer.targets]).all(),
              "Intralayer graph should not contain edges across layers",
-             model != 'temporal' or G_interlayer.ecount() == N * (T - 1),
+             model != 'temporal' or G_interlayer.ecount == N * (T - 1),
              "Interlayer temporal graph must contain (nodes per layer) * (number of layers - 1) edges",
-             model != 'temporal' or (G_interlayer.vcount() % T == 0 and G_intralayer.vcount() % T == 0),
+             model != 'temporal' or (G_interlayer.vcount % T == 0 and G_intralayer.vcount % T == 0),
              "Vertex count of a temporal graph should be a multiple of the number of layers",
              model != 'temporal' or all(nt == N for nt in Nt),
              "Temporal networks must have the same number of nodes in every layer",
              model != 'multilevel' or all(nt > 0 for nt in Nt),
              "All layers of a multilevel graph must be consecutive and nonempty",
-             model != 'multilevel' or all(in_degree <= 1 for in_degree in in_degrees(G_interlayer)),
+             model != 'multilevel' or (G_interlayer.in_degree <= 1).all(),
              "Multilevel networks should have at most one interlayer in-edge per node",
              model != 'multiplex' or all(nt == N for nt in Nt),
              "Multiplex networks must have the same number of nodes in every layer",
-             model != 'multiplex' or G_interlayer.ecount() == N * T * (T - 1),
+             model != 'multiplex' or G_interlayer.ecount == N * T * (T - 1),
              "Multiplex interlayer networks must contain edges between all pairs of layers"]
 
     checks, messages = rules[::2], rules[1::2]
@@ -117,13 +228,14 @@ def check_multilayer_graph_consistency(G_intralayer, G_interlayer, layer_vec, mo
 
 def iterative_multilayer_resolution_parameter_estimation(G_intralayer, G_interlayer, layer_vec, gamma=1.0, omega=1.0,
                                                          gamma_tol=1e-2, omega_tol=5e-2, omega_max=1000, max_iter=25,
-                                                         model='temporal', verbose=False):
+                                                         model='temporal', verbose=False, accelerate=False,
+                                                         return_strategy_log=False):
     """
     Multilayer variant of ALG. 1 from "Relating modularity maximization and stochastic block models in multilayer
     networks." The nested functions here are just used to match the pseudocode in the paper.
 
-    :param G_intralayer: input graph containing all intra-layer edges
-    :param G_interlayer: input graph containing all inter-layer edges
+    :param G_intralayer: input graph containing all intra-layer edges (igraph graph or PreparedGraph)
+    :param G_interlayer: input graph containing all inter-layer edges (igraph graph or PreparedGraph)
     :param layer_vec: vector of each vertex's layer membership
     :param gamma: starting gamma value
     :param omega: starting omega value
@@ -133,28 +245,24 @@ def iterative_multilayer_resolution_parameter_estimation(G_intralayer, G_interla
     :param omega_max: maximum allowed value for omega
     :param model: network layer topology (temporal, multilevel, multiplex)
     :param verbose: whether or not to print verbose output
+    :param accelerate: if True, choose each next (gamma, omega) with Anderson-accelerated updates while the iteration
+                       converges slowly, switching to damped updates if it oscillates, rather than using each estimate
+                       directly
+    :param return_strategy_log: if True, also return the list of (iteration, strategy, reason) changes of update
+                                strategy made by :accelerate:
     :return: gamma, omega to which the iteration converged and the resulting partition
     """
 
-    if 'weight' not in G_intralayer.es:
-        G_intralayer.es['weight'] = [1.0] * G_intralayer.ecount()
-
-    if 'weight' not in G_interlayer.es:
-        G_interlayer.es['weight'] = [1.0] * G_interlayer.ecount()
-
+    G_intralayer, G_interlayer = prepare_graph(G_intralayer), prepare_graph(G_interlayer)
     T = max(layer_vec) + 1  # layer count
     optimiser = louvain.Optimiser()
 
     # compute total edge weights per layer
-    m_t = [0] * T
-    for e in G_intralayer.es:
-        m_t[layer_vec[e.source]] += e['weight']
+    m_t = np.bincount(np.asarray(layer_vec)[G_intralayer.sources], weights=G_intralayer.weights, minlength=T)
 
     # compute total node counts per layer
-    N = G_intralayer.vcount() // T
-    Nt = [0] * T
-    for layer in layer_vec:
-        Nt[layer] += 1
+    N = G_intralayer.vcount // T
+    Nt = np.bincount(layer_vec, minlength=T)
 
     check_multilayer_graph_consistency(G_intralayer, G_interlayer, layer_vec, model, m_t, T, N, Nt)
     update_omega = omega_function_from_model(model, omega_max, T=T)
@@ -168,15 +276,20 @@ def iterative_multilayer_resolution_parameter_estimation(G_intralayer, G_interla
         return estimate_multilayer_SBM_parameters(G_intralayer, G_interlayer, layer_vec, partition, model,
                                                   N=N, T=T, Nt=Nt, m_t=m_t)
 
+    accelerator = (_ConvergenceAccelerator([gamma_tol, omega_tol], ([0.0, 0.0], [np.inf, omega_max]),
+                                           verbose=verbose) if accelerate else None)
+
     part, K, last_gamma, last_omega = (None,) * 4
+    next_gamma, next_omega = gamma, omega
     for iteration in range(max_iter):
-        part = maximize_modularity(gamma, omega)
+        part = maximize_modularity(next_gamma, next_omega)
         theta_in, theta_out, p, K = estimate_SBM_parameters(part)
 
         if not 0.0 <= p <= 1.0:
-            raise ValueError(f"gamma={gamma:.3f}, omega={omega:.3f} resulted in impossible estimate p={p:.3f}")
+            raise ValueError(f"gamma={next_gamma:.3f}, omega={next_omega:.3f} resulted in impossible estimate "
+                             f"p={p:.3f}")
 
-        last_gamma, last_omega = gamma, omega
+        last_gamma, last_omega = next_gamma, next_omega
         gamma = update_gamma(theta_in, theta_out)
 
         if gamma is None:
@@ -190,6 +303,11 @@ def iterative_multilayer_resolution_parameter_estimation(G_intralayer, G_interla
 
         if abs(gamma - last_gamma) < gamma_tol and abs(omega - last_omega) < omega_tol:
             break  # gamma and omega converged
+
+        next_gamma, next_omega = gamma, omega
+        if accelerator is not None:
+            next_gamma, next_omega = accelerator.next_point(iteration, (last_gamma, last_omega), (gamma, omega),
+                                                            part.membership)
     else:
         if verbose:
             print(f"Parameters failed to converge within {max_iter} iterations. "
@@ -199,4 +317,162 @@ def iterative_multilayer_resolution_parameter_estimation(G_intralayer, G_interla
     if verbose:
         print(f"Returned {K} communities with Q={part.q:.3f}, gamma={gamma:.3f}, and omega={omega:.3f}")
 
+    if return_strategy_log:
+        return gamma, omega, part, accelerator.log if accelerator is not None else []
     return gamma, omega, part
+
+
+def _batched_fixed_point_search(starting_points, bucket_widths, run_louvain, estimate, max_iter, verbose=False):
+    """Runs the iterative resolution parameter estimation from all :starting_points: at once.
+
+    Resolution parameters are rounded to a grid of :bucket_widths:, and louvain is run once per grid point (bucket)
+    that any trajectory reaches. Since each bucket's partition determines the next bucket, trajectories that reach the
+    same bucket merge from then on. A trajectory converges once the next bucket's partition is the same as the current
+    one, i.e. once its partition is self-consistent.
+
+    :param starting_points: list of starting resolution parameter tuples
+    :param bucket_widths: tuple of the bucket width of each resolution parameter
+    :param run_louvain: function from a list of resolution parameter tuples to a list of canonical memberships
+    :param estimate: function from a membership to the next resolution parameter tuple (or None if degenerate)
+    :param max_iter: maximum number of iterations of each trajectory
+    :param verbose: whether or not to print verbose output
+    :return: list of (resolution parameters, membership, basin size) of the distinct fixed points, ordered by
+             decreasing basin size"""
+    bucket_widths = np.asarray(bucket_widths, dtype=np.float64)
+
+    def bucket(parameters):
+        return tuple(np.round(np.asarray(parameters) / bucket_widths).astype(np.int64).tolist())
+
+    partition_ids, memberships, estimates = {}, [], []
+    bucket_partitions, next_buckets = {}, {}
+
+    frontier = list(dict.fromkeys(bucket(point) for point in starting_points))
+    for iteration in range(max_iter + 1):
+        if not frontier:
+            break
+
+        centers = [tuple((np.array(b) * bucket_widths).tolist()) for b in frontier]
+        for b, membership in zip(frontier, run_louvain(centers)):
+            if membership not in partition_ids:
+                partition_ids[membership] = len(memberships)
+                memberships.append(membership)
+                estimates.append(estimate(membership))
+            bucket_partitions[b] = partition_ids[membership]
+            next_parameters = estimates[bucket_partitions[b]]
+            next_buckets[b] = bucket(next_parameters) if next_parameters is not None else None
+
+        if verbose:
+            print(f"Iter {iteration:>2}: ran louvain at {len(frontier)} resolution parameters, "
+                  f"{len(memberships)} distinct partitions so far")
+
+        frontier = list(dict.fromkeys(next_buckets[b] for b in frontier
+                                      if next_buckets[b] is not None and next_buckets[b] not in bucket_partitions))
+
+    basin_sizes = {}
+    for point in starting_points:
+        b = bucket(point)
+        for _ in range(max_iter):
+            next_b = next_buckets.get(b)
+            if next_b is None or next_b not in bucket_partitions:
+                break  # degenerate partition or iteration limit reached
+            if bucket_partitions[next_b] == bucket_partitions[b]:
+                fixed_point = bucket_partitions[b]
+                basin_sizes[fixed_point] = basin_sizes.get(fixed_point, 0) + 1
+                break
+            b = next_b
+
+    return [(estimates[i], memberships[i], size) for i, size in sorted(basin_sizes.items(), key=lambda x: -x[1])]
+
+
+def batched_monolayer_resolution_parameter_estimation(G, gammas, tol=1e-2, max_iter=25, single_threaded=False,
+                                                      verbose=False):
+    """
+    Runs iterative_monolayer_resolution_parameter_estimation from each of :gammas: at once, sharing louvain runs.
+
+    Gammas are rounded to multiples of :tol:, louvain is run once per distinct rounded gamma across all starting
+    points, and trajectories merge as soon as they reach a gamma that another has visited. Each round of the iteration
+    runs louvain in parallel across all active trajectories, on a single worker pool shared by all rounds.
+
+    :param G: input graph (igraph graph or PreparedGraph)
+    :param gammas: starting gamma values
+    :param tol: convergence tolerance, which is also the width of the gamma buckets
+    :param max_iter: maximum number of iterations
+    :param single_threaded: if True, run louvain without parallelization
+    :param verbose: whether or not to print verbose output
+    :return: list of (gamma, membership, basin size) of the distinct fixed points, where basin size is the number of
+             starting gammas that converged to the fixed point, ordered by decreasing basin size
+    """
+    G = prepare_graph(G)
+
+    def run_louvain(points):
+        gammas = [gamma for gamma, in points]
+        if pool is None:
+            return [sorted_tuple(singlelayer_louvain(G, gamma)) for gamma in gammas]
+        partitions = {gamma: partition
+                      for gamma, partition, _ in iter_parallel_louvain_from_gammas(G, gammas, pool=pool)}
+        return [partitions[gamma] for gamma in gammas]
+
+    def estimate(membership):
+        gamma = gamma_estimate_from_parameters(*estimate_singlelayer_SBM_parameters(G, membership))
+        return None if gamma is None else (gamma,)
+
+    # the workers receive the graph once rather than in every round of the search
+    with (nullcontext() if single_threaded else louvain_sweep_pool(G)) as pool:
+        fixed_points = _batched_fixed_point_search([(gamma,) for gamma in gammas], (tol,), run_louvain, estimate,
+                                                   max_iter, verbose=verbose)
+    return [(gamma, membership, basin_size) for (gamma,), membership, basin_size in fixed_points]
+
+
+def batched_multilayer_resolution_parameter_estimation(G_intralayer, G_interlayer, layer_vec, starting_points,
+                                                       gamma_tol=1e-2, omega_tol=5e-2, omega_max=1000, max_iter=25,
+                                                       model='temporal', single_threaded=False, verbose=False):
+    """
+    Runs iterative_multilayer_resolution_parameter_estimation from each of :starting_points: at once, sharing louvain
+    runs.
+
+    See batched_monolayer_resolution_parameter_estimation. Starting points whose trajectory reaches an impossible
+    estimate or a degenerate partition are not counted towards any basin.
+
+    :param G_intralayer: input graph containing all intra-layer edges (igraph graph or PreparedGraph)
+    :param G_interlayer: input graph containing all inter-layer edges (igraph graph or PreparedGraph)
+    :param layer_vec: vector of each vertex's layer membership
+    :param starting_points: starting (gamma, omega) values
+    :param gamma_tol: convergence tolerance for gamma, which is also the width of the gamma buckets
+    :param omega_tol: convergence tolerance for omega, which is also the width of the omega buckets
+    :param omega_max: maximum allowed value for omega
+    :param max_iter: maximum number of iterations
+    :param model: network layer topology (temporal, multilevel, multiplex)
+    :param single_threaded: if True, run louvain without parallelization
+    :param verbose: whether or not to print verbose output
+    :return: list of (gamma, omega, membership, basin size) of the distinct fixed points, ordered by decreasing basin
+             size
+    """
+    G_intralayer, G_interlayer = prepare_graph(G_intralayer), prepare_graph(G_interlayer)
+    T = max(layer_vec) + 1  # layer count
+    m_t = np.bincount(np.asarray(layer_vec)[G_intralayer.sources], weights=G_intralayer.weights, minlength=T)
+    N = G_intralayer.vcount // T
+    Nt = np.bincount(layer_vec, minlength=T)
+
+    check_multilayer_graph_consistency(G_intralayer, G_interlayer, layer_vec, model, m_t, T, N, Nt)
+    update_omega = omega_function_from_model(model, omega_max, T=T)
+
+    def run_louvain(points):
+        if pool is None:
+            return [sorted_tuple(multilayer_louvain(G_intralayer, G_interlayer, layer_vec, gamma, omega))
+                    for gamma, omega in points]
+        partitions = {(gamma, omega): partition for gamma, omega, partition, _ in iter_parallel_louvain_from_points(
+            G_intralayer, G_interlayer, layer_vec, points, pool=pool)}
+        return [partitions[point] for point in points]
+
+    def estimate(membership):
+        theta_in, theta_out, p, K = estimate_multilayer_SBM_parameters(G_intralayer, G_interlayer, layer_vec,
+                                                                       membership, model, N=N, T=T, Nt=Nt, m_t=m_t)
+        gamma = gamma_estimate_from_parameters(theta_in, theta_out)
+        if gamma is None or not 0.0 <= p <= 1.0:
+            return None
+        return gamma, update_omega(theta_in, theta_out, p, K)
+
+    with (nullcontext() if single_threaded else louvain_sweep_pool(G_intralayer, G_interlayer, layer_vec)) as pool:
+        fixed_points = _batched_fixed_point_search(starting_points, (gamma_tol, omega_tol), run_louvain, estimate,
+                                                   max_iter, verbose=verbose)
+    return [(gamma, omega, membership, basin_size) for (gamma, omega), membership, basin_size in fixed_points]
@@ -1,38 +1,50 @@
-from .louvain_utilities import louvain_part_with_membership, sorted_tuple
 from .champ_utilities import CHAMP_2D
-from .partition_utilities import num_communities
-import louvain
+from .instrumentation import stage
+from .lazy_imports import lazy_import
+from .partition_archive import PartitionArchive
+from .partition_store import PartitionStore
+from .partition_utilities import canonicalize_memberships, num_communities
+from .prepared_graph import prepare_graph
 from math import log
 import numpy as np
-from scipy.optimize import fsolve
 import warnings
 
+scipy_optimize = lazy_import("scipy.optimize")
+
+
+def _membership_and_num_communities(partition):
+    """Returns the membership array and community count of a louvain partition or membership vector"""
+    # duck-typed so that plain membership vectors never trigger the (deferred) louvain import
+    if hasattr(partition, 'membership'):
+        return np.asarray(partition.membership), len(partition)
+    community = np.asarray(partition)
+    return community, int(community.max()) + 1 if len(community) else 0
+
 
 def estimate_singlelayer_SBM_parameters(G, partition, m=None):
     """Estimates singlelayer SBM parameters from a graph and a partition
 
-    :param G: graph
-    :param partition: partition
+    :param G: graph (igraph graph or PreparedGraph)
+    :param partition: louvain partition or membership vector
     :param m: total edge weight of graph (if None, will be computed)
     :return: omega_in, omega_out
     """
+    G = prepare_graph(G)
 
     if m is None:
-        m = sum(G.es['weight'])
+        m = G.total_weight
 
-    assert isinstance(partition, louvain.RBConfigurationVertexPartition)
-    community = partition.membership
+    community, K = _membership_and_num_communities(partition)
+    source_communities, target_communities = community[G.sources], community[G.targets]
 
-    m_in = sum(e['weight'] * (community[e.source] == community[e.target]) for e in G.es)
-    kappa_r_list = [0] * len(partition)
-    for e in G.es:
-        kappa_r_list[community[e.source]] += e['weight']
-        kappa_r_list[community[e.target]] += e['weight']
-    sum_kappa_sqr = sum(x ** 2 for x in kappa_r_list)
+    m_in = G.weights[source_communities == target_communities].sum()
+    kappa_r_list = (np.bincount(source_communities, weights=G.weights, minlength=K) +
+                    np.bincount(target_communities, weights=G.weights, minlength=K))
+    sum_kappa_sqr = (kappa_r_list ** 2).sum()
 
     omega_in = (2 * m_in) / (sum_kappa_sqr / (2 * m))
     # guard for div by zero with single community partition
-    omega_out = (2 * m - 2 * m_in) / (2 * m - sum_kappa_sqr / (2 * m)) if len(partition) > 1 else 0
+    omega_out = (2 * m - 2 * m_in) / (2 * m - sum_kappa_sqr / (2 * m)) if K > 1 else 0
 
     # return estimates for omega_in, omega_out
     return omega_in, omega_out
@@ -42,10 +54,10 @@ def estimate_multilayer_SBM_parameters(G_intralayer, G_interlayer, layer_vec, pa
                                        Nt=None, m_t=None):
     """Estimates multilayer SBM parameters from a graph and a partition
 
-    :param G_intralayer: input graph containing all intra-layer edges
-    :param G_interlayer: input graph containing all inter-layer edges
+    :param G_intralayer: input graph containing all intra-layer edges (igraph graph or PreparedGraph)
+    :param G_interlayer: input graph containing all inter-layer edges (igraph graph or PreparedGraph)
     :param layer_vec: vector of each vertex's layer membership
-    :param partition: partition of interest
+    :param partition: partition of interest (louvain partition or membership vector)
     :param model: network layer topology (temporal, multilevel, multiplex)
     :param N: number of nodes per layer
     :param T: number of layers in input graph
@@ -53,47 +65,41 @@ def estimate_multilayer_SBM_parameters(G_intralayer, G_interlayer, layer_vec, pa
     :param m_t: vector of total edge weights per layer
     :return: theta_in, theta_out, p, K
     """
-
-    if 'weight' not in G_intralayer.es:
-        G_intralayer.es['weight'] = [1.0] * G_intralayer.ecount()
+    G_intralayer = prepare_graph(G_intralayer)
+    layer_vec = np.asarray(layer_vec)
 
     # TODO: check if these None parameters and potentially caching calculate_persistence helps performance
     if T is None:
-        T = max(layer_vec) + 1  # layer  count
+        T = layer_vec.max() + 1  # layer  count
 
     if N is None:
-        N = G_intralayer.vcount() // T
+        N = G_intralayer.vcount // T
 
+    source_layers = layer_vec[G_intralayer.sources]
     if m_t is None:  # compute total edge weights per layer
-        m_t = [0] * T
-        for e in G_intralayer.es:
-            m_t[layer_vec[e.source]] += e['weight']
+        m_t = np.bincount(source_layers, weights=G_intralayer.weights, minlength=T)
+    m_t = np.asarray(m_t, dtype=float)
 
     if Nt is None:  # compute total node counts per layer
-        Nt = [0] * T
-        for layer in layer_vec:
-            Nt[layer] += 1
+        Nt = np.bincount(layer_vec, minlength=T)
 
-    K = len(partition)
+    community, K = _membership_and_num_communities(partition)
+    source_communities, target_communities = community[G_intralayer.sources], community[G_intralayer.targets]
 
-    community = partition.membership
-    m_t_in = [0] * T
-    for e in G_intralayer.es:
-        if community[e.source] == community[e.target] and layer_vec[e.source] == layer_vec[e.target]:
-            m_t_in[layer_vec[e.source]] += e['weight']
+    internal = (source_communities == target_communities) & (source_layers == layer_vec[G_intralayer.targets])
+    m_t_in = np.bincount(source_layers[internal], weights=G_intralayer.weights[internal], minlength=T)
 
-    kappa_t_r_list = [[0] * K for _ in range(T)]
-    for e in G_intralayer.es:
-        layer = layer_vec[e.source]
-        kappa_t_r_list[layer][community[e.source]] += e['weight']
-        kappa_t_r_list[layer][community[e.target]] += e['weight']
-    sum_kappa_t_sqr = [sum(x ** 2 for x in kappa_t_r_list[t]) for t in range(T)]
+    kappa_t_r_list = (np.bincount(source_layers * K + source_communities, weights=G_intralayer.weights,
+                                  minlength=T * K) +
+                      np.bincount(source_layers * K + target_communities, weights=G_intralayer.weights,
+                                  minlength=T * K)).reshape(T, K)
+    sum_kappa_t_sqr = (kappa_t_r_list ** 2).sum(axis=1)
 
-    theta_in = sum(2 * m_t_in[t] for t in range(T)) / sum(sum_kappa_t_sqr[t] / (2 * m_t[t]) for t in range(T))
+    theta_in = (2 * m_t_in).sum() / (sum_kappa_t_sqr / (2 * m_t)).sum()
 
     # guard for div by zero with e.g. a single community partition
-    theta_out_numerator = sum(2 * m_t[t] - 2 * m_t_in[t] for t in range(T))
-    theta_out_denominator = sum(2 * m_t[t] - sum_kappa_t_sqr[t] / (2 * m_t[t]) for t in range(T))
+    theta_out_numerator = (2 * m_t - 2 * m_t_in).sum()
+    theta_out_denominator = (2 * m_t - sum_kappa_t_sqr / (2 * m_t)).sum()
     if theta_out_denominator == 0:
         theta_out = 0
     else:
@@ -109,7 +115,7 @@ def estimate_multilayer_SBM_parameters(G_intralayer, G_interlayer, layer_vec, pa
 
         # guard for div by zero with single community partition
         # (in this case, all community assignments persist across layers)
-        p = fsolve(f, np.array([0.5]))[0] if pers < 1.0 and K > 1 else 1.0
+        p = scipy_optimize.fsolve(f, np.array([0.5]))[0] if pers < 1.0 and K > 1 else 1.0
         if p < 0:
             p = 0
     else:
@@ -121,14 +127,7 @@ def estimate_multilayer_SBM_parameters(G_intralayer, G_interlayer, layer_vec, pa
 
 
 def gamma_estimate(G, partition):
-    """Returns the gamma estimate for a graph and a partition"""
-
-    if 'weight' not in G.es:
-        G.es['weight'] = [1.0] * G.vcount()
-
-    if not isinstance(partition, louvain.RBConfigurationVertexPartition):
-        partition = louvain_part_with_membership(G, partition)
-
+    """Returns the gamma estimate for a graph and a partition (louvain partition or membership vector)"""
     omega_in, omega_out = estimate_singlelayer_SBM_parameters(G, partition)
     return gamma_estimate_from_parameters(omega_in, omega_out)
 
@@ -180,23 +179,29 @@ def temporal_multilevel_omega_estimate_from_parameters(theta_in, theta_out, p, K
     return log(1 + p * K / (1 - p)) / (2 * (log(theta_in) - log(theta_out))) if p < 1.0 else omega_max
 
 
+def _persistent_edges(G_interlayer, community):
+    """Returns a boolean array of whether each interlayer edge lies within a community"""
+    G_interlayer = prepare_graph(G_interlayer)
+    community = np.asarray(community)
+    return community[G_interlayer.sources] == community[G_interlayer.targets]
+
+
 def ordinal_persistence(G_interlayer, community, N, T):
     # ordinal persistence (temporal model)
-    return sum(community[e.source] == community[e.target] for e in G_interlayer.es) / (N * (T - 1))
+    return np.count_nonzero(_persistent_edges(G_interlayer, community)) / (N * (T - 1))
 
 
 def multilevel_persistence(G_interlayer, community, layer_vec, Nt, T):
-    pers_per_layer = [0] * T
-    for e in G_interlayer.es:
-        pers_per_layer[layer_vec[e.target]] += (community[e.source] == community[e.target])
+    target_layers = np.asarray(layer_vec)[prepare_graph(G_interlayer).targets]
+    pers_per_layer = np.bincount(target_layers[_persistent_edges(G_interlayer, community)], minlength=T)
 
-    pers_per_layer = [pers_per_layer[layer] / Nt[layer] for layer in range(T)]
-    return sum(pers_per_layer) / (T - 1)
+    pers_per_layer = pers_per_layer / np.asarray(Nt)
+    return pers_per_layer.sum() / (T - 1)
 
 
 def categorical_persistence(G_interlayer, community, N, T):
     # categorical persistence (multiplex model)
-    return sum(community[e.source] == community[e.target] for e in G_interlayer.es) / (N * T * (T - 1))
+    return np.count_nonzero(_persistent_edges(G_interlayer, community)) / (N * T * (T - 1))
 
 
 def omega_function_from_model(model, omega_max, T):
@@ -269,8 +274,7 @@ def gamma_omega_estimate(G_intralayer, G_interlayer, layer_vec, membership, omeg
     if T is None:
         T = max(layer_vec) + 1  # layer  count
 
-    partition = louvain_part_with_membership(G_intralayer, membership)
-    theta_in, theta_out, p, K = estimate_multilayer_SBM_parameters(G_intralayer, G_interlayer, layer_vec, partition,
+    theta_in, theta_out, p, K = estimate_multilayer_SBM_parameters(G_intralayer, G_interlayer, layer_vec, membership,
                                                                    model, N=N, T=T, Nt=Nt, m_t=m_t)
     update_omega = omega_function_from_model(model, omega_max, T=T)
     update_gamma = gamma_estimate_from_parameters
@@ -288,8 +292,9 @@ def ranges_to_gamma_estimates(G, ranges):
     :return: list of [(gamma_start, gamma_end, membership, gamma_estimate), ...]
     """
 
-    return [(gamma_start, gamma_end, part, gamma_estimate(G, part)) for
-            gamma_start, gamma_end, part in ranges]
+    with stage("gamma_estimates", items=len(ranges)):
+        return [(gamma_start, gamma_end, part, gamma_estimate(G, part)) for
+                gamma_start, gamma_end, part in ranges]
 
 
 def gamma_estimates_to_stable_partitions(gamma_estimates):
@@ -309,10 +314,11 @@ def domains_to_gamma_omega_estimates(G_intralayer, G_interlayer, layer_vec, doma
     Returns a list of [(polygon vertices, membership, gamma_estimate, omega_estimate), ...]"""
 
     domains_with_estimates = []
-    for polyverts, membership in domains:
-        gamma_est, omega_est = gamma_omega_estimate(G_intralayer, G_interlayer, layer_vec, membership,
-                                                    model=model)
-        domains_with_estimates.append((polyverts, membership, gamma_est, omega_est))
+    with stage("gamma_omega_estimates", items=len(domains)):
+        for polyverts, membership in domains:
+            gamma_est, omega_est = gamma_omega_estimate(G_intralayer, G_interlayer, layer_vec, membership,
+                                                        model=model)
+            domains_with_estimates.append((polyverts, membership, gamma_est, omega_est))
     return domains_with_estimates
 
 
@@ -353,41 +359,55 @@ def gamma_omega_estimates_to_stable_partitions(domains_with_estimates):
     return stable_partitions
 
 
+def _canonical_input_partitions(parts, restrict_num_communities):
+    """Returns the unique, canonically represented partitions of :parts: that have :restrict_num_communities:
+    communities (if not None)"""
+    if isinstance(parts, (PartitionStore, PartitionArchive)):
+        # partition stores and archives already hold unique, canonically represented membership vectors
+        if restrict_num_communities is not None:
+            parts = parts.subset(parts.num_communities() == restrict_num_communities)
+        return parts
+
+    # convert louvain partitions to membership vectors if necessary (duck-typed to avoid importing louvain)
+    parts = [part.membership if hasattr(part, 'membership') else part for part in parts]
+
+    # canonically represent all membership vectors at once
+    parts = {tuple(part) for part in canonicalize_memberships(parts).tolist()} if parts else set()
+
+    if restrict_num_communities is not None:
+        parts = {part for part in parts if num_communities(part) == restrict_num_communities}
+    return parts
+
+
 def prune_to_stable_partitions(G, parts, gamma_start, gamma_end, restrict_num_communities=None,
                                single_threaded=False):
     """Runs our full pruning pipeline on a singlelayer network.
 
-    :param G: graph of interest
-    :param parts: partitions to prune
+    :param G: graph of interest (igraph graph or PreparedGraph)
+    :param parts: partitions to prune (an iterable of memberships or louvain partitions, a PartitionStore, or a
+                  PartitionArchive)
     :param gamma_start: starting gamma value for CHAMP
     :param gamma_end: ending gamma value for CHAMP
     :param restrict_num_communities: if not None, only use input partitions of this many communities
     :param single_threaded: if True, run the CHAMP step without parallelization
     :return: pruned set of stable partitions
     """
-    if not G.is_connected():
-        warnings.warn("The pruning pipeline has not been thoroughly tested on disconnected graphs. If you run into "
-                      "problems, consider using the largest connected component of your graph.")
-
-    if G.is_weighted() and any(x != 1.0 for x in G.es['weight']):
-        warnings.warn("The pruning pipeline does not fully handle weighted graphs and will proceed as though the input "
-                      "graph is unweighted.")
+    with stage("prune_to_stable_partitions"):
+        G = prepare_graph(G)
 
-    if isinstance(parts, louvain.RBConfigurationVertexPartition):
-        # convert to (canonically represented) membership vectors if necessary
-        parts = {sorted_tuple(part.membership) for part in parts}
-    else:
-        # assume parts contains membership vectors
-        parts = {sorted_tuple(part) for part in parts}
+        if not G.graph.is_connected():
+            warnings.warn("The pruning pipeline has not been thoroughly tested on disconnected graphs. If you run into "
+                          "problems, consider using the largest connected component of your graph.")
 
-    if restrict_num_communities is not None:
-        parts = {part for part in parts if num_communities(part) == restrict_num_communities}
+        with stage("canonicalization") as span:
+            parts = _canonical_input_partitions(parts, restrict_num_communities)
+            span.add_items(len(parts))
 
-    if len(parts) == 0:
-        return []
+        if len(parts) == 0:
+            return []
 
-    ranges = CHAMP_2D(G, parts, gamma_start, gamma_end, single_threaded=single_threaded)
-    gamma_estimates = ranges_to_gamma_estimates(G, ranges)
-    stable_parts = gamma_estimates_to_stable_partitions(gamma_estimates)
+        ranges = CHAMP_2D(G, parts, gamma_start, gamma_end, single_threaded=single_threaded)
+        gamma_estimates = ranges_to_gamma_estimates(G, ranges)
+        stable_parts = gamma_estimates_to_stable_partitions(gamma_estimates)
 
     return stable_parts
@@ -0,0 +1,263 @@
+from .partition_store import PartitionStore, UINT16_MAX_COMMUNITIES
+from .partition_utilities import canonical_membership, membership_digest
+import io
+import numpy as np
+import struct
+import zlib
+
+# The archive starts with a NumPy (.npy version 1.0) header describing the logical (num_partitions x num_nodes) label
+# matrix, padded to HEADER_SIZE bytes. Chunks of (possibly delta-encoded and compressed) row-major labels follow, then
+# an index section of .npy arrays and finally a footer pointing to the index section.
+#
+# Uncompressed archives without delta-encoded rows are therefore valid .npy files that can be memory-mapped directly.
+HEADER_SIZE = 128
+ARCHIVE_VERSION = 1
+COMPRESSION_CODES = {None: 0, 'zlib': 1}
+DEFAULT_CHUNK_SIZE = 256  # partitions per chunk
+DEFAULT_DELTA_WINDOW = 8  # number of earlier partitions in a chunk considered as delta references
+
+_FOOTER = struct.Struct('<Q8s')
+_FOOTER_MAGIC = b'MPARIDX1'
+
+
+def _npy_header(dtype, shape):
+    header = repr({'descr': np.lib.format.dtype_to_descr(np.dtype(dtype)), 'fortran_order': False,
+                   'shape': tuple(shape)})
+    prefix = np.lib.format.magic(1, 0)
+    header_length = HEADER_SIZE - len(prefix) - 2
+    if len(header) + 1 > header_length:
+        raise ValueError(f"Archive shape {shape} is too large for its header")
+    return prefix + struct.pack('<H', header_length) + (header.ljust(header_length - 1) + '\n').encode('latin1')
+
+
+class PartitionArchiveWriter:
+    """Writes canonical, deduplicated partitions to a partition archive at :path:.
+
+    Each partition may be delta-encoded (XOR of labels) against whichever of the previous :delta_window: partitions in
+    its chunk it differs from in the fewest nodes. Since nearby partitions of a sweep usually differ in only a few
+    nodes, the encoded rows are mostly zeros and compress very well.
+
+    Like PartitionStore, the writer's add() returns whether the partition was new, so it can be used as the
+    partition_store of the Louvain sweeps."""
+
+    def __init__(self, path, num_nodes, dtype=np.uint16, chunk_size=DEFAULT_CHUNK_SIZE, compression='zlib',
+                 delta=True, delta_window=DEFAULT_DELTA_WINDOW, compression_level=6):
+        if compression not in COMPRESSION_CODES:
+            raise ValueError(f"Compression {compression} is not supported")
+
+        self.path = path
+        self.num_nodes = num_nodes
+        self.dtype = np.dtype(dtype)
+        self.chunk_size = chunk_size
+        self.compression = compression
+        self.compression_level = compression_level
+        self.delta_window = delta_window if delta else 0
+
+        self._digests = set()
+        self._chunk = np.empty((chunk_size, num_nodes), dtype=self.dtype)
+        self._chunk_references = np.full(chunk_size, -1, dtype=np.int64)
+        self._chunk_count = 0
+        self._references = []
+        self._chunk_offsets = [HEADER_SIZE]
+        self._count = 0
+
+        self._file = open(path, 'wb')
+        self._file.write(_npy_header(self.dtype, (0, num_nodes)))
+
+    def __len__(self):
+        return self._count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def add(self, membership):
+        """Adds the canonical form of :membership: to the archive.
+
+        :return: True if the partition was not already present in the archive"""
+        membership = canonical_membership(membership)
+        if len(membership) != self.num_nodes:
+            raise ValueError(f"Membership of length {len(membership)} cannot be added to an archive of partitions of "
+                             f"{self.num_nodes} nodes")
+        if len(membership) and membership.max() > np.iinfo(self.dtype).max:
+            raise ValueError(f"Membership has too many communities to be stored as {self.dtype}")
+
+        digest = membership_digest(membership)
+        if digest in self._digests:
+            return False
+        self._digests.add(digest)
+
+        i = self._chunk_count
+        self._chunk[i] = membership
+        if i > 0 and self.delta_window > 0:
+            window_start = max(0, i - self.delta_window)
+            distances = (self._chunk[window_start:i] != self._chunk[i]).sum(axis=1)
+            nearest = int(np.argmin(distances))
+            if distances[nearest] < self.num_nodes // 2:  # otherwise, the delta is unlikely to compress better
+                self._chunk_references[i] = self._count - i + window_start + nearest
+
+        self._chunk_count += 1
+        self._count += 1
+        if self._chunk_count == self.chunk_size:
+            self._flush_chunk()
+        return True
+
+    def update(self, partitions):
+        for membership in partitions:
+            self.add(membership)
+
+    def _flush_chunk(self):
+        if self._chunk_count == 0:
+            return
+
+        chunk_start = self._count - self._chunk_count
+        rows = self._chunk[:self._chunk_count]
+        references = self._chunk_references[:self._chunk_count]
+
+        encoded = rows.copy()
+        for i in np.flatnonzero(references >= 0):
+            encoded[i] ^= rows[references[i] - chunk_start]
+
+        data = encoded.tobytes()
+        if self.compression == 'zlib':
+            data = zlib.compress(data, self.compression_level)
+
+        self._file.write(data)
+        self._chunk_offsets.append(self._chunk_offsets[-1] + len(data))
+        self._references.extend(references.tolist())
+
+        self._chunk_references[:] = -1
+        self._chunk_count = 0
+
+    def close(self):
+        if self._file.closed:
+            return
+
+        self._flush_chunk()
+
+        index_offset = self._chunk_offsets[-1]
+        metadata = np.array([ARCHIVE_VERSION, self.chunk_size, COMPRESSION_CODES[self.compression]], dtype=np.int64)
+        for array in [metadata, np.array(self._chunk_offsets, dtype=np.int64),
+                      np.array(self._references, dtype=np.int64)]:
+            np.lib.format.write_array(self._file, array, allow_pickle=False)
+        self._file.write(_FOOTER.pack(index_offset, _FOOTER_MAGIC))
+
+        self._file.seek(0)
+        self._file.write(_npy_header(self.dtype, (self._count, self.num_nodes)))
+        self._file.close()
+
+
+def write_partition_archive(path, partitions, chunk_size=DEFAULT_CHUNK_SIZE, compression='zlib', delta=True,
+                            delta_window=DEFAULT_DELTA_WINDOW):
+    """Writes the unique partitions of :partitions: (an iterable of memberships or a PartitionStore) to a partition
+    archive at :path:, choosing the smallest label dtype that fits all of them.
+
+    :return: number of partitions written"""
+    store = partitions if isinstance(partitions, PartitionStore) else PartitionStore(partitions)
+    dtype = np.uint16 if store.num_communities().max(initial=0) <= UINT16_MAX_COMMUNITIES else np.int32
+
+    with PartitionArchiveWriter(path, store.num_nodes or 0, dtype=dtype, chunk_size=chunk_size,
+                                compression=compression, delta=delta, delta_window=delta_window) as writer:
+        for membership in store.memberships:
+            writer.add(membership)
+        return len(writer)
+
+
+class PartitionArchive:
+    """Memory-mapped, read-only access to a partition archive written by PartitionArchiveWriter.
+
+    Partitions are decoded one chunk at a time, so random access by index only touches the chunk containing that
+    partition. Iterating over an archive (or indexing it) produces membership tuples, so it can be used in place of a
+    set or list of partitions throughout this package."""
+
+    def __init__(self, path):
+        self.path = path
+
+        with open(path, 'rb') as f:
+            np.lib.format.read_magic(f)
+            (self._num_partitions, self.num_nodes), _, self.dtype = np.lib.format.read_array_header_1_0(f)
+
+        self._buffer = np.memmap(path, dtype=np.uint8, mode='r')
+        index_offset, magic = _FOOTER.unpack(self._buffer[-_FOOTER.size:].tobytes())
+        if magic != _FOOTER_MAGIC:
+            raise ValueError(f"{path} is not a complete partition archive")
+
+        index = io.BytesIO(self._buffer[index_offset:len(self._buffer) - _FOOTER.size].tobytes())
+        version, self.chunk_size, compression_code = np.lib.format.read_array(index).tolist()
+        if version != ARCHIVE_VERSION:
+            raise ValueError(f"Partition archive version {version} is not supported")
+
+        self.compression = {code: name for name, code in COMPRESSION_CODES.items()}[compression_code]
+        self._chunk_offsets = np.lib.format.read_array(index)
+        self._references = np.lib.format.read_array(index)
+        self._cached_chunk = (None, None)
+
+    def __len__(self):
+        return self._num_partitions
+
+    def __iter__(self):
+        for block in self.iter_blocks():
+            for membership in block.tolist():
+                yield tuple(membership)
+
+    def __getitem__(self, i):
+        if not -self._num_partitions <= i < self._num_partitions:
+            raise IndexError("PartitionArchive index out of range")
+        i %= self._num_partitions
+        return tuple(self._chunk(i // self.chunk_size)[i % self.chunk_size].tolist())
+
+    @property
+    def is_raw(self):
+        """Whether the label matrix is stored uncompressed and without delta-encoded rows."""
+        return self.compression is None and not (self._references >= 0).any()
+
+    @property
+    def memberships(self):
+        """Matrix (num_partitions x num_nodes) of canonical memberships.
+
+        This is a read-only numpy.memmap when the archive is raw. Otherwise, the whole archive is decoded into
+        memory."""
+        if self._num_partitions == 0:
+            return np.empty((0, self.num_nodes), dtype=self.dtype)
+        if self.is_raw:
+            return np.memmap(self.path, dtype=self.dtype, mode='r', offset=HEADER_SIZE,
+                             shape=(self._num_partitions, self.num_nodes))
+        return np.vstack(list(self.iter_blocks()))
+
+    def _chunk(self, chunk_index):
+        cached_index, cached_chunk = self._cached_chunk
+        if cached_index == chunk_index:
+            return cached_chunk
+
+        chunk_start = chunk_index * self.chunk_size
+        data = self._buffer[self._chunk_offsets[chunk_index]:self._chunk_offsets[chunk_index + 1]]
+        if self.compression == 'zlib':
+            data = zlib.decompress(data)
+        chunk = np.frombuffer(data, dtype=self.dtype).reshape(-1, self.num_nodes).copy()
+
+        references = self._references[chunk_start:chunk_start + len(chunk)]
+        for i in np.flatnonzero(references >= 0):
+            chunk[i] ^= chunk[references[i] - chunk_start]
+
+        self._cached_chunk = (chunk_index, chunk)
+        return chunk
+
+    def iter_blocks(self):
+        """Yields the archive's membership matrix in consecutive blocks of rows (one chunk at a time)."""
+        for chunk_index in range(len(self._chunk_offsets) - 1):
+            yield self._chunk(chunk_index)
+
+    def num_communities(self):
+        """Returns an array of the number of communities in each partition."""
+        if self._num_partitions == 0:
+            return np.zeros(0, dtype=np.int64)
+        return np.concatenate([block.max(axis=1).astype(np.int64) + 1 for block in self.iter_blocks()])
+
+    def subset(self, selection):
+        """Returns a PartitionStore containing the partitions selected by a boolean mask or array of indices."""
+        indices = np.arange(self._num_partitions)[selection]
+        store = PartitionStore()
+        store.update(self[i] for i in indices)
+        return store
@@ -0,0 +1,255 @@
+from .instrumentation import stage
+from .lazy_imports import lazy_import
+from .partition_similarity import _summarize_partitions, _contingency_entries, _mutual_information, \
+    SIMILARITY_BLOCK_ELEMENTS
+from .partition_store import PartitionStore
+from .partition_utilities import canonicalize_memberships
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+scipy_optimize = lazy_import("scipy.optimize")
+
+NEAR_DUPLICATE_DISTANCES = ('vi', 'hamming')
+DEFAULT_NUM_HASHES = 64  # MinHash signature length
+LSH_TARGET_RECALL = 0.99  # probability with which partitions at the distance threshold share an LSH bucket
+
+
+def _partition_elements(memberships, order):
+    """Returns a matrix of label-invariant elements describing each partition: node order[p] is described by the pair
+    (p, position in :order: of the first node of its community), encoded as a single integer.
+
+    Moving a node to another community only changes that node's element, unless it was the first node of its
+    community. Hence the Jaccard similarity of the element sets of partitions differing in a fraction d of their nodes
+    is about (1 - d) / (1 + d)."""
+    num_partitions, num_nodes = memberships.shape
+    # relabeling the communities by first occurrence in :order: numbers them by their first nodes in that order
+    relabeled = canonicalize_memberships(memberships[:, order]).astype(np.int64)
+    num_communities = relabeled.max(axis=1) + 1
+    community_offsets = np.cumsum(num_communities) - num_communities
+
+    previous_max = np.maximum.accumulate(relabeled, axis=1)
+    is_first = np.ones_like(relabeled, dtype=bool)
+    is_first[:, 1:] = relabeled[:, 1:] > previous_max[:, :-1]
+    first_positions = np.flatnonzero(is_first) % num_nodes
+
+    positions = np.arange(num_nodes, dtype=np.int64)
+    return positions * num_nodes + first_positions[community_offsets[:, np.newaxis] + relabeled]
+
+
+def minhash_signatures(memberships, num_hashes=DEFAULT_NUM_HASHES, seed=0):
+    """Computes MinHash signatures of partitions, such that the fraction of equal signature entries of two partitions
+    estimates the Jaccard similarity of their (label-invariant) sets of node assignments.
+
+    :param memberships: (num_partitions x num_nodes) membership matrix
+    :param num_hashes: signature length
+    :param seed: random seed of the hash functions
+    :return: (num_partitions x num_hashes) uint64 matrix of signatures"""
+    memberships = np.asarray(memberships)
+    num_partitions, num_nodes = memberships.shape
+    rng = np.random.default_rng(seed)
+    order = rng.permutation(num_nodes)
+    # multiply-shift hashing, with uint64 arithmetic wrapping around
+    multipliers = rng.integers(1, 2 ** 63, size=num_hashes, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+    increments = rng.integers(0, 2 ** 63, size=num_hashes, dtype=np.uint64)
+
+    signatures = np.zeros((num_partitions, num_hashes), dtype=np.uint64)
+    block_rows = max(1, SIMILARITY_BLOCK_ELEMENTS // max(num_nodes, 1))
+    for start in range(0, num_partitions if num_nodes > 0 else 0, block_rows):
+        elements = _partition_elements(memberships[start:start + block_rows], order).astype(np.uint64)
+        for i in range(num_hashes):
+            hashes = (elements * multipliers[i] + increments[i]) >> np.uint64(32)
+            signatures[start:start + block_rows, i] = hashes.min(axis=1)
+    return signatures
+
+
+def lsh_band_rows(num_hashes, min_jaccard, target_recall=LSH_TARGET_RECALL):
+    """Returns the number of signature rows per LSH band, the largest divisor r of :num_hashes: for which partitions
+    with Jaccard similarity :min_jaccard: share a bucket with probability at least :target_recall: (1 if none does).
+
+    Larger bands produce fewer false candidate pairs."""
+    for rows in range(num_hashes, 0, -1):
+        if num_hashes % rows == 0 and 1 - (1 - min_jaccard ** rows) ** (num_hashes // rows) >= target_recall:
+            return rows
+    return 1
+
+
+def _lsh_buckets(signatures, band_rows):
+    """Returns a (num_partitions x num_bands) matrix of bucket indices (unique across bands)"""
+    num_partitions, num_hashes = signatures.shape
+    buckets = np.empty((num_partitions, num_hashes // band_rows), dtype=np.int64)
+    num_buckets = 0
+    for band in range(num_hashes // band_rows):
+        band_signatures = np.ascontiguousarray(signatures[:, band * band_rows:(band + 1) * band_rows])
+        keys = band_signatures.view(np.dtype((np.void, band_signatures.dtype.itemsize * band_rows))).ravel()
+        _, inverse = np.unique(keys, return_inverse=True)
+        buckets[:, band] = inverse.ravel() + num_buckets
+        num_buckets += inverse.max() + 1 if num_partitions > 0 else 0
+    return buckets
+
+
+def _aligned_matches(summary, rows, columns, entries):
+    """Returns the number of nodes on which each partition pair agrees under the best one-to-one alignment of their
+    community labels.
+
+    When each community's most overlapping counterpart is distinct (as for near-duplicates), that is the alignment.
+    Otherwise, the pair's alignment is found with the Hungarian algorithm."""
+    pairs, first_communities, second_communities, counts = entries
+    matches = np.zeros(len(rows))
+    if len(pairs) == 0:
+        return matches
+
+    # the entries are sorted by pair and then by community of the first partition
+    row_keys = pairs * (summary.num_communities.max() + 1) + first_communities
+    row_starts = np.flatnonzero(np.concatenate(([True], row_keys[1:] != row_keys[:-1])))
+    row_maxima = np.maximum.reduceat(counts, row_starts)
+    row_pairs = pairs[row_starts]
+    is_maximum = counts == np.repeat(row_maxima, np.diff(np.append(row_starts, len(counts))))
+    maximum_entries = np.flatnonzero(is_maximum)
+    # the first maximum of each row
+    best = maximum_entries[np.searchsorted(maximum_entries, row_starts)]
+
+    matches += np.bincount(row_pairs, weights=row_maxima, minlength=len(rows))
+    counterpart_keys = pairs[best] * (summary.num_communities.max() + 1) + second_communities[best]
+    unique_keys, key_counts = np.unique(counterpart_keys, return_counts=True)
+    conflicting = np.unique(unique_keys[key_counts > 1] // (summary.num_communities.max() + 1))
+
+    for pair in conflicting:
+        in_pair = pairs == pair
+        table = np.zeros((summary.num_communities[rows[pair]], summary.num_communities[columns[pair]]))
+        table[first_communities[in_pair], second_communities[in_pair]] = counts[in_pair]
+        assignment = scipy_optimize.linear_sum_assignment(table, maximize=True)
+        matches[pair] = table[assignment].sum()
+    return matches
+
+
+def _pair_distances(summary, rows, columns, distance):
+    """Returns the normalized :distance: of each partition pair (summary[rows[p]], summary[columns[p]]): variation of
+    information divided by log(num_nodes), or the fraction of nodes assigned differently after aligning labels"""
+    num_nodes = summary.memberships.shape[1]
+    if len(rows) == 0 or num_nodes <= 1:
+        return np.zeros(len(rows))
+
+    entries = _contingency_entries(summary, summary, rows, columns)
+    if distance == 'vi':
+        mutual_information = _mutual_information(summary, summary, rows, columns, entries)
+        variation = summary.entropies[rows] + summary.entropies[columns] - 2 * mutual_information
+        return np.maximum(variation, 0.0) / np.log(num_nodes)
+    return 1 - _aligned_matches(summary, rows, columns, entries) / num_nodes
+
+
+def cluster_near_duplicates(partitions, epsilon, distance='vi', scores=None, num_hashes=DEFAULT_NUM_HASHES,
+                            min_jaccard=None, seed=0):
+    """Groups partitions that are within :epsilon: of a representative partition.
+
+    Candidate near-duplicates are found with MinHash signatures and locality-sensitive hashing, so the number of exact
+    distance computations grows with the number of candidates rather than quadratically with the number of partitions.
+    Partitions are then considered in order of decreasing :scores: (or in their given order) and each one that is not
+    yet grouped becomes a representative of all ungrouped candidates within :epsilon: of it. Near-duplicates that LSH
+    misses are left in groups of their own, which only makes the grouping less effective.
+
+    :param partitions: list of memberships, membership matrix, or PartitionStore
+    :param epsilon: maximum normalized distance between a partition and its representative
+    :param distance: 'vi' for the variation of information divided by log(num_nodes), or 'hamming' for the fraction of
+                     nodes assigned differently after optimally aligning the community labels
+    :param scores: if not None, array of a score for each partition (higher is better), e.g. A_hats - gamma * P_hats,
+                   such that each group's representative is its best scoring member
+    :param num_hashes: MinHash signature length
+    :param min_jaccard: Jaccard similarity of the partitions' node assignments at which candidates should be found
+                        with high probability. By default, this is derived from :epsilon: as if it were the fraction of
+                        nodes that differ
+    :param seed: random seed of the hash functions
+    :return: (array of the index of each partition's representative, number of candidate pairs checked)"""
+    if distance not in NEAR_DUPLICATE_DISTANCES:
+        raise ValueError(f"Distance {distance} is not one of {', '.join(NEAR_DUPLICATE_DISTANCES)}")
+
+    if isinstance(partitions, PartitionStore):
+        partitions = partitions.memberships
+    memberships = np.asarray(partitions if isinstance(partitions, np.ndarray) else list(partitions))
+    num_partitions = len(memberships)
+    representatives = np.full(num_partitions, -1, dtype=np.int64)
+    if num_partitions == 0:
+        return representatives, 0
+
+    summary = _summarize_partitions(memberships.reshape(num_partitions, -1))
+    if min_jaccard is None:
+        min_jaccard = max(1 - epsilon, 0.0) / (1 + epsilon)
+    buckets = _lsh_buckets(minhash_signatures(summary.memberships, num_hashes, seed),
+                           lsh_band_rows(num_hashes, min_jaccard))
+
+    # members of each bucket, in CSR form
+    flat_buckets = buckets.ravel()
+    bucket_order = np.argsort(flat_buckets, kind='stable')
+    bucket_members = bucket_order // buckets.shape[1]
+    bucket_starts = np.searchsorted(flat_buckets[bucket_order], np.arange(flat_buckets.max() + 2))
+
+    order = np.arange(num_partitions) if scores is None else np.argsort(-np.asarray(scores), kind='stable')
+    num_candidate_pairs = 0
+    for leader in order:
+        if representatives[leader] >= 0:
+            continue
+        representatives[leader] = leader
+
+        candidates = np.concatenate([bucket_members[bucket_starts[bucket]:bucket_starts[bucket + 1]]
+                                     for bucket in buckets[leader]])
+        candidates = np.unique(candidates[representatives[candidates] < 0])
+        if len(candidates) == 0:
+            continue
+        num_candidate_pairs += len(candidates)
+        distances = _pair_distances(summary, np.full(len(candidates), leader), candidates, distance)
+        representatives[candidates[distances <= epsilon]] = leader
+
+    return representatives, num_candidate_pairs
+
+
+def prune_near_duplicates(partitions, epsilon, distance='vi', scores=None, num_hashes=DEFAULT_NUM_HASHES,
+                          min_jaccard=None, seed=0, return_report=False):
+    """Reduces partitions to one representative per group of near-duplicates (see cluster_near_duplicates), e.g. to
+    shrink the input of CHAMP_2D or CHAMP_3D.
+
+    Note that CHAMP's result may change, since a partition dropped here could have been optimal somewhere.
+
+    :param partitions: list of memberships, membership matrix, or PartitionStore (repeated memberships are
+                       deduplicated first)
+    :param epsilon: maximum normalized distance between a partition and its representative
+    :param distance: 'vi' or 'hamming' (see cluster_near_duplicates)
+    :param scores: if not None, array of a score for each of :partitions: (higher is better), so that the best scoring
+                   member of each group is kept. A partition given several times is scored by its best score
+    :param num_hashes: MinHash signature length
+    :param min_jaccard: Jaccard similarity at which candidates should be found (see cluster_near_duplicates)
+    :param seed: random seed of the hash functions
+    :param return_report: if True, also return a dict of the number of input partitions, representatives kept,
+                          candidate pairs checked, the fraction of partitions removed, and the largest group's size
+    :return: PartitionStore of the representatives, in their original order"""
+    if not isinstance(partitions, (PartitionStore, np.ndarray)):
+        partitions = list(partitions)
+    store = partitions if isinstance(partitions, PartitionStore) else PartitionStore(partitions)
+
+    if scores is not None:
+        scores = np.asarray(scores, dtype=np.float64)
+        if len(scores) != len(partitions):
+            raise ValueError(f"Got {len(scores)} scores for {len(partitions)} partitions")
+        if store is not partitions:
+            # keep the best score of each unique partition
+            store_scores = np.full(len(store), -np.inf)
+            np.maximum.at(store_scores, [store.index(membership) for membership in partitions], scores)
+            scores = store_scores
+
+    with stage("near_duplicate_clustering", items=len(store)):
+        representatives, num_candidate_pairs = cluster_near_duplicates(store, epsilon, distance, scores, num_hashes,
+                                                                       min_jaccard, seed)
+        kept = np.unique(representatives)
+        pruned = store.subset(kept)
+
+    report = {'num_partitions': len(store),
+              'num_representatives': len(pruned),
+              'num_candidate_pairs': num_candidate_pairs,
+              'reduction': 1 - len(pruned) / len(store) if len(store) else 0.0,
+              'largest_group': int(np.bincount(representatives).max()) if len(store) else 0}
+    logger.info(f"Near-duplicate clustering kept {report['num_representatives']} of {report['num_partitions']} "
+                f"partitions ({100 * report['reduction']:.1f}% removed) after checking {num_candidate_pairs} "
+                f"candidate pairs")
+
+    if return_report:
+        return pruned, report
+    return pruned
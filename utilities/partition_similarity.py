@@ -0,0 +1,299 @@
+from .instrumentation import stage
+from .lazy_imports import lazy_import
+from .partition_store import PartitionStore
+from .partition_utilities import canonicalize_memberships
+from collections import namedtuple
+from itertools import islice
+from multiprocessing import Pool, cpu_count
+import numpy as np
+
+scipy_special = lazy_import("scipy.special")
+
+# partition pairs are compared in chunks, each holding roughly this many (pair, node) elements
+SIMILARITY_BLOCK_ELEMENTS = 2 ** 22
+SIMILARITY_MEASURES = ('nmi', 'ami', 'ari')
+EPS = np.finfo(np.float64).eps
+
+# contributions of pairs of community sizes to the expected mutual information (see _expected_information_table)
+_ExpectedInformationTable = namedtuple('_ExpectedInformationTable', ['first_sizes', 'second_sizes', 'values'])
+
+# per-partition quantities shared by every comparison involving a partition. The community sizes of all partitions are
+# concatenated in :sizes:, with those of partition i starting at :size_offsets:[i]
+_PartitionSummary = namedtuple('_PartitionSummary', ['memberships', 'num_communities', 'size_offsets', 'sizes',
+                                                     'entropies', 'sum_squares'])
+
+
+def _membership_matrix(partitions):
+    if isinstance(partitions, PartitionStore):
+        partitions = partitions.memberships
+    memberships = np.asarray(partitions if isinstance(partitions, np.ndarray) else list(partitions))
+    if memberships.ndim != 2:
+        memberships = memberships.reshape(len(memberships), -1) if memberships.size else \
+            np.zeros((len(memberships), 0), dtype=np.int64)
+    return memberships
+
+
+def _summarize_partitions(memberships):
+    memberships = canonicalize_memberships(memberships)
+    num_partitions, num_nodes = memberships.shape
+    num_communities = memberships.max(axis=1).astype(np.int64) + 1 if num_nodes > 0 else \
+        np.zeros(num_partitions, dtype=np.int64)
+    size_offsets = np.zeros(num_partitions, dtype=np.int64)
+    np.cumsum(num_communities[:-1], out=size_offsets[1:])
+
+    keys = (memberships + size_offsets[:, np.newaxis]).ravel()
+    sizes = np.bincount(keys, minlength=int(num_communities.sum())).astype(np.float64)
+    owners = np.repeat(np.arange(num_partitions), num_communities)
+    probabilities = sizes / max(num_nodes, 1)
+    entropies = -np.bincount(owners, weights=probabilities * np.log(np.where(sizes > 0, probabilities, 1.0)),
+                             minlength=num_partitions)
+    sum_squares = np.bincount(owners, weights=sizes ** 2, minlength=num_partitions)
+    return _PartitionSummary(memberships, num_communities, size_offsets, sizes, entropies, sum_squares)
+
+
+def _contingency_entries(first, second, rows, columns):
+    """Returns the nonzero entries of the contingency tables of the partition pairs (first[rows[p]],
+    second[columns[p]]) as arrays (pair index p, community in the first partition, community in the second, count).
+
+    Each pair's table is laid out densely after those of the previous pairs, so that all tables are counted with a
+    single np.bincount over the combined labels. If the tables are much larger than the memberships (i.e. partitions
+    with many communities), the combined labels are counted with np.unique instead."""
+    num_rows = first.num_communities[rows]
+    num_columns = second.num_communities[columns]
+    table_sizes = num_rows * num_columns
+    offsets = np.zeros(len(rows), dtype=np.int64)
+    np.cumsum(table_sizes[:-1], out=offsets[1:])
+    total = int(offsets[-1] + table_sizes[-1])
+
+    keys = offsets[:, np.newaxis] + first.memberships[rows] * num_columns[:, np.newaxis] + second.memberships[columns]
+    if total <= 4 * keys.size:
+        counts = np.bincount(keys.ravel(), minlength=total)
+        flat_indices = np.flatnonzero(counts)
+        counts = counts[flat_indices]
+    else:
+        flat_indices, counts = np.unique(keys, return_counts=True)
+
+    pairs = np.searchsorted(offsets, flat_indices, side='right') - 1
+    local_indices = flat_indices - offsets[pairs]
+    return pairs, local_indices // num_columns[pairs], local_indices % num_columns[pairs], counts.astype(np.float64)
+
+
+def _expected_information_table(first_sizes, second_sizes, num_nodes):
+    """Returns the contribution of each pair of community sizes (a, b), a in :first_sizes: and b in :second_sizes:, to
+    the expected mutual information of two partitions of :num_nodes: nodes under the hypergeometric model of randomness
+    (as in sklearn.metrics.adjusted_mutual_info_score).
+
+    The expected mutual information of two partitions is the sum of these contributions over their pairs of
+    communities, so that each contribution is computed once however many partition pairs share it."""
+    log_factorials = scipy_special.gammaln(np.arange(num_nodes + 1) + 1)
+    b = second_sizes.astype(np.int64)
+    table = np.zeros((len(first_sizes), len(second_sizes)))
+    for row, a in enumerate(first_sizes.astype(np.int64)):
+        # every term of the sum over the possible overlaps of a community of size a with each community of size b
+        start = np.maximum(1, a + b - num_nodes)
+        lengths = np.maximum(np.minimum(a, b) - start + 1, 0)
+        term_starts = np.cumsum(lengths) - lengths
+        overlap = np.repeat(start, lengths) + (np.arange(lengths.sum()) - np.repeat(term_starts, lengths))
+        owners = np.repeat(np.arange(len(b)), lengths)
+        b_overlap = b[owners]
+
+        log_probability = (log_factorials[a] + log_factorials[b_overlap] + log_factorials[num_nodes - a] +
+                           log_factorials[num_nodes - b_overlap] - log_factorials[num_nodes] -
+                           log_factorials[overlap] - log_factorials[a - overlap] - log_factorials[b_overlap - overlap] -
+                           log_factorials[num_nodes - a - b_overlap + overlap])
+        terms = (overlap / num_nodes * (np.log(num_nodes * overlap) - np.log(a * b_overlap)) *
+                 np.exp(log_probability))
+        table[row] = np.bincount(owners, weights=terms, minlength=len(b))
+    return _ExpectedInformationTable(first_sizes, second_sizes, table)
+
+
+def _expected_mutual_information(first, second, rows, columns, expected):
+    """Returns the expected mutual information of each partition pair (first[rows[p]], second[columns[p]]), summing
+    the contributions in :expected: over every pair of their communities"""
+    num_cells = first.num_communities[rows] * second.num_communities[columns]
+    cell_starts = np.cumsum(num_cells) - num_cells
+    owners = np.repeat(np.arange(len(rows)), num_cells)
+    local_cells = np.arange(num_cells.sum()) - cell_starts[owners]
+    num_columns = second.num_communities[columns[owners]]
+
+    first_sizes = first.sizes[first.size_offsets[rows[owners]] + local_cells // num_columns]
+    second_sizes = second.sizes[second.size_offsets[columns[owners]] + local_cells % num_columns]
+    contributions = expected.values[np.searchsorted(expected.first_sizes, first_sizes),
+                                    np.searchsorted(expected.second_sizes, second_sizes)]
+    return np.bincount(owners, weights=contributions, minlength=len(rows))
+
+
+def _mutual_information(first, second, rows, columns, entries):
+    """Returns the mutual information of each partition pair (first[rows[p]], second[columns[p]]) from the nonzero
+    :entries: of their contingency tables (see _contingency_entries)"""
+    pairs, first_communities, second_communities, counts = entries
+    num_nodes = first.memberships.shape[1]
+    first_size = first.sizes[first.size_offsets[rows[pairs]] + first_communities]
+    second_size = second.sizes[second.size_offsets[columns[pairs]] + second_communities]
+    mutual_information = np.bincount(pairs, weights=counts / num_nodes *
+                                     (np.log(counts) + np.log(num_nodes) - np.log(first_size * second_size)),
+                                     minlength=len(rows))
+    return np.maximum(mutual_information, 0.0)
+
+
+def _pair_similarities(first, second, rows, columns, measure, expected=None):
+    """Returns the :measure: similarity of each partition pair (first[rows[p]], second[columns[p]]), where :expected:
+    is the _ExpectedInformationTable of the partitions for AMI"""
+    num_pairs = len(rows)
+    num_nodes = first.memberships.shape[1]
+    if num_pairs == 0:
+        return np.zeros(0)
+    if num_nodes == 0:
+        return np.ones(num_pairs)
+
+    entries = _contingency_entries(first, second, rows, columns)
+    pairs, counts = entries[0], entries[3]
+    # both partitions consisting of a single community is a perfect match under every measure, as in sklearn
+    trivial = (first.num_communities[rows] == 1) & (second.num_communities[columns] == 1)
+
+    if measure == 'ari':
+        pair_sum_squares = np.bincount(pairs, weights=counts ** 2, minlength=num_pairs)
+        true_positives = pair_sum_squares - num_nodes
+        false_positives = first.sum_squares[rows] - pair_sum_squares
+        false_negatives = second.sum_squares[columns] - pair_sum_squares
+        true_negatives = num_nodes ** 2 - false_positives - false_negatives - pair_sum_squares
+        numerator = 2 * (true_positives * true_negatives - false_negatives * false_positives)
+        denominator = ((true_positives + false_negatives) * (false_negatives + true_negatives) +
+                       (true_positives + false_positives) * (false_positives + true_negatives))
+        perfect = (false_negatives == 0) & (false_positives == 0)
+        return np.where(perfect, 1.0, numerator / np.where(perfect, 1.0, denominator))
+
+    mutual_information = _mutual_information(first, second, rows, columns, entries)
+    normalizer = (first.entropies[rows] + second.entropies[columns]) / 2
+
+    if measure == 'nmi':
+        similarities = mutual_information / np.maximum(normalizer, EPS)
+        similarities[mutual_information == 0] = 0.0
+    else:
+        expected_information = _expected_mutual_information(first, second, rows, columns, expected)
+        denominator = normalizer - expected_information
+        denominator = np.where(denominator < 0, np.minimum(denominator, -EPS), np.maximum(denominator, EPS))
+        similarities = (mutual_information - expected_information) / denominator
+
+    similarities[trivial] = 1.0
+    return similarities
+
+
+def _pair_chunks(first, second, rows, columns, measure):
+    """Splits the pairs (rows[p], columns[p]) into consecutive chunks of roughly SIMILARITY_BLOCK_ELEMENTS elements,
+    counting both the combined labels and, for AMI, the community pairs of the expected mutual information"""
+    num_nodes = max(first.memberships.shape[1], 1)
+    costs = np.full(len(rows), num_nodes, dtype=np.int64)
+    if measure == 'ami':
+        costs += first.num_communities[rows] * second.num_communities[columns]
+    boundaries = np.searchsorted(np.cumsum(costs), np.arange(SIMILARITY_BLOCK_ELEMENTS, costs.sum(),
+                                                             SIMILARITY_BLOCK_ELEMENTS), side='right')
+    boundaries = np.unique(np.concatenate(([0], np.maximum(boundaries, 1), [len(rows)])))
+    return [(start, stop) for start, stop in zip(boundaries[:-1], boundaries[1:]) if stop > start]
+
+
+def _similarity_block(first, second, measure, expected, symmetric, row_start, row_stop):
+    """Returns the similarities of rows [row_start, row_stop) of :first: to every partition of :second: (if
+    :symmetric:, only to the partitions from row_start on, leaving the rest of the block zero)"""
+    column_start = row_start if symmetric else 0
+    num_columns = len(second.memberships)
+    block = np.zeros((row_stop - row_start, num_columns))
+
+    rows = np.repeat(np.arange(row_start, row_stop), num_columns - column_start)
+    columns = np.tile(np.arange(column_start, num_columns), row_stop - row_start)
+    for start, stop in _pair_chunks(first, second, rows, columns, measure):
+        block[rows[start:stop] - row_start, columns[start:stop]] = \
+            _pair_similarities(first, second, rows[start:stop], columns[start:stop], measure, expected)
+    return block
+
+
+_similarity_worker_args = None
+
+
+def _initialize_similarity_worker(*args):
+    global _similarity_worker_args
+    _similarity_worker_args = args
+
+
+def _similarity_worker_task(row_range):
+    return row_range[0], _similarity_block(*_similarity_worker_args, *row_range)
+
+
+def similarity_matrix(partitions, others=None, measure='nmi', single_threaded=False):
+    """Computes the similarity of every partition in :partitions: to every partition in :others:.
+
+    Contingency tables of many partition pairs are counted at once and the measures are evaluated from them with
+    vectorized operations, which is much faster than comparing pairs one at a time with sklearn. The results agree
+    with sklearn.metrics' normalized_mutual_info_score (arithmetic normalization), adjusted_mutual_info_score, and
+    adjusted_rand_score.
+
+    :param partitions: list of memberships, membership matrix, or PartitionStore
+    :param others: list of memberships, membership matrix, or PartitionStore over the same nodes, or None to compare
+                   :partitions: against each other (only half of the symmetric matrix is then computed)
+    :param measure: 'nmi', 'ami', or 'ari'
+    :param single_threaded: if True, run without parallelization. Otherwise, blocks of rows are computed in parallel
+    :return: (len(partitions) x len(others)) matrix of similarities"""
+    if measure not in SIMILARITY_MEASURES:
+        raise ValueError(f"Similarity measure {measure} is not one of {', '.join(SIMILARITY_MEASURES)}")
+
+    first = _summarize_partitions(_membership_matrix(partitions))
+    symmetric = others is None
+    second = first if symmetric else _summarize_partitions(_membership_matrix(others))
+    num_rows, num_columns = len(first.memberships), len(second.memberships)
+    if num_rows > 0 and num_columns > 0 and first.memberships.shape[1] != second.memberships.shape[1]:
+        raise ValueError(f"Partitions of {first.memberships.shape[1]} and {second.memberships.shape[1]} nodes cannot "
+                         f"be compared")
+
+    similarities = np.zeros((num_rows, num_columns))
+    if num_rows == 0 or num_columns == 0:
+        return similarities
+
+    parallel = not single_threaded and cpu_count() > 1
+    transposed = parallel and not symmetric and num_rows < cpu_count() <= num_columns
+    if transposed:
+        # the measures are symmetric, so one-vs-many comparisons are parallelized over the many instead
+        first, second = second, first
+        num_rows, num_columns = num_columns, num_rows
+        similarities = similarities.T
+
+    # each block holds a few chunks of pairs, but there is at least one block per worker
+    block_rows = max(1, 4 * SIMILARITY_BLOCK_ELEMENTS // (num_columns * max(first.memberships.shape[1], 1)))
+    if parallel:
+        block_rows = min(block_rows, -(-num_rows // cpu_count()))
+    row_ranges = ((start, min(start + block_rows, num_rows)) for start in range(0, num_rows, block_rows))
+
+    with stage("partition_similarity", items=num_rows * num_columns):
+        expected = None
+        if measure == 'ami':
+            expected = _expected_information_table(np.unique(first.sizes), np.unique(second.sizes),
+                                                   first.memberships.shape[1])
+
+        if not parallel or num_rows <= block_rows:
+            for start, stop in row_ranges:
+                similarities[start:stop] = _similarity_block(first, second, measure, expected, symmetric, start, stop)
+        else:
+            processes = cpu_count()
+            with Pool(processes=processes, initializer=_initialize_similarity_worker,
+                      initargs=(first, second, measure, expected, symmetric)) as pool:
+                while True:
+                    window = list(islice(row_ranges, processes))
+                    if not window:
+                        break
+                    for start, block in pool.map(_similarity_worker_task, window):
+                        similarities[start:start + len(block)] = block
+
+    if symmetric:
+        upper = np.triu(similarities)
+        return upper + np.triu(upper, 1).T
+    return similarities.T if transposed else similarities
+
+
+def similarities_to(reference, partitions, measure='nmi', single_threaded=False):
+    """Computes the similarity of :reference: (e.g. a ground truth membership) to every partition in :partitions:.
+
+    :param reference: membership vector
+    :param partitions: list of memberships, membership matrix, or PartitionStore
+    :param measure: 'nmi', 'ami', or 'ari' (see similarity_matrix)
+    :param single_threaded: if True, run without parallelization
+    :return: array of similarities, one per partition"""
+    return similarity_matrix([reference], partitions, measure=measure, single_threaded=single_threaded)[0]
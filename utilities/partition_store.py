@@ -0,0 +1,113 @@
+from .partition_utilities import canonical_membership, canonicalize_memberships, membership_digest
+import numpy as np
+
+UINT16_MAX_COMMUNITIES = np.iinfo(np.uint16).max + 1
+
+
+class PartitionStore:
+    """Compact, deduplicated collection of canonical community memberships.
+
+    Memberships are stored as the rows of a NumPy matrix. Its dtype is uint16 until some partition has more than 65536
+    communities, at which point the matrix is upcast to int32. Deduplication uses a dictionary of 128-bit row digests,
+    so no Python tuples of the memberships are retained.
+
+    Iterating over a store (or indexing it) produces membership tuples, so it can be used in place of a set or list of
+    partitions throughout this package."""
+
+    def __init__(self, partitions=()):
+        self._memberships = None
+        self._count = 0
+        self._index = {}
+
+        self.update(partitions)
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        for i in range(self._count):
+            yield self[i]
+
+    def __getitem__(self, i):
+        if not -self._count <= i < self._count:
+            raise IndexError("PartitionStore index out of range")
+        return tuple(self._memberships[i % self._count].tolist())
+
+    def __contains__(self, membership):
+        return membership_digest(canonical_membership(membership)) in self._index
+
+    @property
+    def num_nodes(self):
+        return None if self._memberships is None else self._memberships.shape[1]
+
+    @property
+    def memberships(self):
+        """Matrix (num_partitions x num_nodes) of canonical memberships. This is a view into the store's storage."""
+        if self._memberships is None:
+            return np.empty((0, 0), dtype=np.uint16)
+        return self._memberships[:self._count]
+
+    def _reserve(self, num_nodes, dtype):
+        if self._memberships is None:
+            self._memberships = np.empty((16, num_nodes), dtype=dtype)
+        elif num_nodes != self._memberships.shape[1]:
+            raise ValueError(f"Membership of length {num_nodes} cannot be added to a store of partitions of "
+                             f"{self._memberships.shape[1]} nodes")
+
+        if np.dtype(dtype).itemsize > self._memberships.dtype.itemsize:
+            self._memberships = self._memberships.astype(dtype)
+
+        if self._count == self._memberships.shape[0]:
+            grown = np.empty((2 * self._memberships.shape[0], num_nodes), dtype=self._memberships.dtype)
+            grown[:self._count] = self._memberships[:self._count]
+            self._memberships = grown
+
+    def add(self, membership):
+        """Adds the canonical form of :membership: to the store.
+
+        :return: True if the partition was not already present in the store"""
+        return self._add_canonical(canonical_membership(membership))
+
+    def _add_canonical(self, membership):
+        digest = membership_digest(membership)
+        if digest in self._index:
+            return False
+
+        num_communities = membership.max() + 1 if len(membership) else 0
+        self._reserve(len(membership), np.uint16 if num_communities <= UINT16_MAX_COMMUNITIES else np.int32)
+        self._memberships[self._count] = membership
+        self._index[digest] = self._count
+        self._count += 1
+        return True
+
+    def update(self, partitions):
+        """Adds each membership in :partitions: (an iterable of memberships or a membership matrix) to the store."""
+        if isinstance(partitions, np.ndarray) and partitions.ndim == 2:
+            for membership in canonicalize_memberships(partitions):
+                self._add_canonical(membership)
+        else:
+            for membership in partitions:
+                self.add(membership)
+
+    def index(self, membership):
+        """Returns the row index of :membership: within the store."""
+        try:
+            return self._index[membership_digest(canonical_membership(membership))]
+        except KeyError:
+            raise ValueError("membership is not in the PartitionStore") from None
+
+    def num_communities(self):
+        """Returns an array of the number of communities in each partition."""
+        if self._count == 0:
+            return np.zeros(0, dtype=np.int64)
+        return self.memberships.max(axis=1).astype(np.int64) + 1
+
+    def subset(self, selection):
+        """Returns a new PartitionStore containing the partitions selected by a boolean mask or array of indices."""
+        store = PartitionStore()
+        selected = self.memberships[selection]
+        if len(selected) > 0:
+            store._memberships = selected.copy()
+            store._count = len(selected)
+            store._index = {membership_digest(row): i for i, row in enumerate(selected)}
+        return store
@@ -1,25 +1,30 @@
+from .lazy_imports import lazy_import
+from .prepared_graph import as_igraph
 from collections import defaultdict
-from sklearn.metrics import adjusted_mutual_info_score, normalized_mutual_info_score
+import hashlib
+import numpy as np
+
+sklearn_metrics = lazy_import("sklearn.metrics")
 
 
 def ami(p1, p2):
-    return adjusted_mutual_info_score(p1, p2)
+    return sklearn_metrics.adjusted_mutual_info_score(p1, p2)
 
 
 def nmi(p1, p2):
-    return normalized_mutual_info_score(p1, p2, average_method='arithmetic')
+    return sklearn_metrics.normalized_mutual_info_score(p1, p2, average_method='arithmetic')
 
 
 def all_degrees(G):
-    return G.degree()
+    return as_igraph(G).degree()
 
 
 def in_degrees(G):
-    return G.indegree()
+    return as_igraph(G).indegree()
 
 
 def out_degrees(G):
-    return G.outdegree()
+    return as_igraph(G).outdegree()
 
 
 def membership_to_communities(membership):
@@ -40,3 +45,57 @@ def num_communities(membership):
     n = len(set(membership))
     assert n == max(membership) + 1
     return n
+
+
+def canonical_membership(membership):
+    """Returns the canonical form of a membership vector as an int32 array, in which the communities are relabeled by
+    order of first occurrence (i.e. label 0 occurs before label 1, which occurs before label 2, etc.)."""
+    membership = np.asarray(membership)
+    if membership.size == 0:
+        return np.zeros(0, dtype=np.int32)
+
+    labels, first_indices, inverse = np.unique(membership, return_index=True, return_inverse=True)
+    relabeling = np.empty(len(labels), dtype=np.int32)
+    relabeling[np.argsort(first_indices)] = np.arange(len(labels), dtype=np.int32)
+    return relabeling[inverse]
+
+
+def canonicalize_memberships(memberships):
+    """Returns the canonical forms (see canonical_membership) of the rows of a (num_partitions x num_nodes) membership
+    matrix as an int32 matrix of the same shape."""
+    memberships = np.asarray(memberships)
+    num_partitions, num_nodes = memberships.shape
+    if memberships.size == 0:
+        return np.zeros((num_partitions, num_nodes), dtype=np.int32)
+
+    # offset each row's labels so that every (row, community) pair has a distinct key
+    min_label = memberships.min()
+    num_labels = int(memberships.max() - min_label) + 1
+    keys = (memberships.astype(np.int64) - min_label).ravel()
+    keys += num_labels * np.repeat(np.arange(num_partitions, dtype=np.int64), num_nodes)
+
+    # a stable sort groups equal keys with the flat index of their first occurrence at the front of each group
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    is_first = np.empty(len(sorted_keys), dtype=bool)
+    is_first[0] = True
+    np.not_equal(sorted_keys[1:], sorted_keys[:-1], out=is_first[1:])
+    first_indices = order[is_first]
+
+    # within each row, number the communities by the position of their first occurrence
+    first_order = np.argsort(first_indices)
+    rows = first_indices[first_order] // num_nodes
+    labels = np.empty(len(first_indices), dtype=np.int32)
+    labels[first_order] = np.arange(len(first_indices)) - np.searchsorted(rows, rows, side='left')
+
+    key_index = np.empty(len(keys), dtype=np.int64)
+    key_index[order] = np.cumsum(is_first) - 1
+    return labels[key_index].reshape(num_partitions, num_nodes)
+
+
+def membership_digest(membership):
+    """Returns a 128-bit digest of a membership vector.
+
+    Equal memberships have equal digests regardless of their container or integer type, so digests of canonical
+    memberships can stand in for the memberships themselves when deduplicating."""
+    return hashlib.blake2b(np.asarray(membership, dtype=np.int64).tobytes(), digest_size=16).digest()
@@ -1,12 +1,15 @@
-from .partition_utilities import num_communities, ami
+from .lazy_imports import lazy_import
+from .partition_similarity import similarities_to
+from .partition_utilities import num_communities
 from collections import defaultdict
 from random import sample, shuffle
 import numpy as np
-import matplotlib
-from matplotlib.patches import Polygon
-from matplotlib.collections import PatchCollection
-import matplotlib.pyplot as plt
-import seaborn as sbn
+
+matplotlib = lazy_import("matplotlib")
+mpl_collections = lazy_import("matplotlib.collections")
+mpl_patches = lazy_import("matplotlib.patches")
+plt = lazy_import("matplotlib.pyplot")
+sbn = lazy_import("seaborn")
 
 
 def plot_adjacency(adj):
@@ -78,7 +81,7 @@ def plot_2d_domains(domains, xlim, ylim, flip_axes=False, use_current_axes=False
     for polyverts, membership in domains:
         if flip_axes:
             polyverts = [(x[1], x[0]) for x in polyverts]
-        polygon = Polygon(polyverts, True)
+        polygon = mpl_patches.Polygon(polyverts, True)
         patches.append(polygon)
 
     cnorm = matplotlib.colors.Normalize(vmin=0, vmax=len(domains))
@@ -107,7 +110,7 @@ def plot_2d_domains(domains, xlim, ylim, flip_axes=False, use_current_axes=False
             neighbor_colors = {colors[i] for i in neighboring_domains}
             colors[i] = sample(available_colors.difference(neighbor_colors), 1)[0]
 
-    p = PatchCollection(patches, facecolors=colors, alpha=1.0, edgecolors='black', linewidths=1.5)
+    p = mpl_collections.PatchCollection(patches, facecolors=colors, alpha=1.0, edgecolors='black', linewidths=1.5)
     ax.add_collection(p)
     plt.xlim(xlim)
     plt.ylim(ylim)
@@ -126,7 +129,7 @@ def plot_2d_domains_with_estimates(domains_with_estimates, xlim, ylim, plot_esti
         if flip_axes:
             polyverts = [(x[1], x[0]) for x in polyverts]
 
-        polygon = Polygon(polyverts, True)
+        polygon = mpl_patches.Polygon(polyverts, True)
         patches.append(polygon)
 
         centroid_x = np.mean([x[0] for x in polyverts])
@@ -169,7 +172,7 @@ def plot_2d_domains_with_num_communities(domains_with_estimates, xlim, ylim, fli
             polyverts = [(x[1], x[0]) for x in polyverts]
 
         if any(xlim[0] <= x[0] <= xlim[1] and ylim[0] <= x[1] <= ylim[1] for x in polyverts):
-            polygon = Polygon(polyverts, True)
+            polygon = mpl_patches.Polygon(polyverts, True)
             patches.append(polygon)
             Ks.append(num_communities(membership))
 
@@ -178,7 +181,7 @@ def plot_2d_domains_with_num_communities(domains_with_estimates, xlim, ylim, fli
     else:
         K_max = max(Ks)
 
-    p = PatchCollection(patches, cmap=cm, alpha=1.0, edgecolors='black', linewidths=2)
+    p = mpl_collections.PatchCollection(patches, cmap=cm, alpha=1.0, edgecolors='black', linewidths=2)
     p.set_array(np.array(Ks))
     ax.add_collection(p)
 
@@ -199,19 +202,20 @@ def plot_2d_domains_with_ami(domains_with_estimates, ground_truth, xlim, ylim, f
     fig, ax = plt.subplots()
     patches = []
     cm = matplotlib.cm.copper
-    amis = []
+    memberships = []
 
     for polyverts, membership, gamma_est, omega_est in domains_with_estimates:
         if flip_axes:
             polyverts = [(x[1], x[0]) for x in polyverts]
 
         if any(xlim[0] <= x[0] <= xlim[1] and ylim[0] <= x[1] <= ylim[1] for x in polyverts):
-            polygon = Polygon(polyverts, True)
+            polygon = mpl_patches.Polygon(polyverts, True)
             patches.append(polygon)
-            amis.append(ami(membership, ground_truth))
+            memberships.append(membership)
 
-    p = PatchCollection(patches, cmap=cm, alpha=1.0, edgecolors='black', linewidths=2)
-    p.set_array(np.array(amis + [1.0]))  # this extends the colorbar to include 1.0
+    amis = similarities_to(ground_truth, memberships, measure='ami', single_threaded=True)
+    p = mpl_collections.PatchCollection(patches, cmap=cm, alpha=1.0, edgecolors='black', linewidths=2)
+    p.set_array(np.append(amis, 1.0))  # this extends the colorbar to include 1.0
     ax.add_collection(p)
 
     cbar = plt.colorbar(p)
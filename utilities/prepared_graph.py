@@ -0,0 +1,132 @@
+import numpy as np
+import weakref
+
+# arrays of prepared graphs, cached by id() of their igraph graph (igraph graphs are not hashable). Each entry is
+# removed when its graph is garbage collected.
+_prepared_graphs = {}
+NUM_SIGNATURE_EDGES = 16
+
+
+class PreparedGraph:
+    """Array representation of an igraph graph, computed once and shared across the pruning pipeline.
+
+    Holds int32 edge source/target arrays, a float64 edge weight array (all ones if the graph has no 'weight' edge
+    attribute), the graph's total edge weight, unweighted degree vectors and weighted strength vectors.
+
+    A PreparedGraph can be passed anywhere this package accepts a graph G. Use prepare_graph() to obtain the cached
+    instance for a graph rather than constructing one directly."""
+
+    def __init__(self, G):
+        self.graph = G
+        self.vcount = G.vcount()
+        self.ecount = G.ecount()
+        self.directed = G.is_directed()
+
+        edges = np.array(G.get_edgelist(), dtype=np.int32).reshape(-1, 2)
+        self.sources = edges[:, 0].copy()
+        self.targets = edges[:, 1].copy()
+
+        if 'weight' in G.es.attributes():
+            self.weights = np.array(G.es['weight'], dtype=np.float64)
+        else:
+            self.weights = np.ones(self.ecount, dtype=np.float64)
+        self.total_weight = float(self.weights.sum())
+        self.is_weighted = bool((self.weights != 1.0).any())
+
+        out_degree = np.bincount(self.sources, minlength=self.vcount)
+        in_degree = np.bincount(self.targets, minlength=self.vcount)
+        self.degree = in_degree + out_degree
+
+        out_strength = np.bincount(self.sources, weights=self.weights, minlength=self.vcount)
+        in_strength = np.bincount(self.targets, weights=self.weights, minlength=self.vcount)
+        self.strength = in_strength + out_strength
+
+        # as in igraph, in- and out-degrees of undirected graphs are just their degrees
+        if self.directed:
+            self.in_degree, self.out_degree = in_degree, out_degree
+            self.in_strength, self.out_strength = in_strength, out_strength
+        else:
+            self.in_degree = self.out_degree = self.degree
+            self.in_strength = self.out_strength = self.strength
+
+        for array in [self.sources, self.targets, self.weights, self.degree, self.in_degree, self.out_degree,
+                      self.strength, self.in_strength, self.out_strength]:
+            array.flags.writeable = False
+
+        # arrays that are only needed by some callers are computed on first use. This dict is shared by every
+        # PreparedGraph of the same cached graph.
+        self._lazy = {}
+
+    @property
+    def incidence(self):
+        """CSR arrays (indptr, edge_ids), where edge_ids[indptr[v]:indptr[v + 1]] are the ids of the edges incident to
+        vertex v (in either direction). Self-loops are listed twice."""
+        if 'incidence' not in self._lazy:
+            endpoints = np.concatenate((self.sources, self.targets))
+            order = np.argsort(endpoints, kind='stable')
+            indptr = np.zeros(self.vcount + 1, dtype=np.int64)
+            np.cumsum(np.bincount(endpoints, minlength=self.vcount), out=indptr[1:])
+            edge_ids = (order % max(self.ecount, 1)).astype(np.int32)
+            indptr.flags.writeable = edge_ids.flags.writeable = False
+            self._lazy['incidence'] = (indptr, edge_ids)
+        return self._lazy['incidence']
+
+    def __getstate__(self):
+        # the arrays are cheap to recompute, so only the graph itself is pickled (e.g. when sent to worker processes)
+        return {'graph': self.graph}
+
+    def __setstate__(self, state):
+        self.__dict__.update(vars(prepare_graph(state['graph'])))
+
+
+def _graph_signature(G):
+    """Cheap fingerprint of :G: used to detect stale cache entries: its size, directedness, and a sample of its edges
+    (with their weights), since edge ids shift whenever edges are deleted."""
+    edge_ids = sorted({(i * (G.ecount() - 1)) // (NUM_SIGNATURE_EDGES - 1) for i in range(NUM_SIGNATURE_EDGES)})
+    edges = G.es[edge_ids] if G.ecount() > 0 else []
+    weights = edges['weight'] if 'weight' in G.es.attributes() and G.ecount() > 0 else None
+    return G.vcount(), G.ecount(), G.is_directed(), tuple(e.tuple for e in edges), weights
+
+
+def prepare_graph(G, refresh=False):
+    """Returns the PreparedGraph of :G:, reusing its cached arrays if possible.
+
+    The cache is keyed on the graph object itself and is invalidated when its vertex count, edge count, directedness,
+    or a sample of its edges and their weights changes. Pass :refresh: to force a rebuild after other in-place
+    modifications (e.g. replacing edges without changing the edge count or changing the weights of unsampled edges).
+
+    :param G: igraph graph or PreparedGraph (which is returned as-is unless :refresh: is set)
+    :param refresh: if True, recompute the prepared graph even if a cached one exists
+    :return: PreparedGraph of :G:"""
+    if isinstance(G, PreparedGraph):
+        if not refresh:
+            return G
+        G = G.graph
+
+    # only the arrays are cached, since holding a reference to G itself would keep it alive forever
+    key = id(G)
+    signature = _graph_signature(G)
+    cached = _prepared_graphs.get(key)
+    if cached is None or refresh or cached[0] != signature:
+        if cached is None:
+            weakref.finalize(G, _prepared_graphs.pop, key, None)
+        prepared = PreparedGraph(G)
+        _prepared_graphs[key] = (signature, {name: value for name, value in vars(prepared).items() if name != 'graph'})
+        return prepared
+
+    arrays = cached[1]
+
+    prepared = PreparedGraph.__new__(PreparedGraph)
+    prepared.__dict__.update(arrays, graph=G)
+    return prepared
+
+
+def as_igraph(G):
+    """Returns the igraph graph underlying :G: (an igraph graph or PreparedGraph)."""
+    return G.graph if isinstance(G, PreparedGraph) else G
+
+
+def louvain_weights(G):
+    """Returns the weights argument to use for :G: (an igraph graph) in louvain partitions, without adding a
+    'weight' attribute to graphs that lack one."""
+    return 'weight' if 'weight' in G.es.attributes() else None
@@ -1,5 +1,11 @@
+import logging
 import math
-from time import time
+from time import perf_counter, time
+
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())  # applications decide whether and where the reports are shown
+
+DEFAULT_TELEMETRY_INTERVAL = 10.0  # minimum number of seconds between two telemetry reports
 
 
 class Progress:
@@ -29,3 +35,129 @@ class Progress:
     def done(self):
         self.update(self.total)
         print()
+
+
+class SweepTelemetry:
+    """Throughput telemetry of a parallel Louvain sweep or partition coefficient computation.
+
+    Tracks the number of completed runs (Louvain runs or partitions whose coefficients were computed), the unique
+    partitions found, the discovery rate (new partitions per run, overall and since the previous report), and the
+    utilization of the worker processes (the fraction of their time spent running tasks).
+
+    Reports are throttled to at most one per :interval: seconds, plus a final report once the work finishes. Each report
+    is passed to :callback: as a dict (see snapshot()) or, if no callback is given, logged at INFO level to :log: (this
+    module's logger by default), so nothing is written to stdout. The reports are only shown if the application
+    configures logging (e.g. logging.basicConfig(level=logging.INFO)) or passes a :callback:.
+
+    Pass an instance as the show_progress argument of the parallel Louvain sweeps or the partition coefficient
+    functions. An instance can be reused across several sweeps, in which case its counts accumulate.
+
+    :param name: name of the work being tracked, used in log messages
+    :param unit: what a run is called in log messages
+    :param callback: if not None, function called with the snapshot() dict of each report
+    :param log: logging.Logger to report to if :callback: is None
+    :param interval: minimum number of seconds between two reports"""
+
+    def __init__(self, name="sweep", unit="runs", callback=None, log=None, interval=DEFAULT_TELEMETRY_INTERVAL):
+        self.name = name
+        self.unit = unit
+        self.callback = callback
+        self.log = log if log is not None else logger
+        self.interval = interval
+
+        self.total = 0
+        self.processes = 1
+        self.completed = 0
+        self.unique_partitions = 0
+        self.busy_time = 0.0
+        self.elapsed_before_start = 0.0
+        self.start_time = None
+        self.last_report_time = perf_counter()
+        self.last_report_completed = 0
+        self.last_report_unique_partitions = 0
+        self.reports = 0
+
+    def start(self, total, processes=1):
+        """Marks the start of :total: runs (or None if unknown) spread over :processes: worker processes"""
+        self.total += total if total is not None else 0
+        self.processes = max(processes, 1)
+        self.start_time = perf_counter()
+
+    def record(self, count=1, new_partitions=0, busy_time=0.0):
+        """Records :count: completed runs that found :new_partitions: previously unseen partitions and kept a worker
+        busy for :busy_time: seconds in total, reporting if the last report was at least :interval: seconds ago"""
+        self.completed += count
+        self.unique_partitions += new_partitions
+        self.busy_time += busy_time
+
+        if perf_counter() - self.last_report_time >= self.interval:
+            self.report()
+
+    def add_known_partitions(self, count):
+        """Records :count: unique partitions found without any runs (e.g. restored from a checkpoint)"""
+        self.unique_partitions += count
+
+    def elapsed(self):
+        """Returns the number of seconds spent in started work so far"""
+        if self.start_time is None:
+            return self.elapsed_before_start
+        return self.elapsed_before_start + perf_counter() - self.start_time
+
+    def snapshot(self):
+        """Returns a dict of the current telemetry:
+
+            - completed, total: number of runs completed and started (total is 0 if unknown)
+            - elapsed: seconds spent in started work
+            - runs_per_second: completed runs per second
+            - unique_partitions: number of unique partitions found
+            - discovery_rate: unique partitions found per completed run
+            - recent_discovery_rate: unique partitions found per run since the previous report
+            - worker_utilization: fraction of the workers' time spent running tasks
+            - eta: estimated seconds until all started runs complete (None if unknown)"""
+        elapsed = self.elapsed()
+        runs_per_second = self.completed / elapsed if elapsed > 0 else 0.0
+        recent_runs = self.completed - self.last_report_completed
+        recent_partitions = self.unique_partitions - self.last_report_unique_partitions
+        remaining = self.total - self.completed
+        return {'name': self.name,
+                'completed': self.completed,
+                'total': self.total,
+                'elapsed': elapsed,
+                'runs_per_second': runs_per_second,
+                'unique_partitions': self.unique_partitions,
+                'discovery_rate': self.unique_partitions / self.completed if self.completed else 0.0,
+                'recent_discovery_rate': recent_partitions / recent_runs if recent_runs else 0.0,
+                'worker_utilization': min(self.busy_time / (elapsed * self.processes), 1.0) if elapsed > 0 else 0.0,
+                'eta': remaining / runs_per_second if self.total and runs_per_second > 0 else None}
+
+    def report(self):
+        """Reports the current snapshot() to the callback or log"""
+        snapshot = self.snapshot()
+        if self.callback is not None:
+            self.callback(snapshot)
+        else:
+            progress = f"{snapshot['completed']}" + (f"/{snapshot['total']}" if snapshot['total'] else "")
+            eta = f", ETA {snapshot['eta']:.0f} s" if snapshot['eta'] is not None else ""
+            self.log.info(f"{self.name}: {progress} {self.unit} in {snapshot['elapsed']:.1f} s "
+                          f"({snapshot['runs_per_second']:.1f} {self.unit}/s), {snapshot['unique_partitions']} unique "
+                          f"partitions ({snapshot['recent_discovery_rate']:.3f} new per run recently), "
+                          f"{100 * snapshot['worker_utilization']:.0f}% worker utilization{eta}")
+
+        self.last_report_time = perf_counter()
+        self.last_report_completed = self.completed
+        self.last_report_unique_partitions = self.unique_partitions
+        self.reports += 1
+
+    def finish(self):
+        """Marks the end of the started work and makes a final report"""
+        self.elapsed_before_start = self.elapsed()
+        self.start_time = None
+        self.report()
+
+
+def sweep_telemetry(show_progress, name, unit="runs"):
+    """Returns the SweepTelemetry to use for a show_progress argument: None if it is False, a new SweepTelemetry with
+    :name: and :unit: if it is True, and the given SweepTelemetry otherwise"""
+    if isinstance(show_progress, SweepTelemetry):
+        return show_progress
+    return SweepTelemetry(name=name, unit=unit) if show_progress else None
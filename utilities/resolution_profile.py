@@ -0,0 +1,180 @@
+from .champ_utilities import champ_2D_domains, partition_coefficients_2D, _indexable_partitions, _membership_at
+from .parameter_estimation_utilities import gamma_estimate
+from .prepared_graph import prepare_graph
+import numpy as np
+
+
+class ResolutionProfile:
+    """Optimal partitions of a singlelayer network across gamma, i.e. the upper envelope of CHAMP.
+
+    The envelope is stored as sorted arrays of domain boundaries along with each domain's partition index and A_hat
+    and P_hat coefficients, so batches of gamma values are looked up with np.searchsorted and Q(gamma) is evaluated
+    without touching any memberships. Partitions are referred to by their index into :partitions:, which is kept by
+    reference (e.g. a PartitionStore or PartitionArchive).
+
+    Use ResolutionProfile.from_champ() to run CHAMP and build the profile of its result.
+
+    :param gamma_starts: sorted array of the gamma values where each domain of optimality starts
+    :param gamma_ends: array of the gamma values where each domain of optimality ends
+    :param partition_indices: array of the index into :partitions: of each domain's optimal partition
+    :param A_hats: array of A_hat of each domain's optimal partition
+    :param P_hats: array of P_hat of each domain's optimal partition
+    :param partitions: indexable collection of memberships (list, membership matrix, PartitionStore, or
+                       PartitionArchive)
+    :param normalization: modularity normalization, i.e. 2m for undirected graphs and m for directed ones (with m the
+                          total edge weight). If None, modularity() is unavailable."""
+
+    def __init__(self, gamma_starts, gamma_ends, partition_indices, A_hats, P_hats, partitions, normalization=None):
+        self.gamma_starts = np.asarray(gamma_starts, dtype=np.float64)
+        self.gamma_ends = np.asarray(gamma_ends, dtype=np.float64)
+        self.partition_indices = np.asarray(partition_indices, dtype=np.int64)
+        self.A_hats = np.asarray(A_hats, dtype=np.float64)
+        self.P_hats = np.asarray(P_hats, dtype=np.float64)
+        self.partitions = partitions
+        self.normalization = normalization
+
+        if (np.diff(self.gamma_starts) < 0).any():
+            raise ValueError("Domains of a ResolutionProfile must be sorted by their starting gamma")
+
+    @classmethod
+    def from_champ(cls, G, partitions, gamma_0, gamma_f, single_threaded=False, partition_coefficients=None):
+        """Runs CHAMP on :partitions: over gamma_0 <= gamma <= gamma_f, as in CHAMP_2D, and returns its profile.
+
+        :param G: graph of interest (igraph graph or PreparedGraph)
+        :param partitions: partitions to prune (an iterable of memberships, a membership matrix, a PartitionStore, or
+                           a PartitionArchive). Iterables that cannot be indexed are converted to lists.
+        :param gamma_0: starting gamma value
+        :param gamma_f: ending gamma value
+        :param single_threaded: if True, compute the partition coefficients without parallelization
+        :param partition_coefficients: if not None, precomputed (A_hats, P_hats) of :partitions:
+        :return: ResolutionProfile"""
+        G = prepare_graph(G)
+        partitions = _indexable_partitions(partitions)
+        if partition_coefficients is None:
+            partition_coefficients = partition_coefficients_2D(G, partitions, single_threaded=single_threaded)
+        A_hats, P_hats = (np.asarray(coefficients) for coefficients in partition_coefficients)
+
+        domains = np.array(champ_2D_domains(A_hats, P_hats, gamma_0, gamma_f)).reshape(-1, 3)
+        gamma_starts, gamma_ends, indices = domains[:, 0], domains[:, 1], domains[:, 2].astype(np.int64)
+
+        normalization = G.total_weight if G.directed else 2 * G.total_weight
+        return cls(gamma_starts, gamma_ends, indices, A_hats[indices], P_hats[indices], partitions, normalization)
+
+    def __len__(self):
+        return len(self.partition_indices)
+
+    @property
+    def gamma_range(self):
+        """(smallest gamma, largest gamma) covered by the profile"""
+        if len(self) == 0:
+            return None
+        return float(self.gamma_starts[0]), float(self.gamma_ends[-1])
+
+    def domain_index(self, gammas):
+        """Returns the index of the domain containing each of :gammas:, or -1 for gammas outside the profile.
+
+        At a boundary between two domains, the later domain is returned."""
+        gammas = np.asarray(gammas, dtype=np.float64)
+        if len(self) == 0:
+            return np.full(gammas.shape, -1, dtype=np.int64)
+        domains = np.searchsorted(self.gamma_starts, gammas, side='right') - 1
+        inside = (domains >= 0) & (gammas <= self.gamma_ends[np.maximum(domains, 0)])
+        return np.where(inside, domains, -1)
+
+    def optimal_partition_index(self, gammas):
+        """Returns the index into the profile's partitions of the optimal partition at each of :gammas:, or -1 for
+        gammas outside the profile"""
+        domains = self.domain_index(gammas)
+        if len(self) == 0:
+            return domains
+        return np.where(domains >= 0, self.partition_indices[np.maximum(domains, 0)], -1)
+
+    def optimal_partition(self, gamma):
+        """Returns the membership of the optimal partition at :gamma:"""
+        index = int(self.optimal_partition_index(gamma))
+        if index < 0:
+            raise ValueError(f"gamma={gamma} is outside of the profile's range {self.gamma_range}")
+        return _membership_at(self.partitions, index)
+
+    def quality(self, gammas):
+        """Returns the optimal A_hat - gamma * P_hat at each of :gammas:, or NaN for gammas outside the profile"""
+        gammas = np.asarray(gammas, dtype=np.float64)
+        domains = self.domain_index(gammas)
+        if len(self) == 0:
+            return np.full(gammas.shape, np.nan)
+        safe_domains = np.maximum(domains, 0)
+        values = self.A_hats[safe_domains] - gammas * self.P_hats[safe_domains]
+        return np.where(domains >= 0, values, np.nan)
+
+    def modularity(self, gammas):
+        """Returns the optimal modularity Q(gamma) at each of :gammas:, or NaN for gammas outside the profile"""
+        if self.normalization is None:
+            raise ValueError("The modularity normalization of this ResolutionProfile is unknown")
+        return self.quality(gammas) / self.normalization
+
+    def partitions_between(self, gamma_start, gamma_end):
+        """Returns the indices into the profile's partitions of the partitions that are optimal somewhere in
+        gamma_start <= gamma <= gamma_end, in order of increasing gamma"""
+        overlapping = (self.gamma_starts <= gamma_end) & (self.gamma_ends >= gamma_start)
+        return self.partition_indices[overlapping]
+
+    def ranges(self):
+        """Returns the profile as a list of [(domain_gamma_start, domain_gamma_end, membership), ...], as in
+        CHAMP_2D"""
+        return [(gamma_start, gamma_end, _membership_at(self.partitions, i))
+                for gamma_start, gamma_end, i in zip(self.gamma_starts.tolist(), self.gamma_ends.tolist(),
+                                                     self.partition_indices.tolist())]
+
+    def gamma_estimates(self, G):
+        """Returns the gamma estimate of each domain's optimal partition, or NaN where it is undefined (e.g. for a
+        single community)
+
+        :param G: graph of interest (igraph graph or PreparedGraph)"""
+        G = prepare_graph(G)
+        estimates = [gamma_estimate(G, _membership_at(self.partitions, i)) for i in self.partition_indices.tolist()]
+        return np.array([np.nan if estimate is None else estimate for estimate in estimates], dtype=np.float64)
+
+    def fixed_points(self, gamma_estimates):
+        """Finds the fixed points of iterative gamma estimation (as in
+        iterative_monolayer_resolution_parameter_estimation) restricted to the profile's partitions, along with the
+        domain that each domain's iteration converges to.
+
+        Over the profile, gamma -> gamma_estimate(optimal partition at gamma) is piecewise constant, mapping each
+        domain to the domain containing its gamma estimate. Fixed points are the domains that contain their own
+        estimate. Every domain's iteration is followed at once by repeatedly squaring this map, so this takes
+        O(num_domains * log(num_domains)) time and no runs of Louvain.
+
+        :param gamma_estimates: gamma estimate of each domain's optimal partition (see gamma_estimates())
+        :return: (array of the domain indices of the fixed points, array of the fixed point domain that the iteration
+                 started in each domain converges to, or -1 if it leaves the profile or cycles)"""
+        gamma_estimates = np.asarray(gamma_estimates, dtype=np.float64)
+        domains = np.arange(len(self))
+        targets = self.domain_index(np.nan_to_num(gamma_estimates, nan=-np.inf))
+        fixed = targets == domains
+
+        # after the map is applied 2^k >= num_domains times, every converging iteration has reached its fixed point
+        attractors = targets.copy()
+        for _ in range(int(np.ceil(np.log2(max(len(self), 1)))) + 1):
+            attractors = np.where(attractors >= 0, attractors[np.maximum(attractors, 0)], -1)
+        converged = attractors >= 0
+        converged[converged] = fixed[attractors[converged]]
+        return np.flatnonzero(fixed), np.where(converged, attractors, -1)
+
+    def basins(self, gamma_estimates):
+        """Returns the basins of attraction of the fixed points of the iterative gamma estimation (see fixed_points())
+
+        :param gamma_estimates: gamma estimate of each domain's optimal partition (see gamma_estimates())
+        :return: dict of {partition index of a fixed point: list of (gamma_start, gamma_end) intervals of the starting
+                 gammas that converge to it}"""
+        fixed_domains, attractors = self.fixed_points(gamma_estimates)
+        basins = {int(self.partition_indices[domain]): [] for domain in fixed_domains}
+        for domain, attractor in enumerate(attractors.tolist()):
+            if attractor < 0:
+                continue
+            intervals = basins[int(self.partition_indices[attractor])]
+            gamma_start, gamma_end = float(self.gamma_starts[domain]), float(self.gamma_ends[domain])
+            if intervals and np.isclose(intervals[-1][1], gamma_start):
+                intervals[-1] = (intervals[-1][0], gamma_end)  # merge adjacent domains
+            else:
+                intervals.append((gamma_start, gamma_end))
+        return basins